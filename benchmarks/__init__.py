@@ -0,0 +1,76 @@
+"""Benchmarks of the polls app, run as scripts from the project root.
+
+    python -m benchmarks.voting --help
+    python -m benchmarks.compare --help
+    python -m benchmarks.asgi_vs_wsgi --help
+    python -m benchmarks.sqlite_writes --help
+    python -m benchmarks.login --help
+    python -m benchmarks.ratelimit --help
+    python -m benchmarks.templates --help
+
+The helpers here set Django up on a throwaway SQLite file and seed it, so a
+benchmark needs no outside services.
+"""
+import datetime
+import os
+import random
+
+
+def percentile(samples, fraction):
+    """Return the sample at the fraction (0-1) of the sorted samples."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def setup_django(database):
+    """Configure Django on the SQLite file and create the schema in it."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+    # Keep the per-request event log out of the report.
+    os.environ.setdefault('DJANGO_LOG_LEVEL', 'WARNING')
+    # The simulated voters share one address and a few accounts; polls.ratelimit would turn them away.
+    os.environ.setdefault('POLLS_VOTE_RATE', '0')
+    os.environ.setdefault('POLLS_VOTE_IP_RATE', '0')
+    from django.conf import settings
+    for alias in settings.DATABASES.values():
+        # The read-only alias, if on, is another connection to the same file.
+        alias['NAME'] = database
+    settings.ALLOWED_HOSTS = ['*']
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def seed(questions, choices=3, users=10, votes=0, password=None, seed=0):
+    """Create open questions with their choices, users named bench<n>, and random votes.
+
+    Every user gets the same password, hashed once. Return the users and a
+    {question_id: [choice_id, ...]} dict.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from polls.models import Choice, Question, Vote
+    now = timezone.now()
+    Question.objects.bulk_create(
+        Question(question_text=f'Question {n}', pub_date=now - datetime.timedelta(days=1, seconds=n),
+                 end_date=now + datetime.timedelta(days=7)) for n in range(questions)
+    )
+    question_ids = list(Question.objects.filter(question_text__startswith='Question ').values_list('pk', flat=True))
+    Choice.objects.bulk_create(
+        Choice(question_id=question_id, choice_text=f'Choice {n}')
+        for question_id in question_ids for n in range(choices)
+    )
+    hashed = make_password(password)
+    User.objects.bulk_create(User(username=f'bench{n}', password=hashed) for n in range(users))
+    created = list(User.objects.filter(username__startswith='bench').order_by('pk'))
+    choice_ids = {question_id: [] for question_id in question_ids}
+    for question_id, choice_id in Choice.objects.filter(question_id__in=question_ids).values_list('question_id', 'pk'):
+        choice_ids[question_id].append(choice_id)
+    rng = random.Random(seed)
+    cast = [(rng.choice(created).pk, question_id, rng.choice(choice_ids[question_id]))
+            for question_id in rng.choices(question_ids, k=votes)]
+    for start in range(0, len(cast), 5000):
+        Vote.cast_many(cast[start:start + 5000])
+    return created, choice_ids
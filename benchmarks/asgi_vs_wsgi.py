@@ -0,0 +1,130 @@
+"""Compare the sync views served over WSGI with the async views served over ASGI.
+
+Each deployment runs in its own process on a fresh SQLite file. The WSGI run
+drives Django's WSGI handler from a pool of threads, as a threaded WSGI
+server would; the ASGI run drives the ASGI handler from one event loop. Both
+replay the same mix of results, detail and vote requests and report
+requests/sec and latency percentiles.
+
+    python -m benchmarks.asgi_vs_wsgi --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import percentile, seed, setup_django
+
+MIX = (('results', 0.6), ('detail', 0.25), ('vote', 0.15))
+
+
+def plan(count, choices):
+    """Return a reproducible list of (kind, path, data) requests."""
+    from django.urls import reverse
+    rng = random.Random(0)
+    kinds = rng.choices([kind for kind, _ in MIX], [weight for _, weight in MIX], k=count)
+    requests = []
+    for kind in kinds:
+        question_id = rng.choice(list(choices))
+        if kind == 'vote':
+            requests.append(('post', reverse('polls:vote', args=(question_id,)),
+                             {'choice': rng.choice(choices[question_id])}))
+        else:
+            requests.append(('get', reverse(f'polls:{kind}', args=(question_id,)), None))
+    return requests
+
+
+def run_wsgi(requests, users, concurrency):
+    """Replay the requests through the WSGI handler from a thread pool, return the latencies."""
+    from django.test import Client
+    clients = []
+    for user in users[:concurrency]:
+        client = Client()
+        client.force_login(user)
+        clients.append(client)
+
+    def worker(index):
+        client, latencies = clients[index], []
+        for method, path, data in requests[index::concurrency]:
+            start = time.perf_counter()
+            getattr(client, method)(path, data)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return [latency for latencies in pool.map(worker, range(concurrency)) for latency in latencies]
+
+
+async def run_asgi(requests, users, concurrency):
+    """Replay the requests through the ASGI handler from one event loop, return the latencies."""
+    from django.test import AsyncClient
+    clients = []
+    for user in users[:concurrency]:
+        client = AsyncClient()
+        await client.aforce_login(user)
+        clients.append(client)
+
+    async def worker(index):
+        client, latencies = clients[index], []
+        for method, path, data in requests[index::concurrency]:
+            start = time.perf_counter()
+            await getattr(client, method)(path, data)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    results = await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    return [latency for latencies in results for latency in latencies]
+
+
+def measure(mode, count, concurrency):
+    """Run one deployment in this process and return its summary."""
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        users, choices = seed(questions=20, users=concurrency)
+        requests = plan(count, choices)
+        start = time.perf_counter()
+        if mode == 'asgi':
+            latencies = asyncio.run(run_asgi(requests, users, concurrency))
+        else:
+            latencies = run_wsgi(requests, users, concurrency)
+        elapsed = time.perf_counter() - start
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--mode', choices=('wsgi', 'asgi'), help='Run only this deployment, in this process.')
+    options = parser.parse_args()
+    if options.mode:
+        print(json.dumps(measure(options.mode, options.requests, options.concurrency)))
+        return
+    for mode in ('wsgi', 'asgi'):
+        # A process per deployment, since the URLconf picks its views at import time.
+        env = dict(os.environ, POLLS_ASYNC_VIEWS='true' if mode == 'asgi' else 'false')
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.asgi_vs_wsgi', '--mode', mode,
+             '--requests', str(options.requests), '--concurrency', str(options.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        summary = json.loads(output.splitlines()[-1])
+        print(f"{mode}: {summary['requests_per_second']} req/s, "
+              f"p50 {summary['p50_ms']} ms, p99 {summary['p99_ms']} ms")
+
+
+if __name__ == '__main__':
+    main()
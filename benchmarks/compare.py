@@ -0,0 +1,50 @@
+"""Compare two benchmarks.voting runs and fail on a regression.
+
+A route regresses when its p50 or p99 latency grows, or its throughput
+falls, by more than --threshold, or when it runs more queries per request.
+The exit status is 1 if any route regressed, so CI can gate on it.
+
+    python -m benchmarks.compare before.json after.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+# (statistic, True if a larger value is worse)
+CHECKS = (('p50_ms', True), ('p99_ms', True), ('requests_per_second', False))
+
+
+def compare(base, head, threshold):
+    """Return (route, statistic, base value, head value, regressed) for every statistic of every route."""
+    rows = []
+    for route, before in base['routes'].items():
+        after = head['routes'].get(route)
+        if after is None:
+            continue
+        for statistic, larger_is_worse in CHECKS:
+            change = (after[statistic] - before[statistic]) / before[statistic] if before[statistic] else 0
+            regressed = change > threshold if larger_is_worse else change < -threshold
+            rows.append((route, statistic, before[statistic], after[statistic], regressed))
+        if before['queries_per_request'] is not None and after['queries_per_request'] is not None:
+            rows.append((route, 'queries_per_request', before['queries_per_request'], after['queries_per_request'],
+                         after['queries_per_request'] > before['queries_per_request']))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Allowed relative change, 0.1 for 10%%.')
+    options = parser.parse_args()
+    with open(options.base) as base, open(options.head) as head:
+        rows = compare(json.load(base), json.load(head), options.threshold)
+    for route, statistic, before, after, regressed in rows:
+        change = f'{(after - before) / before:+.1%}' if before else 'n/a'
+        print(f"{route:<8} {statistic:<20} {before:>10} {after:>10} {change:>8}{'  REGRESSION' if regressed else ''}")
+    if any(row[4] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Measure login throughput with each password hasher.
+
+Threads post the login form for the seeded users through Django's test
+client until each has logged in --logins times. Each hasher runs in its own
+process, because POLLS_PASSWORD_HASHER and the hasher costs are read when
+the settings are imported. The report gives logins per second, and per
+core: divided by the threads, or the hash workers when --workers is set,
+whichever is fewer cores.
+
+    python -m benchmarks.login --threads 4 --logins 20
+    python -m benchmarks.login --hashers scrypt argon2 --workers 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks import percentile, seed, setup_django
+
+HASHERS = ('pbkdf2', 'scrypt', 'argon2')
+PASSWORD = 'bench-password'
+
+
+def measure(options):
+    """Run the login threads in this process and return their statistics."""
+    from django.db import connection
+    from django.test import Client
+
+    users, _ = seed(0, users=options.threads, password=PASSWORD)
+    latencies, failed = [], []
+
+    def login(user):
+        client = Client()
+        for _ in range(options.logins):
+            start = time.perf_counter()
+            response = client.post('/accounts/login/', {'username': user.username, 'password': PASSWORD})
+            if response.status_code == 302:
+                latencies.append(time.perf_counter() - start)
+            else:
+                failed.append(response.status_code)
+            client.cookies.clear()
+        connection.close()
+
+    threads = [threading.Thread(target=login, args=(user,)) for user in users]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    cores = min(options.workers or options.threads, os.cpu_count() or 1)
+    return {
+        'logins': len(latencies),
+        'logins_per_second': round(len(latencies) / elapsed, 1),
+        'logins_per_second_per_core': round(len(latencies) / elapsed / cores, 1),
+        'login_p50_ms': round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        'login_p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        'failed': len(failed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hashers', nargs='+', choices=HASHERS, default=['pbkdf2', 'scrypt'],
+                        help='argon2 needs the argon2-cffi package.')
+    parser.add_argument('--threads', type=int, default=4, help='Users logging in at the same time.')
+    parser.add_argument('--logins', type=int, default=10, help='Logins of each user.')
+    parser.add_argument('--workers', type=int, default=0, help='Processes hashing the passwords; 0 for none.')
+    parser.add_argument('--hasher', choices=HASHERS, help='Run one hasher in this process and print JSON.')
+    options = parser.parse_args()
+
+    if options.hasher:
+        os.environ['POLLS_PASSWORD_HASHER'] = options.hasher
+        os.environ['POLLS_HASH_WORKERS'] = str(options.workers)
+        with tempfile.TemporaryDirectory() as directory:
+            setup_django(os.path.join(directory, 'bench.sqlite3'))
+            print(json.dumps(measure(options)))
+        return
+
+    arguments = ['--threads', str(options.threads), '--logins', str(options.logins), '--workers', str(options.workers)]
+    print(f"{'hasher':<8} {'logins/s':>9} {'per core':>9} {'p50 ms':>8} {'p99 ms':>8} {'failed':>7}")
+    for hasher in options.hashers:
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.login', '--hasher', hasher] + arguments,
+                                capture_output=True, text=True, check=True).stdout
+        stats = json.loads(output.splitlines()[-1])
+        print(f"{hasher:<8} {stats['logins_per_second']:>9} {stats['logins_per_second_per_core']:>9} "
+              f"{stats['login_p50_ms']!s:>8} {stats['login_p99_ms']!s:>8} {stats['failed']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Measure what polls.ratelimit adds to each vote request.
+
+A view that does nothing is called with built POST requests, bare and
+wrapped in limit_votes, for every cache backend the limiter can use. The
+difference is the limiter's overhead: a repeat lookup, a token taken from
+a user and an IP bucket, and recording the vote for the repeat window. The limits are raised so no request is
+refused; each request comes from one of --users users and --ips addresses.
+
+    python -m benchmarks.ratelimit --requests 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks import percentile, setup_django
+
+BACKENDS = ('locmem', 'file')
+
+
+def measure(view, requests):
+    """Call the view with each request and return the per-call latencies in seconds."""
+    latencies = []
+    for request in requests:
+        start = time.perf_counter()
+        view(request, 1)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--ips', type=int, default=20)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        from django.conf import settings
+        from django.contrib.auth.models import User
+        from django.contrib.sessions.backends.cache import SessionStore
+        from django.http import HttpResponseRedirect
+        from django.test import RequestFactory
+
+        from polls import settings as polls_settings
+        from polls.ratelimit import limit_votes, ratelimit_cache
+
+        for backend in BACKENDS:
+            settings.CACHES[f'bench_{backend}'] = {
+                **settings.POLLS_CACHE_BACKENDS[backend],
+                'LOCATION': os.path.join(directory, backend),
+                'OPTIONS': {'MAX_ENTRIES': options.users + options.ips + 1000},
+            }
+        polls_settings.VOTE_RATE = polls_settings.VOTE_IP_RATE = 1e9
+        polls_settings.VOTE_BURST = polls_settings.VOTE_IP_BURST = 10 ** 9
+
+        factory = RequestFactory()
+        users = [User(pk=n, username=f'bench{n}') for n in range(1, options.users + 1)]
+        requests = []
+        for n in range(options.requests):
+            request = factory.post('/polls/1/vote/', {'choice': str(n)}, REMOTE_ADDR=f'10.0.0.{n % options.ips}')
+            request.user = users[n % len(users)]
+            request.session = SessionStore(session_key=f'bench{n % len(users):032}')
+            requests.append(request)
+
+        def view(request, question_id):
+            return HttpResponseRedirect('/polls/1/results/')
+
+        baseline = measure(view, requests)
+        print(f"{'cache':<8} {'mean us':>8} {'p50 us':>8} {'p99 us':>8}")
+        print(f"{'none':<8} {sum(baseline) / len(baseline) * 1e6:>8.1f} {percentile(baseline, 0.5) * 1e6:>8.1f} "
+              f"{percentile(baseline, 0.99) * 1e6:>8.1f}")
+        for backend in BACKENDS:
+            polls_settings.RATE_LIMIT_CACHE_ALIAS = f'bench_{backend}'
+            ratelimit_cache().clear()
+            latencies = measure(limit_votes(view), requests)
+            print(f"{backend:<8} {sum(latencies) / len(latencies) * 1e6:>8.1f} "
+                  f"{percentile(latencies, 0.5) * 1e6:>8.1f} {percentile(latencies, 0.99) * 1e6:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
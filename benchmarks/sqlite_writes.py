@@ -0,0 +1,119 @@
+"""Measure vote throughput on SQLite with the default and the production database profile.
+
+Writer threads cast votes with Vote.cast_many while reader threads load
+question results, uncached, all on one fresh SQLite file. Each profile runs
+in its own process, because the profile is read when the settings are
+imported.
+The report gives votes and reads per second and how many operations failed
+with "database is locked".
+
+    python -m benchmarks.sqlite_writes --writers 8 --readers 4 --votes 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks import percentile, seed, setup_django
+
+PROFILES = ('default', 'production')
+
+
+def measure(options):
+    """Run the writers and readers in this process and return their statistics."""
+    from django.db import OperationalError, connection
+
+    from polls import pages
+    from polls.models import Vote
+    from polls.routers import reading
+
+    users, choices = seed(options.questions, options.choices, options.users)
+    question_ids = list(choices)
+    latencies, reads, locked = [], [], []
+    deadline = []
+
+    def writer(index):
+        for n in range(options.votes):
+            user = users[(index * options.votes + n) % len(users)]
+            question_id = question_ids[n % len(question_ids)]
+            vote = (user.pk, question_id, choices[question_id][(index + n) % len(choices[question_id])])
+            start = time.perf_counter()
+            try:
+                Vote.cast_many([vote])
+            except OperationalError:
+                locked.append('write')
+            else:
+                latencies.append(time.perf_counter() - start)
+        connection.close()
+
+    def reader(index):
+        reading.set(True)
+        n = index
+        while not deadline:
+            try:
+                pages.load_results(question_ids[n % len(question_ids)])
+            except OperationalError:
+                locked.append('read')
+            else:
+                reads.append(1)
+            n += 1
+        connection.close()
+
+    writers = [threading.Thread(target=writer, args=(n,)) for n in range(options.writers)]
+    readers = [threading.Thread(target=reader, args=(n,)) for n in range(options.readers)]
+    started = time.perf_counter()
+    for thread in writers + readers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    deadline.append(True)
+    for thread in readers:
+        thread.join()
+    return {
+        'votes': len(latencies),
+        'votes_per_second': round(len(latencies) / elapsed, 1),
+        'vote_p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'vote_p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'reads_per_second': round(len(reads) / elapsed, 1),
+        'locked_writes': locked.count('write'),
+        'locked_reads': locked.count('read'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--choices', type=int, default=4, help='Choices per question.')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--writers', type=int, default=8, help='Threads casting votes.')
+    parser.add_argument('--readers', type=int, default=4, help='Threads loading results while the writers run.')
+    parser.add_argument('--votes', type=int, default=200, help='Votes cast by each writer.')
+    parser.add_argument('--profile', choices=PROFILES, help='Run one profile in this process and print JSON.')
+    options = parser.parse_args()
+
+    if options.profile:
+        os.environ['POLLS_DB_PROFILE'] = options.profile
+        # The production run reads through the query_only connection.
+        os.environ['POLLS_DB_READONLY'] = str(options.profile == 'production')
+        with tempfile.TemporaryDirectory() as directory:
+            setup_django(os.path.join(directory, 'bench.sqlite3'))
+            print(json.dumps(measure(options)))
+        return
+
+    arguments = sys.argv[1:]
+    print(f"{'profile':<11} {'votes/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'reads/s':>8} {'locked w':>8} {'locked r':>8}")
+    for profile in PROFILES:
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.sqlite_writes', '--profile', profile] + arguments,
+                                capture_output=True, text=True, check=True).stdout
+        stats = json.loads(output.splitlines()[-1])
+        print(f"{profile:<11} {stats['votes_per_second']:>8} {stats['vote_p50_ms']!s:>8} {stats['vote_p99_ms']!s:>8} "
+              f"{stats['reads_per_second']:>8} {stats['locked_writes']:>8} {stats['locked_reads']:>8}")
+
+
+if __name__ == '__main__':
+    main()
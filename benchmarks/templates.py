@@ -0,0 +1,83 @@
+"""Measure the render time of the polls templates across poll sizes.
+
+Each template is rendered --renders times for each size: the index with
+that many questions on the page, the detail and results pages with that
+many choices. 'cold' clears the template fragment cache before every
+render, 'warm' reuses the fragments of the previous render, as a page whose
+questions have not changed does. The templates come from the cached loader,
+so neither includes compiling them.
+
+    python -m benchmarks.templates --sizes 5 20 100 --renders 200
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from benchmarks import percentile, setup_django
+
+
+def contexts(size):
+    """Return the context of each template for a poll size, built from unsaved questions and choices."""
+    from django.contrib.auth.models import AnonymousUser
+    from django.utils import timezone
+
+    from polls import pages
+    from polls.models import Choice, Question
+
+    now = timezone.now()
+    questions = []
+    for n in range(size):
+        question = Question(id=n + 1, question_text=f'Question {n}', pub_date=now - datetime.timedelta(days=1),
+                            end_date=now + datetime.timedelta(days=7), version=1, modified_at=now)
+        question.is_open = True
+        questions.append(question)
+    question = questions[0]
+    choices = [Choice(id=n + 1, question=question, choice_text=f'Choice {n}', votes=n) for n in range(size)]
+    return {
+        'index': {'latest_question_list': questions, 'user': AnonymousUser(), 'messages': []},
+        'detail': {'question': question, 'choices': choices},
+        'results': pages.results_context(question, choices),
+    }
+
+
+def measure(template, context, renders, cold):
+    """Render the template and return the render times in seconds."""
+    from django.core.cache import caches
+
+    fragments = caches['template_fragments']
+    latencies = []
+    for _ in range(renders):
+        if cold:
+            fragments.clear()
+        start = time.perf_counter()
+        template.render(context)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 20, 100],
+                        help='Questions on the index page, choices on the detail and results pages.')
+    parser.add_argument('--renders', type=int, default=200, help='Renders of each template, size and cache state.')
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        from django.template.loader import get_template
+
+        print(f"{'template':<9} {'size':>5} {'cache':<5} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for size in options.sizes:
+            for name, context in contexts(size).items():
+                template = get_template(f'polls/{name}.html')
+                for cold in (True, False):
+                    latencies = measure(template, context, options.renders, cold)
+                    print(f"{name:<9} {size:>5} {'cold' if cold else 'warm':<5} "
+                          f"{sum(latencies) / len(latencies) * 1000:>8.3f} {percentile(latencies, 0.5) * 1000:>8.3f} "
+                          f"{percentile(latencies, 0.99) * 1000:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Load-test the voting flow through the real URL routes and record the results as JSON.
+
+The database is a fresh SQLite file seeded with the requested number of
+questions, choices, users and votes. Each virtual user then runs voter
+sessions through Django's test client from its own thread:
+
+    login -> detail -> vote -> results (x --results-views)
+
+Every request is timed, and its query count is read from the Server-Timing
+header of polls.profiling, which this benchmark turns on. The report gives
+throughput, latency percentiles and queries per request for each route.
+With --output the run is saved as JSON for benchmarks.compare.
+
+    python -m benchmarks.voting --sessions 500 --concurrency 8 --output before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import percentile, seed, setup_django
+
+PASSWORD = 'bench-password'
+ROUTES = ('login', 'detail', 'vote', 'results')
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+def plan(sessions, users, choices, results_views, rng):
+    """Return a reproducible list of sessions, each a list of (route, method, path, data) requests."""
+    from django.urls import reverse
+    planned = []
+    for _ in range(sessions):
+        user = rng.choice(users)
+        question_id = rng.choice(list(choices))
+        planned.append([
+            ('login', 'post', reverse('login'), {'username': user.username, 'password': PASSWORD}),
+            ('detail', 'get', reverse('polls:detail', args=(question_id,)), None),
+            ('vote', 'post', reverse('polls:vote', args=(question_id,)), {'choice': rng.choice(choices[question_id])}),
+        ] + [('results', 'get', reverse('polls:results', args=(question_id,)), None)] * results_views)
+    return planned
+
+
+def run(sessions, concurrency):
+    """Run the sessions from a pool of threads and return one (route, seconds, queries, status) per request."""
+    from django.test import Client
+
+    def worker(index):
+        client, samples = Client(), []
+        for session in sessions[index::concurrency]:
+            for route, method, path, data in session:
+                start = time.perf_counter()
+                response = getattr(client, method)(path, data)
+                elapsed = time.perf_counter() - start
+                timing = SERVER_TIMING_DB.search(response.get('Server-Timing', ''))
+                samples.append((route, elapsed, int(timing.group(2)) if timing else None, response.status_code))
+            client.cookies.clear()
+        return samples
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return [sample for samples in pool.map(worker, range(concurrency)) for sample in samples]
+
+
+def summarize(samples, seconds):
+    """Return the statistics of each route and of all requests together."""
+    expected = {'login': 302, 'detail': 200, 'vote': 302, 'results': 200}
+    report = {}
+    for route in ROUTES + ('all',):
+        picked = [sample for sample in samples if route in ('all', sample[0])]
+        if not picked:
+            continue
+        latencies = [sample[1] for sample in picked]
+        queries = [sample[2] for sample in picked if sample[2] is not None]
+        report[route] = {
+            'requests': len(picked),
+            'errors': sum(status != expected[name] for name, _, _, status in picked),
+            'requests_per_second': round(len(picked) / seconds, 1),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p90_ms': round(percentile(latencies, 0.90) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'max_ms': round(max(latencies) * 1000, 2),
+            'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    return report
+
+
+def environment():
+    """Return what the numbers depend on besides the code: versions and the commit."""
+    import django
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.machine(),
+        'commit': commit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--choices', type=int, default=4, help='Choices per question.')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--votes', type=int, default=5000, help='Votes seeded before the run.')
+    parser.add_argument('--sessions', type=int, default=200, help='Voter sessions to run.')
+    parser.add_argument('--results-views', type=int, default=2, help='Results page views per session.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    options = parser.parse_args()
+
+    os.environ['POLLS_PROFILING'] = 'true'
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        started = time.perf_counter()
+        users, choices = seed(options.questions, options.choices, options.users, options.votes,
+                              PASSWORD, options.seed)
+        seeded = time.perf_counter() - started
+        sessions = plan(options.sessions, users, choices, options.results_views, random.Random(options.seed))
+        started = time.perf_counter()
+        samples = run(sessions, options.concurrency)
+        elapsed = time.perf_counter() - started
+
+    report = {
+        'config': {key: value for key, value in vars(options).items() if key != 'output'},
+        'environment': environment(),
+        'seed_seconds': round(seeded, 2),
+        'seconds': round(elapsed, 2),
+        'routes': summarize(samples, elapsed),
+    }
+    print(f"{'route':<8} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} "
+          f"{'p99 ms':>8} {'queries':>7}")
+    for route, stats in report['routes'].items():
+        print(f"{route:<8} {stats['requests']:>8} {stats['errors']:>6} {stats['requests_per_second']:>8} "
+              f"{stats['p50_ms']:>8} {stats['p90_ms']:>8} {stats['p99_ms']:>8} {stats['queries_per_request']!s:>7}")
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
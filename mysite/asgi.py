@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+# Serve the vote, detail and results pages with the async views in polls.async_views.
+os.environ.setdefault('POLLS_ASYNC_VIEWS', 'true')
+# Check the passwords of logins in a process per core (see polls.hashers).
+os.environ.setdefault('POLLS_HASH_WORKERS', str(os.cpu_count() or 1))
+# Sync ORM calls of async views run in threads that come and go, and a
+# persistent connection left in one of them is never closed.
+os.environ.setdefault('POLLS_DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
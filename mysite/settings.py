@@ -46,6 +46,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Does nothing unless POLLS_PROFILING is set.
+    'polls.profiling.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,8 +57,10 @@ MIDDLEWARE = [
 ]
 
 AUTHENTICATION_BACKENDS = (
-     # username/password authentication
-    'django.contrib.auth.backends.ModelBackend',  
+    # username/password authentication, with the logged-in users kept in the polls cache
+    'polls.auth.CachedModelBackend',
+    # still serves the sessions logged in before the cached backend was added
+    'django.contrib.auth.backends.ModelBackend',
 )
 
 LOGIN_REDIRECT_URL = 'main_index'
@@ -64,12 +68,20 @@ LOGOUT_REDIRECT_URL = 'main_index'
 
 ROOT_URLCONF = 'mysite.urls'
 
+# Templates are compiled once per process by the cached loader, and the
+# project's own ones at startup (see polls.templating). Under runserver the
+# cache is cleared whenever a template changes.
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -89,10 +101,161 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': env('POLLS_DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
     }
 }
 
+# POLLS_DB_PROFILE=production tunes SQLite for concurrent writers: WAL lets
+# readers run alongside the writer, BEGIN IMMEDIATE takes the write lock up
+# front so a busy writer waits out busy_timeout instead of failing with
+# "database is locked", and connections persist across requests.
+POLLS_DB_PROFILE = env('POLLS_DB_PROFILE', default='default')
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': env.int('POLLS_SQLITE_BUSY_TIMEOUT_MS', default=5000),
+    'mmap_size': env.int('POLLS_SQLITE_MMAP_SIZE', default=128 * 1024 * 1024),
+    # Negative sizes are in KiB.
+    'cache_size': env.int('POLLS_SQLITE_CACHE_SIZE', default=-32000),
+    'temp_store': 'MEMORY',
+}
+
+if POLLS_DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        # Persistent connections only help WSGI workers; under ASGI each request
+        # may run in a new thread, so mysite/asgi.py sets it to 0.
+        'CONN_MAX_AGE': env.int('POLLS_DB_CONN_MAX_AGE', default=600),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+        },
+    })
+
+# The results, index and API views read the polls tables from these aliases
+# (see polls.routers). POLLS_DB_READONLY adds a second connection to the
+# default file that refuses writes, so those reads never queue behind a write
+# transaction. POLLS_DB_REPLICAS adds one alias per file in the list, each a
+# copy of the default database kept fresh by `manage.py sync_replica`.
+POLLS_READ_DATABASES = []
+
+
+def read_only(name):
+    """Return the settings of a connection to the SQLite file that refuses writes."""
+    options = DATABASES['default'].get('OPTIONS', {})
+    return {
+        **DATABASES['default'],
+        'NAME': name,
+        'OPTIONS': {
+            **options,
+            'init_command': ';'.join([options.get('init_command', ''), 'PRAGMA query_only=ON']).lstrip(';'),
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+
+
+if env.bool('POLLS_DB_READONLY', default=False):
+    DATABASES['readonly'] = read_only(DATABASES['default']['NAME'])
+    POLLS_READ_DATABASES.append('readonly')
+
+for number, name in enumerate(env.list('POLLS_DB_REPLICAS', default=[]), 1):
+    # sync_replica swaps in a new file; a persistent connection would keep the old one.
+    DATABASES[f'replica{number}'] = {**read_only(name), 'CONN_MAX_AGE': 0}
+    POLLS_READ_DATABASES.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['polls.routers.ReadRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+# The polls cache is an in-process LRU per worker ('locmem') or a directory
+# shared by every worker on the host ('file'). Neither needs an outside service.
+# A write only makes the pages cached by its own worker stale, so with several
+# workers a locmem entry lives POLLS_LOCAL_CACHE_TIMEOUT seconds at most; 'file'
+# keeps every worker current and the entries for their full timeouts.
+POLLS_CACHE = env('POLLS_CACHE', default='locmem')
+
+POLLS_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'polls',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': env('POLLS_CACHE_LOCATION', default=str(BASE_DIR / '.polls_cache')),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'polls': {
+        **POLLS_CACHE_BACKENDS[POLLS_CACHE],
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('POLLS_CACHE_MAX_ENTRIES', default=10000),
+        },
+    },
+    # The {% cache %} fragments of the polls templates, keyed by question version.
+    'template_fragments': {
+        **POLLS_CACHE_BACKENDS[POLLS_CACHE],
+        'LOCATION': env('POLLS_FRAGMENT_CACHE_LOCATION', default=str(BASE_DIR / '.polls_fragments')),
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('POLLS_FRAGMENT_CACHE_MAX_ENTRIES', default=10000),
+        },
+    },
+    # The vote rate limits of polls.ratelimit. A locmem cache limits each worker
+    # on its own; a file cache shares the limits between the workers of a host,
+    # and kept on a tmpfs such as /dev/shm it stays in shared memory.
+    'ratelimit': {
+        **POLLS_CACHE_BACKENDS[env('POLLS_RATE_LIMIT_CACHE', default=POLLS_CACHE)],
+        'LOCATION': env('POLLS_RATE_LIMIT_CACHE_LOCATION', default=str(BASE_DIR / '.polls_ratelimit')),
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('POLLS_RATE_LIMIT_CACHE_MAX_ENTRIES', default=100000),
+        },
+    },
+    # The logged-in users of polls.auth.CachedModelBackend. Always locmem, even
+    # with POLLS_CACHE=file, so their password hashes are never written to disk.
+    'users': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'polls-users',
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('POLLS_USER_CACHE_MAX_ENTRIES', default=10000),
+        },
+    },
+}
+
+
+# Sessions and messages
+# https://docs.djangoproject.com/en/3.1/topics/http/sessions/#configuring-the-session-engine
+
+# By default ('database') sessions live in django_session, next to the votes,
+# and every login, logout and message writes there under the same lock.
+# 'cache' keeps them in the 'sessions' cache, of the same kind as the polls
+# one: a locmem cache only suits a single worker and loses the sessions when it
+# restarts, so several workers need POLLS_CACHE=file. 'signed_cookies' keeps
+# them in the browser. Both also keep the messages in a cookie.
+POLLS_SESSION_PROFILE = env('POLLS_SESSION_PROFILE', default='database')
+
+if POLLS_SESSION_PROFILE == 'cache':
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+    SESSION_CACHE_ALIAS = 'sessions'
+    CACHES['sessions'] = {
+        **POLLS_CACHE_BACKENDS[POLLS_CACHE],
+        'LOCATION': env('POLLS_SESSION_CACHE_LOCATION', default=str(BASE_DIR / '.polls_sessions')),
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('POLLS_SESSION_CACHE_MAX_ENTRIES', default=100000),
+        },
+    }
+elif POLLS_SESSION_PROFILE == 'signed_cookies':
+    SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+
+if POLLS_SESSION_PROFILE != 'database':
+    MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -112,6 +275,26 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# https://docs.djangoproject.com/en/3.1/topics/auth/passwords/
+
+# New passwords are hashed with POLLS_PASSWORD_HASHER: 'pbkdf2', 'scrypt' or
+# 'argon2' (which needs argon2-cffi), at the cost set in polls/settings.py.
+# The others still check existing hashes, which are rehashed at the next login.
+POLLS_PASSWORD_HASHER = env('POLLS_PASSWORD_HASHER', default='pbkdf2')
+
+POLLS_PASSWORD_HASHERS = {
+    'pbkdf2': 'polls.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'polls.hashers.ScryptPasswordHasher',
+    'argon2': 'polls.hashers.Argon2PasswordHasher',
+}
+
+PASSWORD_HASHERS = [
+    POLLS_PASSWORD_HASHERS[POLLS_PASSWORD_HASHER],
+    *(path for name, path in POLLS_PASSWORD_HASHERS.items() if name != POLLS_PASSWORD_HASHER),
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
@@ -122,8 +305,6 @@ TIME_ZONE = 'Asia/Bangkok'
 
 USE_I18N = True
 
-USE_L10N = True
-
 USE_TZ = True
 
 
@@ -16,6 +16,9 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from polls import async_views
+from polls.settings import ASYNC_VIEWS
+
 from . import views
 
 urlpatterns = [
@@ -24,3 +27,6 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('django.contrib.auth.urls')),
 ]
+
+if ASYNC_VIEWS:
+    urlpatterns.insert(-1, path('accounts/login/', async_views.login, name='login'))
@@ -1,7 +1,15 @@
 """Admin page for managing the questions."""
+import datetime
+
 from django.contrib import admin
+from django.db.models import BooleanField, Count, ExpressionWrapper, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 
+from . import export
 from .models import Choice, Question
+from .pagination import EstimatedCountPaginator
+from .search import search_questions
 
 
 class ChoiceInline(admin.TabularInline):
@@ -19,9 +27,63 @@ class QuestionAdmin(admin.ModelAdmin):
         ('Date information', {'fields': ['pub_date', 'end_date'], 'classes': ['collapse']}),
     ]
     inlines = [ChoiceInline]
-    list_display = ('question_text', 'pub_date', 'end_date', 'was_published_recently', 'is_published', 'can_vote')
+    list_display = ('question_text', 'pub_date', 'end_date', 'was_published_recently', 'is_published', 'can_vote',
+                    'choice_count', 'total_votes')
+    # Both dates are indexed (see Question.Meta.indexes).
     list_filter = ['pub_date', 'end_date']
     search_fields = ['question_text']
+    actions = ['export_votes_csv', 'export_votes_ndjson']
+    # Count a large table by estimate and skip the second, unfiltered count.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        """Compute the state of each question in SQL against one now, and count its choices in the same query."""
+        now = timezone.now()
+        return super().get_queryset(request).annotate(
+            recent=ExpressionWrapper(Q(pub_date__gte=now - datetime.timedelta(days=1), pub_date__lte=now),
+                                     output_field=BooleanField()),
+            published=ExpressionWrapper(Q(pub_date__lte=now), output_field=BooleanField()),
+            votable=ExpressionWrapper(Q(pub_date__lte=now, end_date__gt=now), output_field=BooleanField()),
+            choice_count=Count('choice'),
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search the question texts through their full-text index."""
+        return search_questions(queryset, search_term), False
+
+    @admin.display(boolean=True, ordering='recent', description='Published recently?')
+    def was_published_recently(self, question):
+        return question.recent
+
+    @admin.display(boolean=True, ordering='published', description='Is published?')
+    def is_published(self, question):
+        return question.published
+
+    @admin.display(boolean=True, ordering='votable', description='Can vote?')
+    def can_vote(self, question):
+        return question.votable
+
+    @admin.display(ordering='choice_count', description='Choices')
+    def choice_count(self, question):
+        return question.choice_count
+
+    def export_votes(self, queryset, format):
+        """Return a download streaming the votes of the selected questions."""
+        lines = export.lines(export.votes(questions=queryset.values('pk')), format)
+        response = StreamingHttpResponse(lines, content_type=export.CONTENT_TYPES[format])
+        response['Content-Disposition'] = f'attachment; filename="votes.{format}"'
+        return response
+
+    @admin.action(description="Export the votes of the selected questions as CSV")
+    def export_votes_csv(self, request, queryset):
+        """Download the votes of the selected questions as CSV."""
+        return self.export_votes(queryset, 'csv')
+
+    @admin.action(description="Export the votes of the selected questions as NDJSON")
+    def export_votes_ndjson(self, request, queryset):
+        """Download the votes of the selected questions as NDJSON."""
+        return self.export_votes(queryset, 'ndjson')
 
 
 admin.site.register(Question, QuestionAdmin)
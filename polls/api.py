@@ -0,0 +1,100 @@
+"""Read-only JSON API for the questions, their choices and their vote tallies.
+
+The endpoints read the same versioned cache as the HTML pages, from rows
+loaded with values(), and answer conditional GETs with their own ETags.
+?fields= picks the keys of each question, and the question list pages
+with the same ?before= cursor as the index.
+"""
+from django.core.exceptions import BadRequest
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_safe
+
+from . import pages
+from .routers import read_from_replicas
+from .conditional import (
+    api_index_etag, api_index_last_modified, api_question_etag, api_question_last_modified, api_timeseries_etag,
+    cache_policy,
+)
+from .models import VoteRollup
+
+# The keys a question can be returned with when ?fields= selects them; all of them by default.
+QUESTION_FIELDS = ('id', 'question_text', 'pub_date', 'end_date', 'total_votes', 'is_open')
+
+
+def json_response(data):
+    """Return the data as compact JSON."""
+    return JsonResponse(data, json_dumps_params={'separators': (',', ':')})
+
+
+def requested_fields(request, allowed):
+    """Return the fields ?fields= selects, or all the allowed ones; raise BadRequest for one that is not allowed."""
+    fields = request.GET.get('fields')
+    if not fields:
+        return allowed
+    fields = tuple(fields.split(','))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def select(row, fields):
+    """Return the fields of a row."""
+    return {field: row[field] for field in fields}
+
+
+@require_safe
+@read_from_replicas
+@cache_policy('api')
+@condition(etag_func=api_index_etag, last_modified_func=api_index_last_modified)
+def questions(request):
+    """List the published questions, newest first, a page at a time."""
+    fields = requested_fields(request, QUESTION_FIELDS)
+    rows, next_cursor = pages.api_index(request)
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query['before'] = next_cursor
+        next_url = f'{request.path}?{query.urlencode()}'
+    return json_response({'results': [select(row, fields) for row in rows], 'next': next_url})
+
+
+@require_safe
+@read_from_replicas
+@cache_policy('api')
+@condition(etag_func=api_question_etag, last_modified_func=api_question_last_modified)
+def question(request, pk):
+    """Show a question and its choices."""
+    fields = requested_fields(request, QUESTION_FIELDS + ('choices',))
+    row = pages.api_question(request, pk)
+    return json_response(select(dict(row, is_open=pages.is_open(row)), fields))
+
+
+@require_safe
+@read_from_replicas
+@cache_policy('api')
+@condition(etag_func=api_question_etag, last_modified_func=api_question_last_modified)
+def tallies(request, pk):
+    """Show the vote count of each choice of a question."""
+    row = pages.api_question(request, pk)
+    return json_response({
+        'id': row['id'],
+        'total_votes': sum(choice['votes'] for choice in row['choices']),
+        'choices': [{'id': choice['id'], 'votes': choice['votes']} for choice in row['choices']],
+    })
+
+
+@require_safe
+@read_from_replicas
+@cache_policy('api')
+@condition(etag_func=api_timeseries_etag, last_modified_func=api_question_last_modified)
+def timeseries(request, pk):
+    """Show how the votes of each choice changed per ?resolution=hour (the default) or minute.
+
+    'votes' holds one list per bucket in 'buckets', with the change of each
+    choice in 'choices' during that bucket; buckets without votes are left out.
+    """
+    resolution = request.GET.get('resolution', 'hour')
+    if resolution not in VoteRollup.RESOLUTIONS:
+        raise BadRequest(f"Unknown resolution: {resolution}")
+    return json_response(pages.api_timeseries(request, pk, resolution))
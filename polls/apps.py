@@ -6,3 +6,23 @@ class PollsConfig(AppConfig):
     """Polls configuration object store metadata for an application."""
 
     name = 'polls'
+    default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        """Configure the polls logging, keep cached users fresh and compile the templates.
+
+        The vote buffer, when it is enabled, starts with the first request; a
+        misconfigured vote journal stops the process here instead.
+        """
+        from django.core.signals import request_started
+
+        from . import auth, ingest, logs, templating
+        from .settings import PRECOMPILE_TEMPLATES
+
+        logs.configure()
+        auth.connect()
+        if PRECOMPILE_TEMPLATES:
+            templating.precompile()
+        if ingest.is_buffered():
+            ingest.check_journal()
+            request_started.connect(ingest.start_on_first_request)
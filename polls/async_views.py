@@ -0,0 +1,114 @@
+"""Async versions of the vote, detail, results and login views for ASGI servers.
+
+They read through Django's async ORM and login_required's async support,
+so under uvicorn or daphne a request is not handed to the sync thread
+pool as a whole. Saving a vote still runs in one sync_to_async call,
+because Django transactions are not available in async code.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import LoginView
+from django.db import close_old_connections
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.views.decorators.http import condition
+
+from . import ingest, pages, stream
+from .conditional import cache_policy, results_etag, results_last_modified
+from .models import Choice, Question, Vote
+from .routers import read_from_replicas, stick_to_primary
+from .logs import log_event
+from .views import get_client_ip
+
+
+@login_required
+async def vote(request, question_id):
+    """Vote a choice in the question."""
+    question = await aget_object_or_404(Question, pk=question_id)
+    if not question.can_vote():
+        # A closed poll's results may already be frozen in its snapshot.
+        messages.error(request, "This Question can not vote")
+        return redirect('polls:index')
+    user = await request.auser()
+    try:
+        selected_choice = await question.choice_set.aget(pk=request.POST['choice'])
+    except (KeyError, Choice.DoesNotExist):
+        # Redisplay the question voting form.
+        return TemplateResponse(request, 'polls/detail.html', {
+            'question': question,
+            'choices': [choice async for choice in question.choice_set.all()],
+            'error_message': "You didn't select a choice.",
+        })
+    if ingest.is_buffered():
+        ingest.vote_buffer.submit(user.pk, question.pk, selected_choice.pk)
+        messages.success(request, "Your vote has been received!!")
+    else:
+        vote, created = await sync_to_async(Vote.cast)(user, selected_choice)
+        if created:
+            messages.success(request, "Successfully voted!!")
+        else:
+            messages.success(request, "Replaces your previous vote successful!!")
+    log_event('vote', user_id=user.pk, ip=get_client_ip(request), question_id=question.pk,
+              choice_id=selected_choice.pk, buffered=ingest.is_buffered())
+    return stick_to_primary(HttpResponseRedirect(reverse('polls:results', args=(question.id,))))
+
+
+@login_required
+async def vote_for_poll(request, pk):
+    """Show the detail only valid question."""
+    question = await aget_object_or_404(pages.detail_questions(await request.auser()), pk=pk)
+    if not question.can_vote():
+        messages.error(request, "This Question can not vote")
+        return redirect('polls:index')
+    choices = [choice async for choice in question.choice_set.all()]
+    return TemplateResponse(request, 'polls/detail.html', pages.detail_context(question, choices))
+
+
+@cache_policy('results')
+@condition(etag_func=results_etag, last_modified_func=results_last_modified)
+async def render_results(request, pk):
+    """Render a results page whose data pages.aresults has already loaded."""
+    question, choices = request.polls_results
+    context = pages.results_context(question, choices)
+    context['stream_url'] = reverse('polls:results_stream', args=(question.id,))
+    return TemplateResponse(request, 'polls/results.html', context)
+
+
+@read_from_replicas
+async def results(request, pk):
+    """Show the result page, answering 304 Not Modified when the client's copy is current."""
+    # Load the data first, so the ETag and Last-Modified functions read it without a query.
+    await pages.aresults(request, pk)
+    return await render_results(request, pk)
+
+
+@read_from_replicas
+async def results_stream(request, pk):
+    """Stream the question's vote tallies as Server-Sent Events while the page is open."""
+    # Answer 404 for an unknown question before the stream starts.
+    await pages.aresults(request, pk)
+    response = StreamingHttpResponse(stream.events(pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx-style proxies from buffering the events.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _login(request, *args, **kwargs):
+    try:
+        return LoginView.as_view()(request, *args, **kwargs)
+    finally:
+        # Connections of this thread are not closed by the request_finished signal.
+        close_old_connections()
+
+
+async def login(request, *args, **kwargs):
+    """Django's login view, run outside the one thread that sync views share under ASGI.
+
+    Logins then check their passwords side by side, in polls.hashers' process
+    pool when it is on, instead of one after the other.
+    """
+    return await sync_to_async(_login, thread_sensitive=False)(request, *args, **kwargs)
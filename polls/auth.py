@@ -0,0 +1,58 @@
+"""Serve the users of logged-in sessions from the 'users' cache.
+
+AuthenticationMiddleware looks request.user up through the backend that
+logged the session in, so with CachedModelBackend first in
+AUTHENTICATION_BACKENDS an authenticated request reads auth_user once per
+USER_CACHE_TIMEOUT instead of on every request. The session auth hash is
+still checked against the cached user, and saving or deleting a user drops
+its entry; other workers' entries expire with the timeout.
+
+The cached users carry their password hashes, so the 'users' cache is a
+locmem one whatever POLLS_CACHE says: they never leave the worker's memory.
+"""
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from . import cache
+from .settings import USER_CACHE_ALIAS, USER_CACHE_TIMEOUT
+
+
+def user_key(user_id):
+    """Return the cache key of the user."""
+    return f'polls:user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user() is cached for USER_CACHE_TIMEOUT seconds."""
+
+    def get_user(self, user_id):
+        """Return the active user with the id, or None."""
+        return cache.remember('users', user_key(user_id), partial(super().get_user, user_id), USER_CACHE_TIMEOUT,
+                              alias=USER_CACHE_ALIAS)
+
+    async def aget_user(self, user_id):
+        """Like get_user(), from async code."""
+        return await cache.aremember(
+            'users', user_key(user_id), partial(super().aget_user, user_id), USER_CACHE_TIMEOUT,
+            alias=USER_CACHE_ALIAS,
+        )
+
+
+def forget_user(sender, instance, **kwargs):
+    """Drop the cached copy of a saved or deleted user, now and once the change is committed."""
+    forget = partial(caches[USER_CACHE_ALIAS].delete, user_key(instance.pk))
+    forget()
+    # A request may cache the old row again before the change commits.
+    transaction.on_commit(forget)
+
+
+def connect():
+    """Drop cached users when the user model changes."""
+    user_model = get_user_model()
+    post_save.connect(forget_user, sender=user_model, dispatch_uid='polls_forget_user_saved')
+    post_delete.connect(forget_user, sender=user_model, dispatch_uid='polls_forget_user_deleted')
@@ -0,0 +1,123 @@
+"""Versioned caching of the polls pages on top of Django's cache framework.
+
+Every question has a version number kept in the cache, and the index page
+has one of its own. Cached entries embed the version in their key, so
+bumping the version on a write makes every older entry unreachable.
+
+The versions live in the polls cache, so with a locmem cache a bump only
+reaches the worker that made the write. Entries of a locmem cache therefore
+live at most LOCAL_CACHE_TIMEOUT seconds, which bounds how long another
+worker serves the old page; a file cache shares the versions between workers.
+"""
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from . import settings as polls_settings
+from .metrics import registry
+from .routers import reads_may_lag, reads_own_writes
+
+MISSING = object()
+
+
+def polls_cache():
+    """Return the cache the polls pages are stored in."""
+    return caches[polls_settings.CACHE_ALIAS]
+
+
+def _version(key):
+    version = polls_cache().get(key)
+    if version is None:
+        # A fresh version is never one an evicted key could have had before.
+        polls_cache().add(key, time.time_ns(), None)
+        version = polls_cache().get(key, time.time_ns())
+    return version
+
+
+def _bump(key):
+    def bump():
+        polls_cache().set(key, time.time_ns(), None)
+    # Bump at once so this process stops serving the old entry, and again after
+    # commit so nothing cached from the uncommitted state outlives the write.
+    bump()
+    transaction.on_commit(bump)
+
+
+def question_version(question_id):
+    """Return the current cache version of a question."""
+    return _version(f'polls:version:question:{question_id}')
+
+
+def index_version():
+    """Return the current cache version of the index page."""
+    return _version('polls:version:index')
+
+
+def bump_question(question_id):
+    """Make every cached page of the question stale."""
+    _bump(f'polls:version:question:{question_id}')
+
+
+def bump_index():
+    """Make every cached index page stale."""
+    _bump('polls:version:index')
+
+
+def remember(name, key, compute, timeout=None, alias=None):
+    """Return the cached value of the key, computing and storing it on a miss.
+
+    Hits and misses are counted in the metrics registry under the name. The
+    timeout may be a callable that picks the timeout from the computed value.
+    Nothing is stored while a transaction is open. The value is kept in the
+    polls cache, or in the cache of the alias when one is given.
+    """
+    cache = caches[alias] if alias else polls_cache()
+    key = _primary_key(key)
+    value = _lookup(cache, name, key)
+    if value is MISSING:
+        value = compute()
+        _store(cache, key, value, timeout)
+    return value
+
+
+async def aremember(name, key, compute, timeout=None, alias=None):
+    """Like remember(), for a compute coroutine function such as an async ORM query."""
+    cache = caches[alias] if alias else polls_cache()
+    key = _primary_key(key)
+    value = _lookup(cache, name, key)
+    if value is MISSING:
+        value = await compute()
+        _store(cache, key, value, timeout)
+    return value
+
+
+def _primary_key(key):
+    # An entry read from a lagging replica under the current version may predate
+    # the client's own write, so a client kept on the primary has entries of its own.
+    return f'{key}:primary' if reads_own_writes() else key
+
+
+def _lookup(cache, name, key):
+    value = cache.get(key, MISSING)
+    registry.inc(f'polls_cache_{name}_{"misses" if value is MISSING else "hits"}_total')
+    return value
+
+
+def _store(cache, key, value, timeout):
+    # A value read inside an uncommitted transaction may describe rows a rollback removes.
+    if not transaction.get_connection().in_atomic_block:
+        timeout = timeout(value) if callable(timeout) else timeout
+        if reads_may_lag():
+            # A replica behind the primary must not fill the new version's key
+            # with the old counts for longer than it can lag.
+            timeout = _cap(timeout, polls_settings.REPLICA_LAG)
+        if isinstance(cache, LocMemCache) and polls_settings.LOCAL_CACHE_TIMEOUT:
+            # Other workers' writes do not bump this process's versions.
+            timeout = _cap(timeout, polls_settings.LOCAL_CACHE_TIMEOUT)
+        cache.set(key, value, timeout)
+
+
+def _cap(timeout, seconds):
+    return seconds if timeout is None else min(timeout, seconds)
@@ -0,0 +1,128 @@
+"""ETag, Last-Modified and Cache-Control for the results and index pages.
+
+The validators come from the same cached data the pages render, so a
+304 Not Modified costs no template rendering and, on a cache hit, no query.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.messages import get_messages
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+
+from . import pages
+from .settings import CACHE_CONTROL
+
+
+def stamp(moment):
+    """Return a datetime as whole microseconds, for use in an ETag."""
+    return int(moment.timestamp() * 1000000)
+
+
+def results_etag(request, pk):
+    """Return the ETag of a results page: the question's version and modification time."""
+    question, choices = pages.results(request, pk)
+    return f'"results-{question.pk}-{question.version}-{stamp(question.modified_at)}"'
+
+
+def results_last_modified(request, pk):
+    """Return when the question, its choices or its votes last changed."""
+    question, choices = pages.results(request, pk)
+    return question.modified_at
+
+
+def index_is_shared(request):
+    """Return True if the index page depends on nothing but its questions.
+
+    A logged-in user's page holds their name and the CSRF token of the logout
+    form, which a new login rotates, and messages are shown only once.
+    """
+    return not request.user.is_authenticated and not len(get_messages(request))
+
+
+def index_etag(request):
+    """Return the ETag of an index page, or None if the page is not index_is_shared()."""
+    if not index_is_shared(request):
+        return None
+    page, next_cursor = pages.index(request)
+    rows = ','.join(f'{question.pk}.{question.version}.{int(question.is_open)}' for question in page)
+    digest = hashlib.sha1(f'{rows}|{next_cursor}'.encode()).hexdigest()
+    return f'"index-{digest}"'
+
+
+def index_last_modified(request):
+    """Return the last change to the questions on an index page, counting the times they opened and closed."""
+    if not index_is_shared(request):
+        return None
+    page, next_cursor = pages.index(request)
+    now = timezone.now()
+    moments = [question.modified_at for question in page] + [question.pub_date for question in page]
+    moments += [question.end_date for question in page if question.end_date <= now]
+    return max(moments, default=None)
+
+
+def cache_policy(name):
+    """Decorate a sync or async view to send the Cache-Control directives configured for the page."""
+    def apply(request, response):
+        if request.method in ('GET', 'HEAD'):
+            patch_cache_control(response, **CACHE_CONTROL[name])
+        return response
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapped(request, *args, **kwargs):
+                return apply(request, await view(request, *args, **kwargs))
+        else:
+            @wraps(view)
+            def wrapped(request, *args, **kwargs):
+                return apply(request, view(request, *args, **kwargs))
+        return wrapped
+    return decorator
+
+
+def fields_tag(request):
+    """Return a short digest of the fields an API request selects, for use in an ETag."""
+    return hashlib.sha1(request.GET.get('fields', '').encode()).hexdigest()[:8]
+
+
+def api_index_etag(request):
+    """Return the ETag of a page of the API's question list."""
+    rows, next_cursor = pages.api_index(request)
+    rows = ','.join(f"{row['id']}.{row['version']}.{int(row['is_open'])}" for row in rows)
+    digest = hashlib.sha1(f'{rows}|{next_cursor}'.encode()).hexdigest()
+    return f'"api-index-{digest}-{fields_tag(request)}"'
+
+
+def api_index_last_modified(request):
+    """Return the last change to the questions on a page of the API's question list."""
+    rows, next_cursor = pages.api_index(request)
+    now = timezone.now()
+    moments = [row['modified_at'] for row in rows] + [row['pub_date'] for row in rows]
+    moments += [row['end_date'] for row in rows if row['end_date'] <= now]
+    return max(moments, default=None)
+
+
+def api_question_state(request, pk):
+    """Return what the API representations of a question depend on: its version, modification time and state."""
+    question = pages.api_question(request, pk)
+    return f'{pk}-{question["version"]}-{stamp(question["modified_at"])}-{int(pages.is_open(question))}'
+
+
+def api_question_etag(request, pk):
+    """Return the ETag of a question or its tallies in the API."""
+    return f'"api-question-{api_question_state(request, pk)}-{fields_tag(request)}"'
+
+
+def api_timeseries_etag(request, pk):
+    """Return the ETag of a question's time series at the requested resolution."""
+    return f'"api-timeseries-{api_question_state(request, pk)}-{request.GET.get("resolution", "hour")}"'
+
+
+def api_question_last_modified(request, pk):
+    """Return when the question, its choices or its votes last changed, counting the times it opened and closed."""
+    question = pages.api_question(request, pk)
+    now = timezone.now()
+    moments = [question[field] for field in ('pub_date', 'end_date') if question[field] <= now]
+    return max([question['modified_at']] + moments)
@@ -0,0 +1,80 @@
+"""Streaming export of the votes as CSV or NDJSON.
+
+The votes are read with values_list() joins through QuerySet.iterator(),
+which fetches them in chunks (from a server-side cursor where the database
+has one), and each row is encoded as soon as it is read. Memory use stays
+the same however many votes are exported.
+"""
+import csv
+import datetime
+import json
+
+from django.utils import timezone
+
+from .models import Vote
+
+COLUMNS = ('vote_id', 'question_id', 'question_text', 'choice_id', 'choice_text', 'user_id', 'username')
+FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+# Rows fetched from the database at a time.
+CHUNK_SIZE = 2000
+
+
+def parse_moment(value):
+    """Return an aware datetime from an ISO 8601 date or date and time."""
+    moment = datetime.datetime.fromisoformat(value)
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def votes(questions=None, since=None, until=None, status=''):
+    """Return the votes to export as tuples in COLUMNS order, oldest first.
+
+    Keyword arguments:
+    questions -- ids (or a queryset) of the questions to export, all by default
+    since, until -- export only questions published in this range
+    status -- 'open' or 'closed' to export only those questions
+    """
+    queryset = Vote.objects.all()
+    if questions is not None:
+        queryset = queryset.filter(question__in=questions)
+    if since is not None:
+        queryset = queryset.filter(question__pub_date__gte=since)
+    if until is not None:
+        queryset = queryset.filter(question__pub_date__lt=until)
+    now = timezone.now()
+    if status == 'open':
+        queryset = queryset.filter(question__pub_date__lte=now, question__end_date__gt=now)
+    elif status == 'closed':
+        queryset = queryset.filter(question__end_date__lte=now)
+    return queryset.order_by('pk').values_list(
+        'pk', 'question_id', 'question__question_text', 'user_choice_id', 'user_choice__choice_text',
+        'user_id', 'user__username',
+    )
+
+
+class Line:
+    """A file-like object whose write() returns the line written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    """Yield the header and the rows as CSV lines."""
+    writer = csv.writer(Line())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    """Yield the rows as newline-delimited JSON objects."""
+    for row in rows:
+        yield json.dumps(dict(zip(COLUMNS, row))) + '\n'
+
+
+def lines(queryset, format, chunk_size=CHUNK_SIZE):
+    """Yield the encoded lines of the votes, reading chunk_size rows at a time."""
+    encode = csv_lines if format == 'csv' else ndjson_lines
+    return encode(queryset.iterator(chunk_size=chunk_size))
@@ -0,0 +1,82 @@
+"""Password hashers with their cost read from polls.settings, optionally run in a process pool.
+
+POLLS_PASSWORD_HASHER in mysite/settings.py puts one of these first in
+PASSWORD_HASHERS. Each keeps the algorithm name of the Django hasher it
+extends, so the hashes are interchangeable; a password stored with another
+hasher or another cost is rehashed with the first one when its user next
+logs in (django.contrib.auth.hashers.check_password does that).
+
+With HASH_WORKERS set, verify() and encode() run in a pool of that many
+processes, so password checks use every core without holding the thread
+or the GIL of the server process. mysite/asgi.py turns it on together
+with polls.async_views.login.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import hashers
+from django.utils.module_loading import import_string
+
+from .settings import (
+    ARGON2_MEMORY_COST, ARGON2_PARALLELISM, ARGON2_TIME_COST, HASH_WORKERS, PBKDF2_ITERATIONS, SCRYPT_WORK_FACTOR,
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_worker = False
+
+
+def _start_worker():
+    global _in_worker
+    _in_worker = True
+
+
+def hash_pool():
+    """Return the process pool hashing passwords, or None to hash them in the calling thread."""
+    global _pool
+    if _in_worker or not HASH_WORKERS:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process may be running threads.
+            _pool = ProcessPoolExecutor(HASH_WORKERS, multiprocessing.get_context('spawn'),
+                                        initializer=_start_worker)
+    return _pool
+
+
+def _call(path, method, args):
+    return getattr(import_string(path)(), method)(*args)
+
+
+class PooledHasherMixin:
+    """Run verify() and encode() of the hasher in hash_pool()."""
+
+    def _run(self, method, *args):
+        pool = hash_pool()
+        if pool is None:
+            return getattr(super(), method)(*args)
+        path = f'{type(self).__module__}.{type(self).__qualname__}'
+        return pool.submit(_call, path, method, args).result()
+
+    def verify(self, password, encoded):
+        return self._run('verify', password, encoded)
+
+    def encode(self, password, salt, *args):
+        return self._run('encode', password, salt, *args)
+
+
+class PBKDF2PasswordHasher(PooledHasherMixin, hashers.PBKDF2PasswordHasher):
+    iterations = PBKDF2_ITERATIONS
+
+
+class ScryptPasswordHasher(PooledHasherMixin, hashers.ScryptPasswordHasher):
+    work_factor = SCRYPT_WORK_FACTOR
+
+
+class Argon2PasswordHasher(PooledHasherMixin, hashers.Argon2PasswordHasher):
+    """Needs the argon2-cffi package."""
+
+    time_cost = ARGON2_TIME_COST
+    memory_cost = ARGON2_MEMORY_COST
+    parallelism = ARGON2_PARALLELISM
@@ -0,0 +1,164 @@
+"""Bulk import of questions, choices and historical votes.
+
+Every input row names a question by its text and publication date, and may
+name one of its choices and a user who voted for it:
+
+    question_text, pub_date, end_date, choice_text, username
+
+The rows are read one at a time and written a chunk at a time. A chunk
+looks up the questions, choices and users it names with one query each,
+creates the missing ones with bulk_create and casts its votes with
+Vote.cast_many, so importing a chunk again changes nothing. That makes an
+import safe to restart from the last committed chunk.
+"""
+import csv
+import json
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import cache
+from .export import parse_moment
+from .models import Choice, Question, Vote, touch_questions
+
+FORMATS = ('csv', 'jsonl')
+
+# What to do with a vote for a question the user already voted on.
+ON_CONFLICT = ('update', 'skip')
+
+
+class InvalidRow(ValueError):
+    """A row that cannot be imported."""
+
+
+def read_rows(file, format):
+    """Yield the rows of an open CSV or JSON Lines file as dicts."""
+    if format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def clean(row, number):
+    """Return the (question key, end_date, choice_text, username) a row names."""
+    try:
+        question = (row['question_text'], parse_moment(row['pub_date']))
+        end_date = parse_moment(row['end_date']) if row.get('end_date') else None
+    except (KeyError, ValueError) as error:
+        raise InvalidRow(f"Row {number}: a question needs question_text and ISO 8601 pub_date ({error}).")
+    choice_text, username = row.get('choice_text') or None, row.get('username') or None
+    if username and not choice_text:
+        raise InvalidRow(f"Row {number}: a vote needs a choice_text.")
+    return question, end_date, choice_text, username
+
+
+def import_chunk(rows, batch_size, on_conflict='update'):
+    """Write the (question key, end_date, choice_text, username) rows in one transaction.
+
+    Return the number of votes written.
+    """
+    with transaction.atomic():
+        questions = get_or_create_questions({question: end_date for question, end_date, _, _ in rows}, batch_size)
+        choices = get_or_create_choices(
+            {(questions[question], choice_text) for question, _, choice_text, _ in rows if choice_text}, batch_size
+        )
+        users = get_or_create_users({username for *_, username in rows if username}, batch_size)
+        votes = [
+            (users[username], questions[question], choices[(questions[question], choice_text)])
+            for question, _, choice_text, username in rows if username
+        ]
+        if on_conflict == 'skip':
+            existing = set(Vote.objects.filter(
+                question_id__in={question_id for _, question_id, _ in votes},
+                user_id__in={user_id for user_id, _, _ in votes},
+            ).values_list('user_id', 'question_id'))
+            votes = [vote for vote in votes if vote[:2] not in existing]
+        for start in range(0, len(votes), batch_size):
+            Vote.cast_many(votes[start:start + batch_size])
+        # bulk_create sends no post_save, so refresh the cached index here.
+        cache.bump_index()
+    return len(votes)
+
+
+def get_or_create_questions(end_dates, batch_size):
+    """Return the pk of each (question_text, pub_date) key, creating the missing questions."""
+    def existing():
+        rows = Question.objects.filter(question_text__in={text for text, _ in end_dates}).values_list(
+            'question_text', 'pub_date', 'pk')
+        return {(text, pub_date): pk for text, pub_date, pk in rows if (text, pub_date) in end_dates}
+
+    found = existing()
+    missing = [key for key in end_dates if key not in found]
+    for text, pub_date in missing:
+        if end_dates[(text, pub_date)] is None:
+            raise InvalidRow(f"The new question {text!r} needs an end_date.")
+    if missing:
+        Question.objects.bulk_create([
+            Question(question_text=text, pub_date=pub_date, end_date=end_dates[(text, pub_date)])
+            for text, pub_date in missing
+        ], batch_size=batch_size)
+        found = existing()
+    return found
+
+
+def get_or_create_choices(keys, batch_size):
+    """Return the pk of each (question_id, choice_text) key, creating the missing choices."""
+    def existing():
+        rows = Choice.objects.filter(question_id__in={question_id for question_id, _ in keys}).values_list(
+            'question_id', 'choice_text', 'pk')
+        return {(question_id, text): pk for question_id, text, pk in rows}
+
+    found = existing()
+    missing = [key for key in keys if key not in found]
+    if missing:
+        Choice.objects.bulk_create([Choice(question_id=question_id, choice_text=text)
+                                    for question_id, text in missing], batch_size=batch_size)
+        # bulk_create sends no post_save, so bump the questions' versions here.
+        touch_questions({question_id for question_id, _ in missing})
+        found = existing()
+    return found
+
+
+def get_or_create_users(usernames, batch_size):
+    """Return the pk of each username, creating the missing users without a usable password."""
+    def existing():
+        return dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+
+    found = existing()
+    missing = [username for username in usernames if username not in found]
+    if missing:
+        User.objects.bulk_create([User(username=username, password=make_password(None))
+                                  for username in missing], batch_size=batch_size)
+        found = existing()
+    return found
+
+
+def run(rows, chunk_size, batch_size, on_conflict='update', skip=0, progress=None):
+    """Import the rows a chunk at a time, after skipping the first ones.
+
+    progress(rows_done, votes_done, seconds) is called after each committed
+    chunk. Return the same three numbers for the whole run.
+    """
+    started = time.perf_counter()
+    done = skip
+    votes = 0
+    chunk = []
+    for number, row in enumerate(rows, start=1):
+        if number <= skip:
+            continue
+        chunk.append(clean(row, number))
+        if len(chunk) == chunk_size:
+            votes += import_chunk(chunk, batch_size, on_conflict)
+            done, chunk = number, []
+            if progress:
+                progress(done, votes, time.perf_counter() - started)
+    if chunk:
+        votes += import_chunk(chunk, batch_size, on_conflict)
+        done += len(chunk)
+        if progress:
+            progress(done, votes, time.perf_counter() - started)
+    return done, votes, time.perf_counter() - started
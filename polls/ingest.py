@@ -0,0 +1,295 @@
+"""Write-behind ingestion of votes: queue them in the request, write them in batches."""
+import atexit
+import collections
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_started
+from django.db import DataError, IntegrityError, close_old_connections
+
+from . import settings as polls_settings
+from .logs import log_event
+from .metrics import registry
+from .models import Vote
+
+logger = logging.getLogger("polls")
+
+
+class VoteJournal:
+    """An append-only file of queued votes and flush marks.
+
+    Each vote is a line {"seq": n, "vote": [user_id, question_id, choice_id]}.
+    A line {"flushed": n} records that every vote up to n is in the database.
+    A {pid} in the path is replaced by the process id, so each worker has a
+    journal of its own.
+    """
+
+    def __init__(self, path, fsync=True):
+        self.template = path
+        self.fsync = fsync
+        self.file = None
+
+    @property
+    def path(self):
+        """Return the path of this process's journal."""
+        return self.template.replace('{pid}', str(os.getpid()))
+
+    def open(self):
+        """Open the journal and lock it, failing if another process has it open.
+
+        Flush marks and truncation assume this process wrote every vote in the
+        file, so a second process sharing it could hide or erase the first's
+        unwritten votes.
+        """
+        if self.file is None:
+            journal = open(self.path, 'a', encoding='utf-8')
+            try:
+                fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                journal.close()
+                raise RuntimeError(f"The vote journal {self.path} is in use by another process; "
+                                   "put {pid} in POLLS_VOTE_JOURNAL to give each worker its own.")
+            self.file = journal
+        return self.file
+
+    def close(self):
+        """Close the journal, releasing its lock."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _write(self, record):
+        self.open()
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def append(self, seq, vote):
+        """Record a queued vote."""
+        self._write({'seq': seq, 'vote': list(vote)})
+
+    def mark_flushed(self, seq):
+        """Record that the votes up to seq are written."""
+        self._write({'flushed': seq})
+
+    def truncate(self):
+        """Empty the journal once nothing in it is waiting to be written."""
+        # Truncate in place, so the lock is kept.
+        self.open().truncate(0)
+
+    def replay(self):
+        """Return the (seq, vote) entries written after the last flush mark.
+
+        With {pid} in the path, the unwritten votes of the journals of processes
+        that are gone are moved into this one first.
+        """
+        self.open()
+        entries, last = read_journal(self.path)
+        return entries + self.adopt_orphans(last)
+
+    def adopt_orphans(self, seq):
+        """Append the unwritten votes of other processes' unlocked journals after seq, remove those and return them."""
+        if '{pid}' not in self.template:
+            return []
+        adopted = []
+        for path in sorted(glob.glob(glob.escape(self.template).replace('{pid}', '*'))):
+            if path == self.path:
+                continue
+            with open(path, 'a', encoding='utf-8') as orphan:
+                try:
+                    fcntl.flock(orphan, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # Its process is still running.
+                    continue
+                for _, vote in read_journal(path)[0]:
+                    seq += 1
+                    self.append(seq, vote)
+                    adopted.append((seq, vote))
+                os.unlink(path)
+        return adopted
+
+
+def read_journal(path):
+    """Return the (seq, vote) entries of a journal written after its last flush mark, and its last seq."""
+    entries = []
+    last = 0
+    with open(path, encoding='utf-8') as journal:
+        for line in journal:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash was never acknowledged to the voter.
+                continue
+            if 'flushed' in record:
+                entries = [entry for entry in entries if entry[0] > record['flushed']]
+                last = max(last, record['flushed'])
+            else:
+                entries.append((record['seq'], tuple(record['vote'])))
+                last = max(last, record['seq'])
+    return entries, last
+
+
+class VoteBuffer:
+    """Queue votes in memory and write them with Vote.cast_many from a background thread.
+
+    A batch is written when batch_size votes are waiting or flush_interval
+    seconds have passed. Within a batch the last vote of a user on a question wins.
+    """
+
+    def __init__(self, batch_size, flush_interval, journal=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.journal = journal
+        self.pending = collections.deque()
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.seq = 0
+        self.thread = None
+        self.stopping = False
+        registry.gauge('polls_vote_queue_depth', lambda: len(self.pending))
+
+    def submit(self, user_id, question_id, choice_id):
+        """Accept a vote, journal it and queue it for the flusher."""
+        vote = (user_id, question_id, choice_id)
+        with self.condition:
+            self.seq += 1
+            if self.journal is not None:
+                self.journal.append(self.seq, vote)
+            self.pending.append((self.seq, vote))
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify()
+        registry.inc('polls_votes_accepted_total')
+
+    def flush(self):
+        """Write one batch of queued votes and return how many were taken off the queue."""
+        with self.flush_lock:
+            with self.condition:
+                batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            try:
+                Vote.cast_many([vote for seq, vote in batch])
+            except Exception:
+                registry.inc('polls_vote_flush_errors_total')
+                logger.exception("Writing %d queued votes failed, writing them one by one", len(batch))
+                unwritten = self.write_each(batch)
+                if unwritten:
+                    with self.condition:
+                        self.pending.extendleft(reversed(unwritten))
+                    return len(batch) - len(unwritten)
+            else:
+                registry.observe('polls_vote_flush_seconds', time.perf_counter() - start)
+                registry.inc('polls_votes_flushed_total', len(batch))
+            if self.journal is not None:
+                with self.condition:
+                    if self.pending:
+                        self.journal.mark_flushed(batch[-1][0])
+                    else:
+                        self.journal.truncate()
+            return len(batch)
+
+    def write_each(self, batch):
+        """Write the votes of a failed batch one at a time and return those to retry later.
+
+        A vote the database rejects, say for a choice deleted since, is counted
+        and logged as dead-lettered and dropped, so it cannot hold up the queue.
+        Any other error, such as a locked database, leaves it and the votes
+        after it to retry.
+        """
+        for index, (seq, vote) in enumerate(batch):
+            try:
+                Vote.cast_many([vote])
+            except (IntegrityError, DataError) as error:
+                user_id, question_id, choice_id = vote
+                registry.inc('polls_votes_dead_lettered_total')
+                log_event('vote_dead_lettered', logging.ERROR, user_id=user_id, question_id=question_id,
+                          choice_id=choice_id, error=str(error))
+            except Exception:
+                logger.exception("Writing a queued vote failed, it stays queued")
+                return batch[index:]
+            else:
+                registry.inc('polls_votes_flushed_total')
+        return []
+
+    def replay(self):
+        """Queue again the journalled votes that never reached the database."""
+        if self.journal is None:
+            return 0
+        entries = self.journal.replay()
+        with self.condition:
+            self.pending.extendleft(reversed(entries))
+            self.seq = max([self.seq] + [seq for seq, vote in entries])
+        if entries:
+            logger.info("Replaying %d journalled votes", len(entries))
+        return len(entries)
+
+    def run(self):
+        """Flush batches until the buffer is stopped."""
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.stopping or len(self.pending) >= self.batch_size, self.flush_interval
+                )
+                stopping = self.stopping
+            close_old_connections()
+            while self.flush() == self.batch_size:
+                pass
+            if stopping:
+                return
+
+    def start(self):
+        """Replay the journal and start the background flusher, once."""
+        if self.thread is not None:
+            return
+        self.replay()
+        self.thread = threading.Thread(target=self.run, name='polls-vote-flusher', daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Write everything still queued and stop the flusher."""
+        if self.thread is None:
+            return
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join()
+        self.thread = None
+        self.stopping = False
+        if self.journal is not None:
+            self.journal.close()
+
+
+def is_buffered():
+    """Return True if votes go through the write-behind buffer."""
+    return polls_settings.VOTE_INGESTION_MODE == 'buffered'
+
+
+vote_buffer = VoteBuffer(
+    polls_settings.VOTE_BATCH_SIZE,
+    polls_settings.VOTE_FLUSH_INTERVAL,
+    VoteJournal(polls_settings.VOTE_JOURNAL, polls_settings.VOTE_JOURNAL_FSYNC)
+    if polls_settings.VOTE_JOURNAL else None,
+)
+
+
+def check_journal():
+    """Refuse to start with a journal path every worker would share."""
+    if polls_settings.VOTE_JOURNAL and '{pid}' not in polls_settings.VOTE_JOURNAL:
+        raise ImproperlyConfigured(
+            "POLLS_VOTE_JOURNAL must contain {pid}, so each worker process keeps a journal of its own."
+        )
+
+
+def start_on_first_request(sender, **kwargs):
+    """Start the flusher when the process serves its first request, so management commands never start it."""
+    request_started.disconnect(start_on_first_request)
+    vote_buffer.start()
@@ -0,0 +1,154 @@
+"""Structured event logging for the polls app, optionally written off the request thread.
+
+log_event() records an event name and its fields (user id, client IP,
+question id, ...) on the LogRecord instead of formatting them into the
+message. The formatters below render the fields as 'key=value' pairs on
+the console or as one JSON object per line in a file.
+
+With POLLS_LOG_QUEUE on, configure() puts a QueueHandler in front of the
+'polls' logger's handlers. The request thread then only enqueues the
+record, and a QueueListener thread formats it and does the I/O.
+"""
+import atexit
+import datetime
+import json
+import logging
+import logging.config
+import logging.handlers
+import queue
+import time
+
+from . import settings as polls_settings
+
+logger = logging.getLogger("polls")
+
+listener = None
+
+
+def log_event(event, level=logging.INFO, **fields):
+    """Log an event with its fields kept apart from the message."""
+    logger.log(level, event, extra={'event': event, 'fields': fields})
+
+
+class ConsoleFormatter(logging.Formatter):
+    """The plain console format, followed by an event's fields as key=value pairs."""
+
+    def format(self, record):
+        message = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            message += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as one JSON object: time, level, logger, event or message, and the event's fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+        }
+        if hasattr(record, 'event'):
+            entry['event'] = record.event
+            entry.update(record.fields)
+        else:
+            entry['message'] = record.getMessage()
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class BatchingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """A rotating file handler that writes its lines in batches.
+
+    A batch is written once it holds batch_size lines or its first line is
+    flush_interval seconds old, when flush() is called and when the handler
+    closes. Behind a BatchingQueueListener, flush() also runs whenever the
+    queue stays empty, so a quiet log is not held back; without one, nothing
+    writes the last batch before a quiet spell, so use batch_size=1 there.
+    """
+
+    def __init__(self, filename, batch_size=100, flush_interval=1.0, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lines = []
+        self.started = 0.0
+
+    def emit(self, record):
+        try:
+            line = self.format(record) + self.terminator
+        except Exception:
+            self.handleError(record)
+            return
+        if not self.lines:
+            self.started = time.monotonic()
+        self.lines.append(line)
+        if len(self.lines) >= self.batch_size or time.monotonic() - self.started >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.lines:
+                lines, self.lines = ''.join(self.lines), []
+                if self.stream is None:
+                    self.stream = self._open()
+                # Rotate on the size of the whole batch, then write it with one call.
+                if self.maxBytes > 0 and self.stream.tell() + len(lines) >= self.maxBytes:
+                    self.doRollover()
+                self.stream.write(lines)
+            super().flush()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """A QueueListener that flushes its handlers whenever the queue stays empty for flush_interval seconds."""
+
+    def __init__(self, records, *handlers, flush_interval=1.0, **kwargs):
+        super().__init__(records, *handlers, **kwargs)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, self.flush_interval if block else None)
+            except queue.Empty:
+                if not block:
+                    raise
+                for handler in self.handlers:
+                    handler.flush()
+
+
+def configure():
+    """Configure logging from polls.settings.LOGGING, moving the 'polls' handlers behind a queue when enabled."""
+    global listener
+    logging.config.dictConfig(polls_settings.LOGGING)
+    if not polls_settings.LOG_QUEUE or listener is not None:
+        return
+    handlers = list(logger.handlers)
+    records = queue.SimpleQueue()
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    listener = BatchingQueueListener(records, *handlers, respect_handler_level=True,
+                                     flush_interval=polls_settings.LOG_FLUSH_INTERVAL)
+    listener.start()
+    atexit.register(stop)
+
+
+def stop():
+    """Write out the queued records and stop the listener thread."""
+    global listener
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.flush()
+        listener = None
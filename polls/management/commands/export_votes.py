@@ -0,0 +1,48 @@
+"""Stream the votes to a file or standard output as CSV or NDJSON."""
+from django.core.management.base import BaseCommand
+
+from polls import export
+
+
+class Command(BaseCommand):
+    """Export the votes without loading them into memory."""
+
+    help = 'Export the votes as CSV or NDJSON, streaming them in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=export.FORMATS, default='csv')
+        parser.add_argument(
+            '--question', type=int, action='append', dest='questions',
+            help='Export only this question. May be given more than once.',
+        )
+        parser.add_argument(
+            '--since', type=export.parse_moment,
+            help='Export only questions published at or after this ISO 8601 date or time.',
+        )
+        parser.add_argument(
+            '--until', type=export.parse_moment,
+            help='Export only questions published before this ISO 8601 date or time.',
+        )
+        parser.add_argument('--status', choices=('open', 'closed'), default='')
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE)
+        parser.add_argument('--output', help='File to write to instead of standard output.')
+
+    def handle(self, *args, **options):
+        queryset = export.votes(options['questions'], options['since'], options['until'], options['status'])
+        lines = export.lines(queryset, options['format'], options['chunk_size'])
+        out = open(options['output'], 'w', newline='') if options['output'] else None
+        count = 0
+        try:
+            for line in lines:
+                if out:
+                    out.write(line)
+                else:
+                    self.stdout.write(line, ending='')
+                count += 1
+        finally:
+            if out:
+                out.close()
+        if options['format'] == 'csv':
+            # Not counting the header.
+            count -= 1
+        self.stderr.write(f"Exported {count} votes.")
@@ -0,0 +1,59 @@
+"""Snapshot the results of closed polls and optionally move their votes out of the Vote table."""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from polls import export
+from polls.models import Question, ResultSnapshot
+from polls.settings import FINALIZE_AFTER
+
+
+class Command(BaseCommand):
+    """Finalize closed questions, then archive or compact the votes of long-closed ones."""
+
+    help = ('Write a results snapshot for every closed question that has none. With --archive or --compact, '
+            'also remove the Vote rows of questions closed more than --older-than days ago.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Questions finalized per query.')
+        removal = parser.add_mutually_exclusive_group()
+        removal.add_argument('--archive', metavar='FILE', help='Export the votes to this file before removing them.')
+        removal.add_argument(
+            '--compact', action='store_true',
+            help='Remove the votes without exporting them; only the snapshots keep their counts.',
+        )
+        parser.add_argument('--format', choices=export.FORMATS, default='ndjson', help='Format of the --archive file.')
+        parser.add_argument(
+            '--older-than', type=float, default=30,
+            help='Days a question must have been closed before its votes are removed.',
+        )
+
+    def handle(self, *args, **options):
+        closed = Question.objects.filter(
+            end_date__lte=timezone.now() - datetime.timedelta(seconds=FINALIZE_AFTER), snapshot__isnull=True,
+        ).order_by('pk')
+        finalized = 0
+        while True:
+            batch = list(closed[:options['batch_size']])
+            if not batch:
+                break
+            finalized += len(ResultSnapshot.take(batch))
+        self.stdout.write(f"Finalized {finalized} questions.")
+
+        if not (options['archive'] or options['compact']):
+            return
+        question_ids = list(ResultSnapshot.objects.filter(
+            votes_archived=False, closed_at__lte=timezone.now() - datetime.timedelta(days=options['older_than']),
+        ).values_list('question_id', flat=True))
+        if not question_ids:
+            self.stdout.write("No votes to remove.")
+            return
+        if options['archive']:
+            try:
+                with open(options['archive'], 'x', newline='') as out:
+                    out.writelines(export.lines(export.votes(question_ids), options['format']))
+            except FileExistsError:
+                raise CommandError(f"{options['archive']} already exists; archives are never overwritten.")
+        removed = ResultSnapshot.archive_votes(question_ids)
+        self.stdout.write(f"Removed {removed} votes of {len(question_ids)} questions.")
@@ -0,0 +1,60 @@
+"""Import questions, choices and historical votes from a CSV or JSON Lines file."""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import importer
+
+
+class Command(BaseCommand):
+    """Bulk import polls, resuming after the last committed chunk of a failed run."""
+
+    help = (
+        'Import questions, choices and votes from CSV or JSON Lines rows with the columns '
+        'question_text, pub_date, end_date, choice_text and username.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=importer.FORMATS, help='Default: from the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows committed in each transaction.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows in each INSERT.')
+        parser.add_argument(
+            '--on-conflict', choices=importer.ON_CONFLICT, default='update',
+            help='Whether a vote replaces or keeps the vote the user already has on the question.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording the rows committed so far. Default: the input path with .checkpoint added.',
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start over.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        skip = 0
+        if os.path.exists(checkpoint) and not options['restart']:
+            with open(checkpoint) as file:
+                skip = int(file.read())
+            self.stdout.write(f"Resuming after row {skip}.")
+
+        def progress(rows, votes, seconds):
+            with open(checkpoint, 'w') as file:
+                file.write(str(rows))
+            self.stdout.write(f"{rows} rows, {votes} votes, {(rows - skip) / max(seconds, 0.001):.0f} rows/s")
+
+        with open(path, newline='') as file:
+            try:
+                rows, votes, seconds = importer.run(
+                    importer.read_rows(file, format), options['chunk_size'], options['batch_size'],
+                    options['on_conflict'], skip, progress,
+                )
+            except ValueError as error:
+                raise CommandError(f"{error} Fix the file and run the command again to resume.")
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        rate = (rows - skip) / max(seconds, 0.001)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {rows - skip} rows and {votes} votes in {seconds:.1f}s ({rate:.0f} rows/s)."
+        ))
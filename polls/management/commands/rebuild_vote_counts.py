@@ -0,0 +1,66 @@
+"""Rebuild or verify the vote counters on Choice and Question from the Vote table."""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from polls.models import Choice, Question, Vote, touch_questions
+
+# (model, counter, Vote field pointing at the model, lookup of the model's ResultSnapshot.votes_archived,
+#  the model's field holding the question id)
+COUNTERS = (
+    (Choice, 'votes', 'user_choice', 'question__snapshot__votes_archived', 'question_id'),
+    (Question, 'total_votes', 'question', 'snapshot__votes_archived', 'pk'),
+)
+
+
+def live(model, archived):
+    """Return the rows of the model whose votes are still in the Vote table, not archived by finalize_polls."""
+    return model.objects.exclude(**{archived: True})
+
+
+def counted_votes(field):
+    """Return a subquery counting the votes that point at the outer row through the field."""
+    votes = Vote.objects.filter(**{field: OuterRef('pk')}).values(field).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(votes), 0)
+
+
+def drifted(model, counter, field, archived):
+    """Return the rows of the model whose counter does not match the Vote table."""
+    return live(model, archived).annotate(actual=counted_votes(field)).exclude(**{counter: F('actual')})
+
+
+class Command(BaseCommand):
+    """Recount the Choice.votes and Question.total_votes counters."""
+
+    help = 'Rebuild the Choice and Question vote counters from the Vote table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only verify the counters and exit with an error if any of them drifted.',
+        )
+
+    def handle(self, *args, **options):
+        drift = 0
+        question_ids = set()
+        for model, counter, field, archived, question in COUNTERS:
+            for row in drifted(model, counter, field, archived).values('pk', counter, 'actual', question):
+                drift += 1
+                question_ids.add(row[question])
+                self.stdout.write(
+                    f"{model.__name__} {row['pk']}: {counter}={row[counter]}, counted {row['actual']}"
+                )
+        if options['check']:
+            if drift:
+                raise CommandError(f"{drift} vote counters are out of step with the Vote table.")
+            self.stdout.write(self.style.SUCCESS("All vote counters match the Vote table."))
+            return
+        with transaction.atomic():
+            for model, counter, field, archived, question in COUNTERS:
+                live(model, archived).update(**{counter: counted_votes(field)})
+            # The updates above bypass the signals; a new version and modified time
+            # make the cached pages, fragments and ETags of the recounted questions stale.
+            if question_ids:
+                touch_questions(question_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the vote counters, {drift} of them had drifted."))
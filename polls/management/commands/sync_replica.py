@@ -0,0 +1,53 @@
+"""Copy the default SQLite database to the replica files the read views use."""
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    """Refresh the read replicas with SQLite's VACUUM INTO."""
+
+    help = ('Copy the default SQLite database to every POLLS_DB_REPLICAS file, or to the given files, '
+            'once or every --interval seconds.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='Copy to these files instead of the configured replicas.')
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Copy again every this many seconds until interrupted. Keep it under POLLS_REPLICA_LAG.',
+        )
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('sync_replica copies SQLite files; the default database is not SQLite.')
+        files = options['files'] or [
+            settings.DATABASES[alias]['NAME'] for alias in settings.POLLS_READ_DATABASES
+            if settings.DATABASES[alias]['NAME'] != settings.DATABASES['default']['NAME']
+        ]
+        if not files:
+            raise CommandError('No replica to copy to: set POLLS_DB_REPLICAS or name the files.')
+        while True:
+            for name in files:
+                started = time.perf_counter()
+                self.copy(primary, name)
+                self.stdout.write(f'Copied to {name} in {time.perf_counter() - started:.2f}s.')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, primary, name):
+        """Write a consistent copy of the primary next to the file, then swap it in.
+
+        Connections already open keep reading the old copy, so the replica
+        aliases do not persist connections across requests.
+        """
+        partial = f'{name}.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+        with primary.cursor() as cursor:
+            cursor.execute('VACUUM INTO %s', [partial])
+        os.replace(partial, name)
@@ -0,0 +1,109 @@
+"""In-process metrics (counters, gauges and histograms) for operating the polls app.
+
+A metric name may carry Prometheus labels, as in 'polls_view_seconds{view="polls:index"}'.
+"""
+import threading
+
+# Upper bounds in seconds of the latency histogram buckets.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """Count observed values into cumulative buckets, keeping their sum and maximum."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """Add one value to the histogram."""
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def snapshot(self):
+        """Return the histogram as a plain dict."""
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'buckets': dict(zip(self.buckets, self.counts)),
+        }
+
+
+class Registry:
+    """A thread-safe collection of named metrics."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, amount=1):
+        """Add the amount to a counter."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, func):
+        """Register a callable that returns the current value of a gauge."""
+        with self.lock:
+            self.gauges[name] = func
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS):
+        """Add a value to a histogram."""
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(buckets)
+            self.histograms[name].observe(value)
+
+    def snapshot(self):
+        """Return the current value of every metric."""
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'gauges': {name: func() for name, func in self.gauges.items()},
+                'histograms': {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            }
+
+    def prometheus(self):
+        """Return the current value of every metric in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+
+        def declare(base, kind):
+            if base not in typed:
+                typed.add(base)
+                lines.append(f'# TYPE {base} {kind}')
+
+        for kind in ('counters', 'gauges'):
+            for name, value in sorted(snapshot[kind].items()):
+                declare(split_name(name)[0], kind[:-1])
+                lines.append(f'{name} {value}')
+        for name, histogram in sorted(snapshot['histograms'].items()):
+            base, labels = split_name(name)
+            declare(base, 'histogram')
+            prefix = f'{labels},' if labels else ''
+            for bound, count in histogram['buckets'].items():
+                lines.append(f'{base}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{base}_bucket{{{prefix}le="+Inf"}} {histogram["count"]}')
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f'{base}_sum{suffix} {histogram["sum"]}')
+            lines.append(f'{base}_count{suffix} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def split_name(name):
+    """Return the base name and the labels (without braces) of a metric name."""
+    base, _, labels = name.partition('{')
+    return base, labels.rstrip('}')
+
+
+registry = Registry()
@@ -2,7 +2,6 @@
 
 import datetime
 from django.db import migrations, models
-from django.utils.timezone import utc
 
 
 class Migration(migrations.Migration):
@@ -15,7 +14,7 @@ class Migration(migrations.Migration):
         migrations.AddField(
             model_name='question',
             name='end_date',
-            field=models.DateTimeField(default=datetime.datetime(2020, 9, 17, 6, 43, 3, 677960, tzinfo=utc), verbose_name='date closed'),
+            field=models.DateTimeField(default=datetime.datetime(2020, 9, 17, 6, 43, 3, 677960, tzinfo=datetime.timezone.utc), verbose_name='date closed'),
             preserve_default=False,
         ),
     ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:35
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_votes(apps, schema_editor):
+    Choice = apps.get_model('polls', 'Choice')
+    Question = apps.get_model('polls', 'Question')
+    Vote = apps.get_model('polls', 'Vote')
+    for model, field in ((Choice, 'user_choice'), (Question, 'question')):
+        votes = Vote.objects.filter(**{field: OuterRef('pk')}).values(field).annotate(n=Count('pk')).values('n')
+        counter = 'votes' if model is Choice else 'total_votes'
+        model.objects.update(**{counter: Coalesce(Subquery(votes), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0004_auto_20201030_2027'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='votes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='total_votes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_votes, migrations.RunPython.noop),
+    ]
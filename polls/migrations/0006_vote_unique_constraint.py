@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:37
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    """Keep only the latest vote of each user on a question, then recount the counters."""
+    Choice = apps.get_model('polls', 'Choice')
+    Question = apps.get_model('polls', 'Question')
+    Vote = apps.get_model('polls', 'Vote')
+    latest = Vote.objects.values('question', 'user').annotate(latest=Max('pk')).values('latest')
+    Vote.objects.exclude(pk__in=latest).delete()
+    for model, field in ((Choice, 'user_choice'), (Question, 'question')):
+        votes = Vote.objects.filter(**{field: OuterRef('pk')}).values(field).annotate(n=Count('pk')).values('n')
+        counter = 'votes' if model is Choice else 'total_votes'
+        model.objects.update(**{counter: Coalesce(Subquery(votes), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_vote_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='previous_choice',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='polls.choice'),
+        ),
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('question', 'user'), name='unique_vote_per_user'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_question_pub_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='modified_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['end_date'], name='polls_question_end_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['modified_at'], name='polls_question_modified_idx'),
+        ),
+    ]
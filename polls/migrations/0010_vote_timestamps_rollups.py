@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    """Put the votes cast before rollups existed in the buckets of now, so a question's rollups add up to its count."""
+    Choice = apps.get_model('polls', 'Choice')
+    VoteRollup = apps.get_model('polls', 'VoteRollup')
+    now = django.utils.timezone.now()
+    buckets = {
+        'minute': now.replace(second=0, microsecond=0),
+        'hour': now.replace(minute=0, second=0, microsecond=0),
+    }
+    VoteRollup.objects.bulk_create(
+        VoteRollup(question_id=question_id, choice_id=choice_id, resolution=resolution, bucket=bucket, votes=votes)
+        for choice_id, question_id, votes in Choice.objects.filter(votes__gt=0).values_list('pk', 'question_id', 'votes')
+        for resolution, bucket in buckets.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_result_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='modified_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='VoteRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'minute'), ('hour', 'hour')], max_length=6)),
+                ('bucket', models.DateTimeField()),
+                ('votes', models.IntegerField(default=0)),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question', 'resolution', 'bucket'], name='polls_rollup_question_idx')],
+                'constraints': [models.UniqueConstraint(fields=('choice', 'resolution', 'bucket'), name='unique_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
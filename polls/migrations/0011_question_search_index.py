@@ -0,0 +1,65 @@
+"""Index question_text for the admin search: an FTS5 trigram table on SQLite, a pg_trgm index on PostgreSQL."""
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE polls_question_fts USING fts5("
+    "question_text, content='polls_question', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER polls_question_fts_insert AFTER INSERT ON polls_question BEGIN "
+    "INSERT INTO polls_question_fts (rowid, question_text) VALUES (new.id, new.question_text); END",
+    "CREATE TRIGGER polls_question_fts_delete AFTER DELETE ON polls_question BEGIN "
+    "INSERT INTO polls_question_fts (polls_question_fts, rowid, question_text) "
+    "VALUES ('delete', old.id, old.question_text); END",
+    "CREATE TRIGGER polls_question_fts_update AFTER UPDATE OF question_text ON polls_question BEGIN "
+    "INSERT INTO polls_question_fts (polls_question_fts, rowid, question_text) "
+    "VALUES ('delete', old.id, old.question_text); "
+    "INSERT INTO polls_question_fts (rowid, question_text) VALUES (new.id, new.question_text); END",
+    "INSERT INTO polls_question_fts (polls_question_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS polls_question_fts_update",
+    "DROP TRIGGER IF EXISTS polls_question_fts_delete",
+    "DROP TRIGGER IF EXISTS polls_question_fts_insert",
+    "DROP TABLE IF EXISTS polls_question_fts",
+]
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX polls_question_text_trgm ON polls_question USING gin (question_text gin_trgm_ops)",
+]
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS polls_question_text_trgm",
+]
+
+
+def supports_trigram_fts(connection):
+    """Return True if SQLite was built with FTS5 and is new enough (3.34) for its trigram tokenizer."""
+    if connection.Database.sqlite_version_info < (3, 34, 0):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def run(statements):
+    """Return a RunPython function executing the statements of the database's vendor, if it has any."""
+    def apply(apps, schema_editor):
+        connection = schema_editor.connection
+        if connection.vendor == 'sqlite' and not supports_trigram_fts(connection):
+            # polls.search falls back to icontains without the table.
+            return
+        for statement in statements.get(connection.vendor, []):
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_vote_timestamps_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
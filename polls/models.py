@@ -1,22 +1,72 @@
 """Models for automatically-generated database-access API."""
 import datetime
+from collections import Counter
 
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import connection, models, router, transaction
+from django.db.models import Case, Count, F, When
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
 from django.utils import timezone
 from django.contrib.auth.models import User
 
+from . import cache
 
-class Question(models.Model):
+
+class CounterModel(models.Model):
+    """A model with counter columns that only change through UPDATE ... SET n = n + delta.
+
+    Saving an existing row leaves the counters alone, so an instance loaded
+    before a vote landed cannot write its stale counts back.
+    """
+
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """Save the row without its counter columns when it already exists."""
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class Question(CounterModel):
     """A Question class has a question, publication date and end date."""
 
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published')
     end_date = models.DateTimeField('date closed')
+    total_votes = models.IntegerField(default=0)
+    # Bumped with every change to the question, its choices or its votes; used for ETags.
+    version = models.PositiveIntegerField(default=0)
+    modified_at = models.DateTimeField(default=timezone.now)
+
+    counter_fields = ('total_votes', 'version')
+
+    class Meta:
+        # Backs the index page, which pages through (pub_date, id) newest first,
+        # and its ETag, which reads the latest pub_date, end_date and modified_at.
+        indexes = [
+            models.Index(fields=['pub_date', 'id'], name='polls_question_pub_date_idx'),
+            models.Index(fields=['end_date'], name='polls_question_end_date_idx'),
+            models.Index(fields=['modified_at'], name='polls_question_modified_idx'),
+        ]
 
     def __str__(self):
         """Representations the Question object."""
         return self.question_text
 
+    def clean(self):
+        """Refuse to reopen a question whose votes finalize_polls archived; its snapshot is their only count."""
+        if (self.pk and self.end_date and self.end_date > timezone.now()
+                and ResultSnapshot.objects.filter(question_id=self.pk, votes_archived=True).exists()):
+            raise ValidationError({'end_date': "The votes of this question are archived, so it cannot be reopened."})
+
     def was_published_recently(self):
         """Return is the question was published less than 1 day."""
         now = timezone.now()
@@ -42,18 +92,366 @@ class Question(models.Model):
     can_vote.short_description = 'Can vote?'
 
 
-class Choice(models.Model):
+class Choice(CounterModel):
     """A Choice class is associated with a Question object."""
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    votes = models.IntegerField(default=0)
+
+    counter_fields = ('votes',)
 
     def __str__(self):
         """Representations the Choice object."""
         return self.choice_text
 
+
+# Rows per INSERT ... ON CONFLICT statement, five parameters each stays under SQLite's variable limit.
+UPSERT_BATCH_SIZE = 190
+
+
+class VoteQuerySet(models.QuerySet):
+    """Votes whose delete() keeps the vote counters in step."""
+
+    def delete(self):
+        """Take the votes out of the counters, then delete them."""
+        with transaction.atomic(using=self.db):
+            remove_from_counters(self)
+            return super().delete()
+
+
 class Vote(models.Model):
-    
+    """A Vote class is a user's choice on a Question object.
+
+    Vote has no delete signal receivers, so deleting a question, choice or user
+    removes its votes in one DELETE; the receivers of those models and
+    VoteQuerySet.delete() keep the counters in step instead.
+    """
+
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     user_choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
\ No newline at end of file
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    previous_choice = models.ForeignKey(Choice, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # When the user first voted on the question, and when they last cast a vote on it.
+    created_at = models.DateTimeField(default=timezone.now)
+    modified_at = models.DateTimeField(default=timezone.now)
+
+    objects = VoteQuerySet.as_manager()
+
+    class Meta:
+        # The unique constraint is also the composite (question, user) index used by the upsert.
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'user'], name='unique_vote_per_user'),
+        ]
+
+    def delete(self, *args, **kwargs):
+        """Take the vote out of the counters, then delete it."""
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Vote, instance=self)):
+            remove_from_counters(Vote.objects.filter(pk=self.pk))
+            return super().delete(*args, **kwargs)
+
+    @classmethod
+    def cast(cls, user, choice):
+        """Save the user's vote for the choice and keep the vote counters in step.
+
+        Return a (vote, created) tuple like update_or_create. Changing the vote
+        moves one count from the previous choice to the new one.
+        """
+        (pk, previous_choice_id), = cls.cast_many([(user.pk, choice.question_id, choice.pk)])
+        vote = cls(pk=pk, question_id=choice.question_id, user=user, user_choice=choice,
+                   previous_choice_id=previous_choice_id)
+        return vote, previous_choice_id is None
+
+    @classmethod
+    def cast_many(cls, votes):
+        """Save (user_id, question_id, choice_id) votes in one transaction and update the counters once.
+
+        A later vote of the same user on the same question wins over an earlier
+        one. Return a (pk, previous_choice_id) pair for each vote written.
+        """
+        latest = {}
+        for user_id, question_id, choice_id in votes:
+            latest[(user_id, question_id)] = choice_id
+        rows = [(question_id, user_id, choice_id) for (user_id, question_id), choice_id in latest.items()]
+        choice_delta = Counter()
+        question_delta = Counter()
+        choice_questions = {}
+        changed = set()
+        results = []
+        now = timezone.now()
+        with transaction.atomic():
+            upsert = cls._native_upsert if supports_native_upsert() else cls._orm_upsert
+            for question_id, user_id, choice_id, pk, previous_choice_id in upsert(rows, now):
+                choice_questions[choice_id] = question_id
+                if previous_choice_id is None:
+                    question_delta[question_id] += 1
+                    choice_delta[choice_id] += 1
+                    changed.add(question_id)
+                elif previous_choice_id != choice_id:
+                    choice_questions[previous_choice_id] = question_id
+                    choice_delta[previous_choice_id] -= 1
+                    choice_delta[choice_id] += 1
+                    changed.add(question_id)
+                results.append((pk, previous_choice_id))
+            add_to_counter(Choice, 'votes', choice_delta)
+            VoteRollup.add(choice_delta, choice_questions, now)
+            if changed:
+                counters = {'total_votes': counter_expression('total_votes', question_delta)} if question_delta else {}
+                touch_questions(changed, **counters)
+        return results
+
+    @classmethod
+    def _native_upsert(cls, rows, now):
+        """Insert or update (question_id, user_id, choice_id) rows with INSERT ... ON CONFLICT statements.
+
+        The conflicting row's old choice is copied to previous_choice, so the
+        statement returns it without a separate SELECT. It stays None for a new vote.
+        """
+        table = cls._meta.db_table
+        moment = connection.ops.adapt_datetimefield_value(now)
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            chunk = rows[start:start + UPSERT_BATCH_SIZE]
+            sql = (
+                f'INSERT INTO {table} (question_id, user_id, user_choice_id, created_at, modified_at) '
+                f'VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk))} '
+                f'ON CONFLICT (question_id, user_id) DO UPDATE '
+                f'SET user_choice_id = excluded.user_choice_id, previous_choice_id = {table}.user_choice_id, '
+                f'modified_at = excluded.modified_at '
+                f'RETURNING question_id, user_id, user_choice_id, id, previous_choice_id'
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [value for row in chunk for value in row + (moment, moment)])
+                yield from cursor.fetchall()
+
+    @classmethod
+    def _orm_upsert(cls, rows, now):
+        """Insert or update the rows with the ORM on databases without ON CONFLICT ... RETURNING."""
+        for question_id, user_id, choice_id in rows:
+            vote = cls.objects.select_for_update().filter(question_id=question_id, user_id=user_id).first()
+            if vote is None:
+                vote = cls.objects.create(question_id=question_id, user_id=user_id, user_choice_id=choice_id,
+                                          created_at=now, modified_at=now)
+            else:
+                vote.previous_choice_id = vote.user_choice_id
+                vote.user_choice_id = choice_id
+                vote.modified_at = now
+                vote.save(update_fields=['user_choice', 'previous_choice', 'modified_at'])
+            yield question_id, user_id, choice_id, vote.pk, vote.previous_choice_id
+
+
+class VoteRollup(models.Model):
+    """The net change in a choice's vote count during one minute or one hour.
+
+    Vote.cast_many adds to the rows of the minute and the hour it writes in,
+    so the history of a question is read from a few rows per period rather
+    than aggregated from its votes. A changed vote counts -1 on the old
+    choice and +1 on the new one; votes removed by deleting them or by
+    finalize_polls are not counted.
+    """
+
+    RESOLUTIONS = ('minute', 'hour')
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    resolution = models.CharField(max_length=6, choices=[(name, name) for name in RESOLUTIONS])
+    bucket = models.DateTimeField()
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'resolution', 'bucket'], name='unique_rollup_bucket'),
+        ]
+        # Backs the time series of a question, which reads its buckets in order.
+        indexes = [
+            models.Index(fields=['question', 'resolution', 'bucket'], name='polls_rollup_question_idx'),
+        ]
+
+    def __str__(self):
+        """Representations the VoteRollup object."""
+        return f'{self.choice_id} {self.resolution} {self.bucket:%Y-%m-%d %H:%M}: {self.votes:+d}'
+
+    @staticmethod
+    def truncate(moment, resolution):
+        """Return the start of the minute or hour the moment falls in."""
+        if resolution == 'hour':
+            return moment.replace(minute=0, second=0, microsecond=0)
+        return moment.replace(second=0, microsecond=0)
+
+    @classmethod
+    def add(cls, choice_delta, choice_questions, now):
+        """Add each choice's delta to its rollups of the minute and the hour of now."""
+        rows = [
+            (choice_questions[choice_id], choice_id, resolution, cls.truncate(now, resolution), delta)
+            for choice_id, delta in choice_delta.items() if delta for resolution in cls.RESOLUTIONS
+        ]
+        if not rows:
+            return
+        if not supports_native_upsert():
+            for question_id, choice_id, resolution, bucket, delta in rows:
+                updated = cls.objects.filter(choice_id=choice_id, resolution=resolution, bucket=bucket).update(
+                    votes=F('votes') + delta)
+                if not updated:
+                    cls.objects.create(question_id=question_id, choice_id=choice_id, resolution=resolution,
+                                       bucket=bucket, votes=delta)
+            return
+        table = cls._meta.db_table
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            chunk = rows[start:start + UPSERT_BATCH_SIZE]
+            sql = (
+                f'INSERT INTO {table} (question_id, choice_id, resolution, bucket, votes) '
+                f'VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk))} '
+                f'ON CONFLICT (choice_id, resolution, bucket) DO UPDATE SET votes = {table}.votes + excluded.votes'
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [
+                    value for question_id, choice_id, resolution, bucket, delta in chunk
+                    for value in (question_id, choice_id, resolution,
+                                  connection.ops.adapt_datetimefield_value(bucket), delta)
+                ])
+
+
+class ResultSnapshot(models.Model):
+    """The final tally of a closed question, written once and never changed.
+
+    A closed question cannot take votes, so its results are fixed. The
+    snapshot keeps them as they stood when the question was finalized, and
+    after archive_votes() it is the only record of how each user's votes
+    added up.
+    """
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    # [{"id": ..., "choice_text": ..., "votes": ...}, ...] in choice order.
+    choices = models.JSONField()
+    total_votes = models.IntegerField()
+    closed_at = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+    votes_archived = models.BooleanField(default=False)
+
+    def __str__(self):
+        """Representations the ResultSnapshot object."""
+        return f'Results of {self.question_id}'
+
+    @classmethod
+    def take(cls, questions):
+        """Count the votes of the closed questions and save their snapshots, returning them by question id.
+
+        Questions that already have one keep it. The votes are counted on the
+        database writes go to, so a lagging read replica cannot freeze stale counts.
+        """
+        using = router.db_for_write(cls)
+        questions = {question.pk: question for question in questions}
+        counted = dict(
+            Vote.objects.using(using).filter(question_id__in=questions).values('user_choice')
+            .annotate(n=models.Count('pk')).values_list('user_choice', 'n')
+        )
+        tallies = {question_id: [] for question_id in questions}
+        for choice in Choice.objects.using(using).filter(question_id__in=questions).order_by('pk'):
+            tallies[choice.question_id].append(
+                {'id': choice.pk, 'choice_text': choice.choice_text, 'votes': counted.get(choice.pk, 0)}
+            )
+        snapshots = [
+            cls(question_id=question_id, choices=tallies[question_id], closed_at=questions[question_id].end_date,
+                total_votes=sum(choice['votes'] for choice in tallies[question_id]))
+            for question_id in questions
+        ]
+        cls.objects.using(using).bulk_create(snapshots, ignore_conflicts=True)
+        saved = cls.objects.using(using).filter(question_id__in=questions)
+        return {snapshot.question_id: snapshot for snapshot in saved}
+
+    def choice_objects(self):
+        """Return the snapshot's choices as unsaved Choice instances, as the results page shows them."""
+        return [Choice(question_id=self.question_id, **choice) for choice in self.choices]
+
+    @classmethod
+    def archive_votes(cls, question_ids):
+        """Delete the Vote rows of finalized questions, leaving their counters and snapshots alone."""
+        question_ids = list(cls.objects.filter(question_id__in=question_ids).values_list('question_id', flat=True))
+        with transaction.atomic():
+            # VoteQuerySet.delete() would take the votes out of the counters; the
+            # base delete() removes them in one DELETE, as Vote has no delete signals.
+            deleted, _ = models.QuerySet.delete(Vote.objects.filter(question_id__in=question_ids))
+            cls.objects.filter(question_id__in=question_ids).update(votes_archived=True)
+        return deleted
+
+
+def counter_expression(counter, delta):
+    """Return an expression adding each pk's delta to the counter column."""
+    whens = [When(pk=pk, then=F(counter) + amount) for pk, amount in delta.items() if amount]
+    return Case(*whens, default=F(counter)) if whens else F(counter)
+
+
+def add_to_counter(model, counter, delta):
+    """Add each pk's delta to the model's counter column with a single UPDATE."""
+    delta = {pk: amount for pk, amount in delta.items() if amount}
+    if delta:
+        model.objects.filter(pk__in=delta).update(**{counter: counter_expression(counter, delta)})
+
+
+def touch_questions(question_ids, **updates):
+    """Bump the version and modified time of the questions in one UPDATE, along with any other updates."""
+    Question.objects.filter(pk__in=question_ids).update(
+        version=F('version') + 1, modified_at=timezone.now(), **updates
+    )
+    for question_id in question_ids:
+        cache.bump_question(question_id)
+
+
+def remove_from_counters(votes):
+    """Take a queryset of votes about to be deleted out of the choice and question counters."""
+    choice_delta = Counter()
+    question_delta = Counter()
+    for row in votes.order_by().values('question_id', 'user_choice_id').annotate(count=Count('pk')):
+        choice_delta[row['user_choice_id']] -= row['count']
+        question_delta[row['question_id']] -= row['count']
+    add_to_counter(Choice, 'votes', choice_delta)
+    if question_delta:
+        touch_questions(list(question_delta), total_votes=counter_expression('total_votes', question_delta))
+
+
+def supports_native_upsert():
+    """Return True if the database can run INSERT ... ON CONFLICT ... RETURNING."""
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+@receiver(pre_delete, sender=User)
+def remove_user_votes_from_counters(sender, instance, **kwargs):
+    """Take the votes of a user about to be deleted out of the counters."""
+    remove_from_counters(Vote.objects.filter(user_id=instance.pk))
+
+
+@receiver(pre_delete, sender=Choice)
+def remove_choice_votes_from_counters(sender, instance, origin=None, **kwargs):
+    """Take the votes of a choice about to be deleted out of its question's total."""
+    if isinstance(origin, Question) or getattr(origin, 'model', None) is Question:
+        # The question goes with the choice, so its counters go too.
+        return
+    count = Vote.objects.filter(user_choice_id=instance.pk).count()
+    if count:
+        touch_questions([instance.question_id], total_votes=F('total_votes') - count)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    """Bump the version of a saved question and make the cached pages showing it stale."""
+    if kwargs['signal'] is post_save:
+        if not kwargs['created'] and instance.end_date > timezone.now():
+            # A reopened question takes votes again, so its final tally is no longer
+            # final, unless its votes are archived and the snapshot is all that counts them.
+            ResultSnapshot.objects.filter(question_id=instance.pk, votes_archived=False).delete()
+        touch_questions([instance.pk])
+    else:
+        cache.bump_question(instance.pk)
+    cache.bump_index()
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+@receiver(post_save, sender=Vote)
+def question_part_changed(sender, instance, **kwargs):
+    """Bump the version of the choice's or vote's question."""
+    touch_questions([instance.question_id])
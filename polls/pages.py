@@ -0,0 +1,242 @@
+"""The data behind the results, detail and index pages and the JSON API, mostly read through the versioned cache.
+
+Each function keeps its result on the request, so the conditional GET checks
+and the views that render the page share one lookup.
+"""
+import datetime
+
+from asgiref.sync import sync_to_async
+from django.db.models import BooleanField, ExpressionWrapper, OuterRef, Q, Subquery
+from django.http import Http404
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.utils import timezone
+
+from . import cache
+from .models import Choice, Question, ResultSnapshot, Vote, VoteRollup
+from .pagination import keyset_page
+from .settings import API_PAGE_SIZE, FINALIZE_AFTER, INDEX_CACHE_TIMEOUT, INDEX_PAGE_SIZE, RESULTS_CACHE_TIMEOUT
+
+# The question columns the JSON API reads, and the columns of each choice.
+QUESTION_FIELDS = ('id', 'question_text', 'pub_date', 'end_date', 'total_votes', 'version', 'modified_at')
+CHOICE_FIELDS = ('id', 'choice_text', 'votes')
+
+
+def results(request, pk):
+    """Return the question and its choices with their counters."""
+    if not hasattr(request, 'polls_results'):
+        request.polls_results = cache.remember(
+            'results', f'polls:results:{pk}:{cache.question_version(pk)}',
+            lambda: load_results(pk), results_timeout,
+        )
+    return request.polls_results
+
+
+def load_results(pk):
+    """Return the question and its choices from the database, loaded together in one query.
+
+    A question closed for FINALIZE_AFTER seconds is shown from its snapshot,
+    which is taken here on first access if finalize_polls has not run yet.
+    """
+    choices = list(Choice.objects.filter(question_id=pk).select_related('question__snapshot').order_by('pk'))
+    if not choices:
+        return get_object_or_404(Question, pk=pk), choices
+    question = choices[0].question
+    if needs_snapshot(question):
+        question.snapshot = ResultSnapshot.take([question])[question.pk]
+    return final_results(question, choices)
+
+
+async def aresults(request, pk):
+    """Like results(), reading the database with the async ORM on a cache miss."""
+    if not hasattr(request, 'polls_results'):
+        request.polls_results = await acached_results(pk)
+    return request.polls_results
+
+
+async def acached_results(pk):
+    """Return the question and its choices through the cache the results page reads."""
+    return await cache.aremember(
+        'results', f'polls:results:{pk}:{cache.question_version(pk)}',
+        lambda: aload_results(pk), results_timeout,
+    )
+
+
+async def aload_results(pk):
+    """Like load_results(), with the async ORM."""
+    queryset = Choice.objects.filter(question_id=pk).select_related('question__snapshot').order_by('pk')
+    choices = [choice async for choice in queryset]
+    if not choices:
+        return await aget_object_or_404(Question, pk=pk), choices
+    question = choices[0].question
+    if needs_snapshot(question):
+        question.snapshot = (await sync_to_async(ResultSnapshot.take)([question]))[question.pk]
+    return final_results(question, choices)
+
+
+def needs_snapshot(question):
+    """Return True if the question has been closed long enough to finalize but has no snapshot yet."""
+    return (not hasattr(question, 'snapshot')
+            and question.end_date <= timezone.now() - datetime.timedelta(seconds=FINALIZE_AFTER))
+
+
+def final_results(question, choices):
+    """Return the question with the snapshot's choices if it has one, else with the live choices."""
+    if hasattr(question, 'snapshot'):
+        return question, question.snapshot.choice_objects()
+    return question, choices
+
+
+def results_timeout(value):
+    """Return how long results stay cached: until the question changes once they come from a snapshot."""
+    question, choices = value
+    return None if hasattr(question, 'snapshot') else RESULTS_CACHE_TIMEOUT
+
+
+def detail_questions(user):
+    """Return the questions, each annotated with the id of the choice the user voted for, or None."""
+    voted = Vote.objects.filter(question=OuterRef('pk'), user=user).values('user_choice_id')[:1]
+    return Question.objects.annotate(voted_choice_id=Subquery(voted))
+
+
+def detail_context(question, choices):
+    """Return the template context of a detail page, naming the user's previous choice without a query."""
+    voted = next((choice for choice in choices if choice.pk == question.voted_choice_id), None)
+    return {
+        'question': question,
+        'choices': choices,
+        'previous_selected_vote_text': voted.choice_text if voted else "",
+        'has_previous_vote': question.voted_choice_id is not None,
+    }
+
+
+def results_context(question, choices):
+    """Return the template context of a results page, with each choice's percentage and the total."""
+    total = sum(choice.votes for choice in choices)
+    for choice in choices:
+        choice.percentage = round(choice.votes * 100 / total, 1) if total else 0
+    return {'question': question, 'choices': choices, 'total_votes': total}
+
+
+def index(request):
+    """Return the page of published questions the request asks for and the cursor of the next page.
+
+    The page starts after the 'before' cursor, 'status' narrows it to open or
+    closed polls, and each question carries an is_open flag computed in SQL.
+    """
+    if not hasattr(request, 'polls_index'):
+        status = request.GET.get('status', '')
+        cursor = request.GET.get('before')
+        request.polls_index = cache.remember(
+            'index', f'polls:index:{cache.index_version()}:{status}:{cursor}',
+            lambda: load_index(status, cursor), index_timeout,
+        )
+    return request.polls_index
+
+
+def load_index(status, cursor):
+    """Return the page after the cursor and the cursor of the next page from the database."""
+    return published_page(published_questions(status), cursor, INDEX_PAGE_SIZE)
+
+
+def published_questions(status):
+    """Return the published questions, narrowed to open or closed ones, with an is_open flag."""
+    now = timezone.now()
+    questions = Question.objects.filter(pub_date__lte=now).annotate(
+        is_open=ExpressionWrapper(Q(end_date__gt=now), output_field=BooleanField())
+    )
+    if status == 'open':
+        questions = questions.filter(end_date__gt=now)
+    elif status == 'closed':
+        questions = questions.filter(end_date__lte=now)
+    return questions
+
+
+def published_page(questions, cursor, size):
+    """Return keyset_page() of the questions, answering 404 for a malformed cursor."""
+    try:
+        return keyset_page(questions, cursor, size)
+    except ValueError:
+        raise Http404("Invalid page cursor.")
+
+
+def index_timeout(value):
+    """Return how long a page stays cached, at most until the first open question on it closes."""
+    page, next_cursor = value
+    return closing_timeout(question.end_date for question in page if question.is_open)
+
+
+def closing_timeout(end_dates):
+    """Return the index cache timeout, cut short to the first of the end dates."""
+    now = timezone.now()
+    closing = [(end_date - now).total_seconds() for end_date in end_dates]
+    return max(1, int(min(closing + [INDEX_CACHE_TIMEOUT])))
+
+
+def api_index(request):
+    """Return the page of published questions the API request asks for, as dicts, and the next cursor."""
+    if not hasattr(request, 'polls_api_index'):
+        status = request.GET.get('status', '')
+        cursor = request.GET.get('before')
+        request.polls_api_index = cache.remember(
+            'api_index', f'polls:api:index:{cache.index_version()}:{status}:{cursor}',
+            lambda: published_page(published_questions(status).values(*QUESTION_FIELDS, 'is_open'),
+                                   cursor, API_PAGE_SIZE),
+            lambda value: closing_timeout(row['end_date'] for row in value[0] if row['is_open']),
+        )
+    return request.polls_api_index
+
+
+def api_question(request, pk):
+    """Return a question and its choices as one dict."""
+    if not hasattr(request, 'polls_api_question'):
+        request.polls_api_question = cache.remember(
+            'api_question', f'polls:api:question:{pk}:{cache.question_version(pk)}',
+            lambda: load_api_question(pk), RESULTS_CACHE_TIMEOUT,
+        )
+    return request.polls_api_question
+
+
+def load_api_question(pk):
+    """Return a question and its choices from the database as one dict, without building model instances."""
+    question = Question.objects.filter(pk=pk).values(*QUESTION_FIELDS).first()
+    if question is None:
+        raise Http404("No question matches the given query.")
+    question['choices'] = list(Choice.objects.filter(question_id=pk).order_by('pk').values(*CHOICE_FIELDS))
+    return question
+
+
+def api_timeseries(request, pk, resolution):
+    """Return the per-bucket vote changes of each choice of a question at the resolution."""
+    if not hasattr(request, 'polls_api_timeseries'):
+        request.polls_api_timeseries = cache.remember(
+            'api_timeseries', f'polls:api:timeseries:{pk}:{cache.question_version(pk)}:{resolution}',
+            lambda: load_timeseries(api_question(request, pk), resolution), RESULTS_CACHE_TIMEOUT,
+        )
+    return request.polls_api_timeseries
+
+
+def load_timeseries(question, resolution):
+    """Return the question's rollups as parallel lists: the bucket starts, and each bucket's change per choice.
+
+    The changes are listed in the order of the question's choices.
+    """
+    column = {choice['id']: n for n, choice in enumerate(question['choices'])}
+    buckets, votes = [], []
+    rollups = VoteRollup.objects.filter(question_id=question['id'], resolution=resolution).order_by('bucket')
+    for bucket, choice_id, delta in rollups.values_list('bucket', 'choice_id', 'votes'):
+        if not buckets or buckets[-1] != bucket:
+            buckets.append(bucket)
+            votes.append([0] * len(column))
+        votes[-1][column[choice_id]] = delta
+    return {
+        'id': question['id'],
+        'resolution': resolution,
+        'choices': list(column),
+        'buckets': buckets,
+        'votes': votes,
+    }
+
+
+def is_open(question):
+    """Return whether a question dict is open for votes now, like Question.can_vote()."""
+    return question['pub_date'] <= timezone.now() < question['end_date']
@@ -0,0 +1,91 @@
+"""Pagination of the questions: keyset (cursor) pages ordered by (pub_date, id), newest first,
+and page counts estimated from the table size for the admin.
+"""
+import datetime
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def encode_cursor(pub_date, pk):
+    """Return the cursor pointing after a question, as '<microseconds since epoch>_<id>'."""
+    return f"{(pub_date - EPOCH) // datetime.timedelta(microseconds=1)}_{pk}"
+
+
+def decode_cursor(cursor):
+    """Return the (pub_date, id) pair of a cursor, raise ValueError if it is malformed."""
+    microseconds, pk = cursor.split('_')
+    pk = int(pk)
+    # Ids are 64-bit integers in the database.
+    if not 0 <= pk < 2 ** 63:
+        raise ValueError(f"Cursor id out of range: {pk}")
+    try:
+        return EPOCH + datetime.timedelta(microseconds=int(microseconds)), pk
+    except OverflowError:
+        raise ValueError(f"Cursor date out of range: {microseconds}")
+
+
+def keyset_page(queryset, cursor, size):
+    """Return the page of the queryset after the cursor and the cursor of the next page (or None).
+
+    The rows may be model instances or the dicts of a values() queryset.
+
+    The page costs one indexed range query however deep it is, because it
+    seeks past the cursor instead of counting an OFFSET.
+    """
+    if cursor:
+        pub_date, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+    rows = list(queryset.order_by('-pub_date', '-pk')[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = rows[-1]
+    if isinstance(last, dict):
+        # A values() queryset, which has to select 'pub_date' and 'id'.
+        return rows, encode_cursor(last['pub_date'], last['id'])
+    return rows, encode_cursor(last.pub_date, last.pk)
+
+
+# Below this many rows an exact COUNT(*) is cheap enough.
+EXACT_COUNT_LIMIT = 10000
+
+
+def estimated_count(model, using):
+    """Return a cheap estimate of the model's row count, or None if the database offers none.
+
+    SQLite reads the largest rowid off the end of the primary key, which
+    overestimates by the rows deleted; PostgreSQL keeps an estimate in its
+    statistics.
+    """
+    table = model._meta.db_table
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return (row[0] or 0) if row else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """A paginator that counts an unfiltered queryset of a large table by estimate.
+
+    A filtered queryset, or a small table, is counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
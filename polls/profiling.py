@@ -0,0 +1,152 @@
+"""Opt-in per-request profiling: wall time, ORM queries and template rendering per view.
+
+ProfilingMiddleware is listed in MIDDLEWARE but raises MiddlewareNotUsed
+unless POLLS_PROFILING is on, so a disabled profiler adds nothing to a
+request. When on, each request gets:
+
+- a Server-Timing header with its total, database and render time,
+- observations in the metrics registry, labelled by view name,
+- with probability POLLS_PROFILING_SAMPLE_RATE, a cProfile dump in
+  POLLS_PROFILING_DIR.
+
+Queries are timed by an execute wrapper on every database connection. It
+reports to the request through a context variable, which asgiref carries
+into the threads sync_to_async runs the ORM in.
+"""
+import contextvars
+import cProfile
+import os
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.response import SimpleTemplateResponse
+
+from . import settings as polls_settings
+from .metrics import registry
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+current = contextvars.ContextVar('polls_profile', default=None)
+
+
+class Profile:
+    """What one request spent its time on."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.render_seconds = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """Time a query for the request being profiled, if there is one."""
+    profile = current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries += 1
+        profile.query_seconds += time.perf_counter() - start
+
+
+def instrument(connection, **kwargs):
+    """Add the query timer to a database connection."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class ProfilingMiddleware:
+    """Measure each request and report it as Server-Timing, metrics and sampled cProfile dumps."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not polls_settings.PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        connection_created.connect(instrument)
+        for connection in connections.all(initialized_only=True):
+            instrument(connection)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile, token, profiler = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+            self.stop_profiler(profiler)
+        return self.finish(request, response, profile, profiler)
+
+    async def __acall__(self, request):
+        profile, token, profiler = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+            self.stop_profiler(profiler)
+        return self.finish(request, response, profile, profiler)
+
+    def process_template_response(self, request, response):
+        """Time the rendering of a TemplateResponse, which happens after the view returns."""
+        profile = current.get()
+        if profile is not None:
+            render = response.render
+
+            def timed_render():
+                start = time.perf_counter()
+                try:
+                    return render()
+                finally:
+                    profile.render_seconds += time.perf_counter() - start
+            response.render = timed_render
+        return response
+
+    def start(self):
+        profile = Profile()
+        token = current.set(profile)
+        profiler = None
+        if polls_settings.PROFILING_DIR and random.random() < polls_settings.PROFILING_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already running in this thread.
+                profiler = None
+        return profile, token, profiler
+
+    def stop_profiler(self, profiler):
+        if profiler is not None:
+            profiler.disable()
+
+    def finish(self, request, response, profile, profiler):
+        total = time.perf_counter() - profile.started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        labels = f'{{view="{view}"}}'
+        registry.observe(f'polls_view_seconds{labels}', total)
+        registry.observe(f'polls_view_queries{labels}', profile.queries, QUERY_BUCKETS)
+        registry.observe(f'polls_view_query_seconds{labels}', profile.query_seconds)
+        if isinstance(response, SimpleTemplateResponse):
+            registry.observe(f'polls_view_render_seconds{labels}', profile.render_seconds)
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={total * 1000:.2f}',
+            f'db;dur={profile.query_seconds * 1000:.2f};desc="{profile.queries} queries"',
+            f'render;dur={profile.render_seconds * 1000:.2f}',
+        ])
+        if profiler is not None:
+            os.makedirs(polls_settings.PROFILING_DIR, exist_ok=True)
+            name = f"{view.replace(':', '-')}-{time.time_ns()}.prof"
+            profiler.dump_stats(os.path.join(polls_settings.PROFILING_DIR, name))
+        return response
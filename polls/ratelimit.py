@@ -0,0 +1,126 @@
+"""Rate limits and duplicate suppression for the vote view.
+
+Each logged-in user and each client IP (see views.get_client_ip) has a
+token bucket in the 'ratelimit' cache (see CACHES in mysite/settings.py): a
+vote takes a token, and the bucket refills at VOTE_RATE tokens a second up to VOTE_BURST. A vote finding its
+bucket empty is answered 429 Too Many Requests before the view runs.
+
+A vote repeating the last one of the same session, for the same choice,
+within VOTE_REPEAT_WINDOW seconds is answered with the redirect the first
+one got, without running the view.
+
+The buckets are read and written without a lock between workers, so with a
+shared cache concurrent votes may take the same token; the limit is a brake
+on scripts, not an exact count.
+"""
+import math
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseRedirect
+from django.urls import reverse
+
+from . import settings as polls_settings
+from .metrics import registry
+from .routers import stick_to_primary
+from .views import get_client_ip
+
+_lock = threading.Lock()
+
+
+def ratelimit_cache():
+    """Return the cache holding the token buckets and the recent votes."""
+    return caches[polls_settings.RATE_LIMIT_CACHE_ALIAS]
+
+
+def take_token(key, rate, burst, now=None):
+    """Take a token from the bucket; return 0 if there was one, else the seconds until there is."""
+    now = time.time() if now is None else now
+    cache = ratelimit_cache()
+    with _lock:
+        tokens, updated = cache.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens < 1:
+            return (1 - tokens) / rate
+        # A bucket left alone long enough to fill up again needs no entry.
+        cache.set(key, (tokens - 1, now), math.ceil(burst / rate))
+    return 0
+
+
+def buckets(user_id, ip):
+    """Yield the key, rate and burst of each bucket a vote takes a token from."""
+    if polls_settings.VOTE_RATE:
+        yield f'polls:ratelimit:user:{user_id}', polls_settings.VOTE_RATE, polls_settings.VOTE_BURST
+    if ip and polls_settings.VOTE_IP_RATE:
+        yield f'polls:ratelimit:ip:{ip}', polls_settings.VOTE_IP_RATE, polls_settings.VOTE_IP_BURST
+
+
+def results_url(question_id):
+    """Return the results page an accepted vote is redirected to."""
+    return reverse('polls:results', args=(question_id,))
+
+
+def repeat_key(request, user_id, question_id):
+    """Return the cache key of the session's last vote on the question, or None if it has no session."""
+    if user_id is None or not request.session.session_key:
+        return None
+    return f'polls:ratelimit:vote:{request.session.session_key}:{question_id}'
+
+
+def check(request, user_id, question_id):
+    """Return the response that answers the vote instead of the view, or None to let the view run.
+
+    Anonymous requests are left to login_required, so they cannot drain an address's bucket.
+    """
+    if user_id is None:
+        return None
+    key = repeat_key(request, user_id, question_id)
+    if key and polls_settings.VOTE_REPEAT_WINDOW and request.POST.get('choice') is not None:
+        if ratelimit_cache().get(key) == request.POST['choice']:
+            registry.inc('polls_votes_repeated_total')
+            return stick_to_primary(HttpResponseRedirect(results_url(question_id)))
+    for bucket, rate, burst in buckets(user_id, get_client_ip(request)):
+        wait = take_token(bucket, rate, burst)
+        if wait:
+            registry.inc('polls_votes_rate_limited_total')
+            response = HttpResponse("Too many votes. Please wait a moment and try again.", status=429)
+            response['Retry-After'] = str(math.ceil(wait))
+            return response
+    return None
+
+
+def remember(request, user_id, question_id, response):
+    """Record a vote the view accepted, so a repeat of it within the window is not saved again."""
+    key = repeat_key(request, user_id, question_id)
+    accepted = response.status_code == 302 and response['Location'] == results_url(question_id)
+    if key and polls_settings.VOTE_REPEAT_WINDOW and accepted and 'choice' in request.POST:
+        ratelimit_cache().set(key, request.POST['choice'], polls_settings.VOTE_REPEAT_WINDOW)
+
+
+def limit_votes(view):
+    """Decorate a sync or async vote view with the rate limits and the duplicate suppression."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapped(request, question_id):
+            user = await request.auser()
+            user_id = user.pk if user.is_authenticated else None
+            response = check(request, user_id, question_id) if request.method == 'POST' else None
+            if response is None:
+                response = await view(request, question_id)
+                if request.method == 'POST':
+                    remember(request, user_id, question_id, response)
+            return response
+    else:
+        @wraps(view)
+        def wrapped(request, question_id):
+            user_id = request.user.pk if request.user.is_authenticated else None
+            response = check(request, user_id, question_id) if request.method == 'POST' else None
+            if response is None:
+                response = view(request, question_id)
+                if request.method == 'POST':
+                    remember(request, user_id, question_id, response)
+            return response
+    return wrapped
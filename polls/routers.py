@@ -0,0 +1,104 @@
+"""Send the read-only polls views to the read databases.
+
+Views decorated with read_from_replicas run with a context variable set,
+and while it is set ReadRouter routes reads of the polls models to one of
+settings.POLLS_READ_DATABASES. Everything else, including every write and
+the session and user lookups, stays on 'default'.
+
+A replica may lag behind the primary, so a view that writes calls
+stick_to_primary on its response: the cookie it sets keeps that browser's
+reads on the primary, and the results page it is redirected to shows its
+own vote. Those reads also skip the cache entries filled from the replicas
+(see polls.cache), which may be older than the vote.
+"""
+import contextlib
+import contextvars
+import random
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+from .settings import REPLICA_LAG
+
+PRIMARY_COOKIE = 'polls_primary'
+
+reading = contextvars.ContextVar('polls_reading', default=False)
+# Set instead of reading while a read view serves a client that stick_to_primary keeps on the primary.
+sticking = contextvars.ContextVar('polls_sticking', default=False)
+
+
+@contextlib.contextmanager
+def routed(request):
+    """Set reading, or sticking if the request carries the cookie of stick_to_primary, for the block."""
+    sticky = PRIMARY_COOKIE in request.COOKIES
+    reading_token, sticking_token = reading.set(not sticky), sticking.set(sticky)
+    try:
+        yield
+    finally:
+        reading.reset(reading_token)
+        sticking.reset(sticking_token)
+
+
+def read_from_replicas(view):
+    """Decorate a sync or async view so its polls queries go to a read database.
+
+    Requests carrying the cookie of stick_to_primary keep reading the primary.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            with routed(request):
+                return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            with routed(request):
+                return view(request, *args, **kwargs)
+    return wrapped
+
+
+def stick_to_primary(response):
+    """Keep the reads of the client that gets the response on the primary until the replicas catch up.
+
+    A page read from a replica REPLICA_LAG seconds behind may stay cached for
+    REPLICA_LAG seconds more, so the cookie lasts twice that.
+    """
+    response.set_cookie(PRIMARY_COOKIE, '1', max_age=2 * REPLICA_LAG, httponly=True, samesite='Lax')
+    return response
+
+
+def replicas_may_lag():
+    """Return True if any read database is a copy of the primary, which may be behind it."""
+    primary = settings.DATABASES['default']['NAME']
+    return any(settings.DATABASES[alias]['NAME'] != primary for alias in settings.POLLS_READ_DATABASES)
+
+
+def reads_may_lag():
+    """Return True if the current view reads from a copy of the database that may be behind."""
+    return reading.get() and replicas_may_lag()
+
+
+def reads_own_writes():
+    """Return True if the current view reads the primary for a client whose writes the replicas may not have yet."""
+    return sticking.get() and replicas_may_lag()
+
+
+class ReadRouter:
+    """Route the polls reads of decorated views to a read database, everything else to 'default'."""
+
+    def db_for_read(self, model, **hints):
+        if reading.get() and settings.POLLS_READ_DATABASES and model._meta.app_label == 'polls':
+            return random.choice(settings.POLLS_READ_DATABASES)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The read databases are the same file or copies of it made by sync_replica.
+        return db == 'default'
@@ -0,0 +1,49 @@
+"""Search the question texts through the index the 0011 migration builds.
+
+On SQLite, triggers mirror polls_question.question_text into an FTS5 table
+with the trigram tokenizer, which finds any substring of three or more
+characters, case-insensitively, without scanning the questions. Shorter
+terms, and databases without the table, fall back to icontains; on
+PostgreSQL that is served by the migration's pg_trgm index.
+"""
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from django.utils.text import smart_split, unescape_string_literal
+
+FTS_TABLE = 'polls_question_fts'
+# The trigram tokenizer cannot match anything shorter.
+MIN_FTS_TERM = 3
+
+_fts_tables = {}
+
+
+def has_fts(alias):
+    """Return True if the database has the FTS5 table of the question texts."""
+    connection = connections[alias]
+    key = (alias, connection.settings_dict['NAME'])
+    if key not in _fts_tables:
+        _fts_tables[key] = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[key]
+
+
+def terms(search_term):
+    """Split the search like the admin does: on spaces, keeping quoted phrases together."""
+    for term in smart_split(search_term):
+        if term.startswith(('"', "'")) and term[0] == term[-1]:
+            term = unescape_string_literal(term)
+        if term:
+            yield term
+
+
+def search_questions(queryset, search_term):
+    """Return the questions whose text contains every term of the search."""
+    fts = has_fts(queryset.db)
+    for term in terms(search_term):
+        if fts and len(term) >= MIN_FTS_TERM:
+            phrase = '"' + term.replace('"', '""') + '"'
+            queryset = queryset.filter(
+                pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [phrase]),
+            )
+        else:
+            queryset = queryset.filter(question_text__icontains=term)
+    return queryset
@@ -1,12 +1,30 @@
 import os
 
+# Hand the 'polls' log records to a background thread (see polls.logs), so
+# formatting and writing them happens off the request path.
+LOG_QUEUE = os.getenv('POLLS_LOG_QUEUE', 'false').lower() == 'true'
+# A JSON Lines file the events are also written to, rotated at LOG_FILE_MAX_BYTES
+# and, behind the LOG_QUEUE listener, written LOG_BATCH_SIZE lines at a time.
+# Without the queue nothing flushes a quiet batch, so each line is written at
+# once. Empty disables it.
+LOG_FILE = os.getenv('POLLS_LOG_FILE', '')
+LOG_FILE_MAX_BYTES = int(os.getenv('POLLS_LOG_FILE_MAX_BYTES', 10 * 1024 * 1024))
+LOG_FILE_BACKUPS = int(os.getenv('POLLS_LOG_FILE_BACKUPS', 5))
+LOG_BATCH_SIZE = int(os.getenv('POLLS_LOG_BATCH_SIZE', 100))
+# Seconds a batch waits for more lines once the queue has gone quiet.
+LOG_FLUSH_INTERVAL = float(os.getenv('POLLS_LOG_FLUSH_INTERVAL', 1))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
         'console': {
+            '()': 'polls.logs.ConsoleFormatter',
             'format': '%(asctime)s %(name)s %(levelname)s: %(message)s'
         },
+        'json': {
+            '()': 'polls.logs.JsonFormatter',
+        },
     },
     'handlers': {
         'console': {
@@ -25,4 +43,130 @@ LOGGING = {
             'propagate': False,
         },
     },
-}
\ No newline at end of file
+}
+
+if LOG_FILE:
+    LOGGING['handlers']['file'] = {
+        'class': 'polls.logs.BatchingRotatingFileHandler',
+        'formatter': 'json',
+        'filename': LOG_FILE,
+        'maxBytes': LOG_FILE_MAX_BYTES,
+        'backupCount': LOG_FILE_BACKUPS,
+        'batch_size': LOG_BATCH_SIZE if LOG_QUEUE else 1,
+        'flush_interval': LOG_FLUSH_INTERVAL,
+    }
+    LOGGING['loggers']['polls']['handlers'].append('file')
+
+# How polls.views.vote writes a vote: 'sync' saves it during the request,
+# 'buffered' queues it for a background flusher (see polls.ingest).
+VOTE_INGESTION_MODE = os.getenv('POLLS_VOTE_INGESTION', 'sync')
+# The flusher writes a batch once this many votes are queued ...
+VOTE_BATCH_SIZE = int(os.getenv('POLLS_VOTE_BATCH_SIZE', 500))
+# ... or this many seconds have passed.
+VOTE_FLUSH_INTERVAL = float(os.getenv('POLLS_VOTE_FLUSH_INTERVAL', 0.5))
+# Append-only journal of queued votes, replayed at startup. Empty disables it.
+# The path must contain {pid}, replaced by the process id, so each worker
+# writes and locks a journal of its own, e.g. /var/lib/polls/votes-{pid}.journal.
+# A worker starting up also replays the journals of workers that are gone.
+VOTE_JOURNAL = os.getenv('POLLS_VOTE_JOURNAL', '')
+# fsync the journal after each vote so an accepted vote survives a crash.
+VOTE_JOURNAL_FSYNC = os.getenv('POLLS_VOTE_JOURNAL_FSYNC', 'true').lower() == 'true'
+
+# Token buckets of polls.ratelimit: each user may vote VOTE_BURST times in a
+# row, then VOTE_RATE times a second; each client IP, which a whole classroom
+# may share, VOTE_IP_BURST and VOTE_IP_RATE. A rate of 0 turns the limit off.
+VOTE_RATE = float(os.getenv('POLLS_VOTE_RATE', 1))
+VOTE_BURST = int(os.getenv('POLLS_VOTE_BURST', 10))
+VOTE_IP_RATE = float(os.getenv('POLLS_VOTE_IP_RATE', 20))
+VOTE_IP_BURST = int(os.getenv('POLLS_VOTE_IP_BURST', 200))
+# Number of proxies in front of the app that append the address they saw to
+# X-Forwarded-For. With 0 the client's address is REMOTE_ADDR, since anyone
+# can send the header; it names who the rate limits and the logs count.
+TRUSTED_PROXIES = int(os.getenv('POLLS_TRUSTED_PROXIES', 0))
+# Seconds in which a session's repeat of the same vote is answered without saving it. 0 turns it off.
+VOTE_REPEAT_WINDOW = int(os.getenv('POLLS_VOTE_REPEAT_WINDOW', 5))
+# Cache alias (see CACHES in mysite/settings.py) holding the buckets and the recent votes.
+RATE_LIMIT_CACHE_ALIAS = os.getenv('POLLS_RATE_LIMIT_CACHE_ALIAS', 'ratelimit')
+
+# Number of questions on each page of the polls index.
+INDEX_PAGE_SIZE = int(os.getenv('POLLS_INDEX_PAGE_SIZE', 5))
+
+# Number of questions on each page of the JSON API's question list.
+API_PAGE_SIZE = int(os.getenv('POLLS_API_PAGE_SIZE', 50))
+
+# Cache alias (see CACHES in mysite/settings.py) holding the polls pages.
+CACHE_ALIAS = os.getenv('POLLS_CACHE_ALIAS', 'polls')
+# Seconds an entry of a locmem cache lives at most. Each worker has its own
+# locmem cache and question versions, so this is how long a worker may serve
+# a page another worker's write changed. 0 lifts the cap, which is only safe
+# with a single worker; several workers sharing a host can use POLLS_CACHE=file.
+LOCAL_CACHE_TIMEOUT = int(os.getenv('POLLS_LOCAL_CACHE_TIMEOUT', 5))
+# Seconds a cached results page lives. Writes bump its version, so this only bounds memory.
+RESULTS_CACHE_TIMEOUT = int(os.getenv('POLLS_RESULTS_CACHE_TIMEOUT', 3600))
+# Seconds after a question closes before its results are finalized into a
+# snapshot, so votes still in flight (see VOTE_INGESTION_MODE) land first.
+FINALIZE_AFTER = int(os.getenv('POLLS_FINALIZE_AFTER', 60))
+# Seconds polls.auth.CachedModelBackend keeps a logged-in user. A user
+# deactivated or given a new password in another worker's locmem cache keeps
+# their sessions for at most this long.
+USER_CACHE_TIMEOUT = int(os.getenv('POLLS_USER_CACHE_TIMEOUT', 60))
+# Cache alias (see CACHES in mysite/settings.py) holding those users. It must
+# stay a locmem cache: the cached users include their password hashes.
+USER_CACHE_ALIAS = 'users'
+# Cost of the password hashers in polls.hashers; POLLS_PASSWORD_HASHER in
+# mysite/settings.py picks one. Django's defaults. Each password stored at
+# another cost is rehashed at its user's next login.
+PBKDF2_ITERATIONS = int(os.getenv('POLLS_PBKDF2_ITERATIONS', 1000000))
+SCRYPT_WORK_FACTOR = int(os.getenv('POLLS_SCRYPT_WORK_FACTOR', 2 ** 14))
+ARGON2_TIME_COST = int(os.getenv('POLLS_ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.getenv('POLLS_ARGON2_MEMORY_COST', 102400))
+ARGON2_PARALLELISM = int(os.getenv('POLLS_ARGON2_PARALLELISM', 8))
+# Processes hashing passwords off the request thread; 0 hashes them in the
+# request's thread. mysite/asgi.py defaults it to the number of cores.
+HASH_WORKERS = int(os.getenv('POLLS_HASH_WORKERS', 0))
+# Seconds a cached index page lives. Polls reaching their pub_date appear after at most this long.
+INDEX_CACHE_TIMEOUT = int(os.getenv('POLLS_INDEX_CACHE_TIMEOUT', 30))
+
+# Cache-Control directives of each page, passed to django.utils.cache.patch_cache_control.
+# Both pages revalidate with their ETag; the index greets the user, so only browsers may keep it.
+CACHE_CONTROL = {
+    'results': {
+        'public': True,
+        'max_age': int(os.getenv('POLLS_RESULTS_MAX_AGE', 0)),
+        'must_revalidate': True,
+    },
+    'api': {
+        'public': True,
+        'max_age': int(os.getenv('POLLS_API_MAX_AGE', 0)),
+        'must_revalidate': True,
+    },
+    'index': {
+        'private': True,
+        'max_age': int(os.getenv('POLLS_INDEX_MAX_AGE', 0)),
+        'must_revalidate': True,
+    },
+}
+
+# Compile the project's templates when the app starts instead of on their first request.
+PRECOMPILE_TEMPLATES = os.getenv('POLLS_PRECOMPILE_TEMPLATES', 'true').lower() == 'true'
+
+# Route vote, detail and results to the async views in polls.async_views.
+# mysite/asgi.py turns this on, so ASGI servers get them without configuration.
+ASYNC_VIEWS = os.getenv('POLLS_ASYNC_VIEWS', 'false').lower() == 'true'
+
+# How often, in seconds, the results stream checks a question for new votes,
+# and how long an idle stream waits before sending a heartbeat comment.
+STREAM_TICK = float(os.getenv('POLLS_STREAM_TICK', 1))
+STREAM_HEARTBEAT = float(os.getenv('POLLS_STREAM_HEARTBEAT', 15))
+
+# Per-request profiling (see polls.profiling): Server-Timing headers and
+# per-view histograms, plus a cProfile dump of this fraction of requests
+# written to PROFILING_DIR.
+PROFILING = os.getenv('POLLS_PROFILING', 'false').lower() == 'true'
+PROFILING_SAMPLE_RATE = float(os.getenv('POLLS_PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR = os.getenv('POLLS_PROFILING_DIR', '')
+
+# How many seconds the read databases may lag behind the primary. Pages read
+# from a replica are cached no longer than this, and a user who voted reads
+# from the primary, past those cached pages, for twice this long.
+REPLICA_LAG = int(os.getenv('POLLS_REPLICA_LAG', 10))
@@ -0,0 +1,31 @@
+// Keep the results table up to date from the page's Server-Sent Events stream.
+// Without EventSource the page stays as rendered and a refresh still works.
+(function () {
+    var table = document.getElementById('results');
+    if (!table || !table.dataset.streamUrl || !window.EventSource) {
+        return;
+    }
+    var source = new EventSource(table.dataset.streamUrl);
+
+    source.addEventListener('tally', function (event) {
+        var tally = JSON.parse(event.data);
+        Object.keys(tally.choices).forEach(function (id) {
+            var row = table.querySelector('tr[data-choice="' + id + '"]');
+            if (row && tally.choices[id] === null) {
+                row.remove();
+            } else if (row) {
+                row.querySelector('.votes').textContent = ' ' + tally.choices[id];
+            }
+        });
+        table.querySelectorAll('tr[data-choice]').forEach(function (row) {
+            var votes = parseInt(row.querySelector('.votes').textContent, 10);
+            var percentage = tally.total ? Math.round(votes * 1000 / tally.total) / 10 : 0;
+            row.querySelector('.percentage').textContent = ' ' + percentage + '%';
+        });
+        document.getElementById('total-votes').textContent = ' ' + tally.total;
+    });
+
+    source.addEventListener('closed', function () {
+        source.close();
+    });
+}());
@@ -0,0 +1,152 @@
+"""Live results of a question as Server-Sent Events.
+
+Every question being watched has one Broadcaster in the process. Once per
+tick it compares the question's cache version with the one it last saw and,
+only when it changed, loads the tallies once and hands the choices whose
+count changed to every subscriber. A subscriber that falls behind gets the
+changes merged into one event, so a slow client never queues up a backlog.
+"""
+import asyncio
+import json
+import logging
+
+from django.http import Http404
+
+from . import cache, pages
+from . import settings as polls_settings
+from .metrics import registry
+
+logger = logging.getLogger("polls")
+
+# Milliseconds a browser waits before reconnecting a dropped stream.
+RETRY_MS = 2000
+
+
+class Subscriber:
+    """One open stream, holding the changes it has not been sent yet."""
+
+    def __init__(self):
+        self.pending = None
+        self.closed = False
+        self.ready = asyncio.Event()
+
+    def push(self, version, total, changes):
+        """Merge newer tallies into the pending ones."""
+        if self.pending is not None:
+            changes = {**self.pending[2], **changes}
+        self.pending = (version, total, changes)
+        self.ready.set()
+
+    def close(self):
+        """End the stream after the pending changes."""
+        self.closed = True
+        self.ready.set()
+
+    async def next(self, timeout):
+        """Return the (version, total, changes) pushed since the last call, or None if there are none."""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.ready.clear()
+        pending, self.pending = self.pending, None
+        return pending
+
+
+class Broadcaster:
+    """Watch one question and fan its tally changes out to the subscribers."""
+
+    def __init__(self, question_id):
+        self.question_id = question_id
+        self.subscribers = set()
+        self.tallies = {}
+        self.version = None
+        self.cache_version = None
+        self.loop = asyncio.get_running_loop()
+        self.task = None
+
+    def subscribe(self):
+        """Return a new subscriber, starting with the tallies seen so far."""
+        subscriber = Subscriber()
+        self.subscribers.add(subscriber)
+        if self.version is not None:
+            subscriber.push(self.version, sum(self.tallies.values()), self.tallies)
+        if self.task is None:
+            self.task = self.loop.create_task(self.run())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Drop a subscriber, and stop watching the question when it was the last one."""
+        self.subscribers.discard(subscriber)
+        if not self.subscribers:
+            if self.task is not None:
+                self.task.cancel()
+            if broadcasters.get(self.question_id) is self:
+                del broadcasters[self.question_id]
+
+    async def run(self):
+        """Refresh the tallies on every tick the question's version changed."""
+        while True:
+            version = cache.question_version(self.question_id)
+            if version != self.cache_version:
+                try:
+                    await self.refresh()
+                except Http404:
+                    for subscriber in self.subscribers:
+                        subscriber.close()
+                    return
+                except Exception:
+                    logger.exception(f"Could not refresh the results stream of question {self.question_id}")
+                else:
+                    self.cache_version = version
+            await asyncio.sleep(polls_settings.STREAM_TICK)
+
+    async def refresh(self):
+        """Load the tallies once and push the changed ones to every subscriber."""
+        question, choices = await pages.acached_results(self.question_id)
+        registry.inc('polls_stream_refreshes_total')
+        tallies = {choice.pk: choice.votes for choice in choices}
+        changes = {pk: votes for pk, votes in tallies.items() if self.tallies.get(pk) != votes}
+        # A deleted choice is sent as None so the page can drop its row.
+        changes.update((pk, None) for pk in self.tallies.keys() - tallies.keys())
+        first = self.version is None
+        self.tallies, self.version = tallies, question.version
+        if changes or first:
+            for subscriber in self.subscribers:
+                subscriber.push(self.version, sum(tallies.values()), changes)
+
+
+broadcasters = {}
+
+registry.gauge('polls_stream_subscribers', lambda: sum(len(b.subscribers) for b in list(broadcasters.values())))
+
+
+def broadcaster_for(question_id):
+    """Return the broadcaster of a question on the running event loop, creating it if needed."""
+    broadcaster = broadcasters.get(question_id)
+    if broadcaster is None or broadcaster.loop is not asyncio.get_running_loop():
+        broadcaster = broadcasters[question_id] = Broadcaster(question_id)
+    return broadcaster
+
+
+def event(version, total, changes):
+    """Return one 'tally' Server-Sent Event."""
+    data = json.dumps({'total': total, 'choices': changes})
+    return f'event: tally\nid: {version}\ndata: {data}\n\n'
+
+
+async def events(question_id):
+    """Yield the Server-Sent Events of a question's results until the client goes away."""
+    broadcaster = broadcaster_for(question_id)
+    subscriber = broadcaster.subscribe()
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        while not subscriber.closed:
+            update = await subscriber.next(polls_settings.STREAM_HEARTBEAT)
+            if update is not None:
+                yield event(*update)
+            elif not subscriber.closed:
+                yield ': heartbeat\n\n'
+        yield 'event: closed\ndata: {}\n\n'
+    finally:
+        broadcaster.unsubscribe(subscriber)
@@ -0,0 +1,25 @@
+"""Compile the project's templates into the cached loader when the app starts.
+
+With the cached template loader in TEMPLATES, the first request for each
+template would otherwise read and compile it, on whichever worker gets it.
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.template import engines
+
+
+def template_names():
+    """Yield the name of every template in the TEMPLATES directories and in the polls templates."""
+    directories = [Path(directory) for backend in settings.TEMPLATES for directory in backend.get('DIRS', [])]
+    directories.append(Path(__file__).resolve().parent / 'templates')
+    for directory in directories:
+        for path in sorted(directory.rglob('*.html')):
+            yield path.relative_to(directory).as_posix()
+
+
+def precompile():
+    """Load every template of template_names() through each Django template engine, filling its cache."""
+    for engine in engines.all():
+        for name in template_names():
+            engine.get_template(name)
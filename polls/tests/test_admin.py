@@ -0,0 +1,81 @@
+"""Unittest for testing the question admin"""
+import datetime
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from polls import pagination
+from polls.models import Question, Vote
+from polls.search import search_questions
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+class QuestionAdminTests(TestCase):
+    """Testing class for the question changelist."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.admin = User.objects.create_superuser(username='admin', email='admin@gmail.com', password='isp123456')
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:polls_question_changelist')
+
+    def test_states_and_counts(self):
+        """Each row shows the question's state and its choice and vote counts"""
+        question = create_question(question_text='Open question', days=-0.5)
+        choice = question.choice_set.create(choice_text='Choice1')
+        question.choice_set.create(choice_text='Choice2')
+        Vote.cast(self.admin, choice)
+        create_question(question_text='Future question', days=3)
+        response = self.client.get(self.url)
+        rows = {row.question_text: row for row in response.context['cl'].result_list}
+        open_question = rows['Open question']
+        self.assertEqual((open_question.recent, open_question.published, open_question.votable), (True, True, True))
+        self.assertEqual((open_question.choice_count, open_question.total_votes), (2, 1))
+        future = rows['Future question']
+        self.assertEqual((future.published, future.votable, future.choice_count), (False, False, 0))
+
+    def test_queries_do_not_grow_with_rows(self):
+        """The changelist runs as many queries for many questions as for one"""
+        create_question(question_text='Question0', days=-1).choice_set.create(choice_text='Choice')
+        self.client.get(self.url)
+        with self.assertNumQueries(5) as first:
+            self.client.get(self.url)
+        for n in range(1, 20):
+            create_question(question_text=f'Question{n}', days=-1).choice_set.create(choice_text='Choice')
+        with self.assertNumQueries(len(first.captured_queries)):
+            self.client.get(self.url)
+
+    def test_search(self):
+        """Search matches substrings of every term, including terms too short for the index"""
+        create_question(question_text='What is your favourite colour?', days=-1)
+        create_question(question_text='Which colour do you dislike?', days=-1)
+        response = self.client.get(self.url, {'q': 'colour favour'})
+        self.assertEqual([row.question_text for row in response.context['cl'].result_list],
+                         ['What is your favourite colour?'])
+        self.assertEqual(search_questions(Question.objects.all(), 'do').count(), 1)
+        self.assertEqual(search_questions(Question.objects.all(), '"LOUR DO"').count(), 1)
+
+    def test_estimated_count(self):
+        """A large unfiltered changelist is counted by estimate, a filtered one exactly"""
+        create_question(question_text='Question1', days=-1)
+        with mock.patch.object(pagination, 'estimated_count', return_value=2000000):
+            response = self.client.get(self.url)
+            self.assertEqual(response.context['cl'].result_count, 2000000)
+            response = self.client.get(self.url, {'q': 'Question'})
+            self.assertEqual(response.context['cl'].result_count, 1)
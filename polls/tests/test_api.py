@@ -0,0 +1,201 @@
+"""Unittest for testing the JSON API"""
+import datetime
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from polls import settings as polls_settings
+from polls.cache import polls_cache
+from polls.models import Question, Vote
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+class QuestionListApiTests(TestCase):
+    """Testing class for the question list endpoint."""
+
+    def test_list_published_questions(self):
+        """The list has the published questions, newest first, with every field"""
+        create_question(question_text='Past', days=-2)
+        create_question(question_text='Recent', days=-1)
+        create_question(question_text='Future', days=1)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('polls:api_questions'))
+        data = response.json()
+        self.assertEqual([row['question_text'] for row in data['results']], ['Recent', 'Past'])
+        self.assertEqual(set(data['results'][0]), {'id', 'question_text', 'pub_date', 'end_date',
+                                                   'total_votes', 'is_open'})
+        self.assertIsNone(data['next'])
+
+    def test_field_selection(self):
+        """?fields= returns only the selected fields"""
+        create_question(question_text='Question1', days=-1)
+        response = self.client.get(reverse('polls:api_questions'), {'fields': 'id,question_text'})
+        self.assertEqual(list(response.json()['results'][0]), ['id', 'question_text'])
+
+    def test_unknown_field(self):
+        """Selecting a field that does not exist is a bad request"""
+        response = self.client.get(reverse('polls:api_questions'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_pagination(self):
+        """The next link walks every question once"""
+        for n in range(polls_settings.API_PAGE_SIZE + 2):
+            create_question(question_text=f'Question{n}', days=-1 - n)
+        data = self.client.get(reverse('polls:api_questions'), {'fields': 'id'}).json()
+        self.assertEqual(len(data['results']), polls_settings.API_PAGE_SIZE)
+        self.assertIn('fields=id', data['next'])
+        rest = self.client.get(data['next']).json()
+        self.assertEqual(len(rest['results']), 2)
+        self.assertIsNone(rest['next'])
+
+    def test_out_of_range_cursor(self):
+        """A cursor whose numbers overflow is a 404, not a server error"""
+        response = self.client.get(reverse('polls:api_questions'), {'before': '9' * 30 + '_1'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_not_modified(self):
+        """A current ETag gets 304 Not Modified"""
+        create_question(question_text='Question1', days=-1)
+        response = self.client.get(reverse('polls:api_questions'))
+        response = self.client.get(reverse('polls:api_questions'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_read_only(self):
+        """The API only answers safe methods"""
+        response = self.client.post(reverse('polls:api_questions'))
+        self.assertEqual(response.status_code, 405)
+
+
+class QuestionApiTests(TestCase):
+    """Testing class for the question detail and tallies endpoints."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.user1 = User.objects.create_user(username="User1", password='isp123456')
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.choice1 = self.question1.choice_set.create(choice_text='Choice1')
+        self.choice2 = self.question1.choice_set.create(choice_text='Choice2')
+
+    def test_question_with_choices(self):
+        """The detail has the question and its choices with their votes"""
+        Vote.cast(self.user1, self.choice2)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('polls:api_question', args=(self.question1.id,)))
+        data = response.json()
+        self.assertEqual(data['question_text'], 'Question1')
+        self.assertTrue(data['is_open'])
+        self.assertEqual(data['choices'], [
+            {'id': self.choice1.id, 'choice_text': 'Choice1', 'votes': 0},
+            {'id': self.choice2.id, 'choice_text': 'Choice2', 'votes': 1},
+        ])
+
+    def test_question_field_selection(self):
+        """?fields= can leave out the choices"""
+        response = self.client.get(reverse('polls:api_question', args=(self.question1.id,)), {'fields': 'id'})
+        self.assertEqual(response.json(), {'id': self.question1.id})
+
+    def test_unknown_question(self):
+        """A question that does not exist returns 404"""
+        response = self.client.get(reverse('polls:api_question', args=(999,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_tallies(self):
+        """The tallies have the total and the votes of each choice"""
+        Vote.cast(self.user1, self.choice1)
+        response = self.client.get(reverse('polls:api_tallies', args=(self.question1.id,)))
+        self.assertEqual(response.json(), {
+            'id': self.question1.id,
+            'total_votes': 1,
+            'choices': [{'id': self.choice1.id, 'votes': 1}, {'id': self.choice2.id, 'votes': 0}],
+        })
+
+    def test_vote_changes_the_etag(self):
+        """A vote makes the old ETag stale"""
+        url = reverse('polls:api_tallies', args=(self.question1.id,))
+        etag = self.client.get(url)['ETag']
+        Vote.cast(self.user1, self.choice1)
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_votes'], 1)
+
+
+class TimeseriesApiTests(TestCase):
+    """Testing class for the time series endpoint."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.users = [User.objects.create_user(username=f"User{i}", password='isp123456') for i in range(3)]
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.choice1 = self.question1.choice_set.create(choice_text='Choice1')
+        self.choice2 = self.question1.choice_set.create(choice_text='Choice2')
+        self.url = reverse('polls:api_timeseries', args=(self.question1.id,))
+
+    def test_hourly_series(self):
+        """Each bucket lists the change of each choice; a changed vote moves one count between choices"""
+        start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        for hours, user, choice in ((0, 0, self.choice1), (0, 1, self.choice1), (1, 1, self.choice2)):
+            with mock.patch('django.utils.timezone.now', return_value=start + datetime.timedelta(hours=hours)):
+                Vote.cast(self.users[user], choice)
+        with self.assertNumQueries(3):
+            data = self.client.get(self.url).json()
+        self.assertEqual(data['resolution'], 'hour')
+        self.assertEqual(data['choices'], [self.choice1.id, self.choice2.id])
+        self.assertEqual(len(data['buckets']), 2)
+        self.assertEqual(data['votes'], [[2, 0], [-1, 1]])
+
+    def test_minute_series(self):
+        """?resolution=minute reads the minute rollups"""
+        Vote.cast(self.users[0], self.choice2)
+        data = self.client.get(self.url, {'resolution': 'minute'}).json()
+        self.assertEqual((data['resolution'], data['votes']), ('minute', [[0, 1]]))
+
+    def test_unknown_resolution(self):
+        """An unknown resolution is a bad request"""
+        response = self.client.get(self.url, {'resolution': 'day'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_resolution_in_etag(self):
+        """The minute and hour series of a question have different ETags"""
+        hourly = self.client.get(self.url)['ETag']
+        self.assertNotEqual(self.client.get(self.url, {'resolution': 'minute'})['ETag'], hourly)
+
+
+class ApiCacheTests(TransactionTestCase):
+    """Testing class for the API reading through the page cache.
+
+    Values are only cached outside transactions, so these tests run without
+    the transaction TestCase wraps around each test.
+    """
+
+    def setUp(self):
+        """For setup the test"""
+        polls_cache().clear()
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.question1.choice_set.create(choice_text='Choice1')
+
+    def tearDown(self):
+        """Leave no cached value to the next test"""
+        polls_cache().clear()
+
+    def test_cached_responses_run_no_query(self):
+        """A second request for the list or a question runs no query"""
+        for url in (reverse('polls:api_questions'), reverse('polls:api_question', args=(self.question1.id,))):
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,130 @@
+"""Unittest for testing the async vote, detail and results views"""
+import datetime
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.urls import include, path, reverse
+from django.contrib.auth.models import User
+
+from polls import async_views, views
+from polls.models import Question, Vote
+from polls.ratelimit import limit_votes
+
+# The polls URLs as mysite.asgi serves them.
+urlpatterns = [
+    path('polls/', include(([
+        path('', views.IndexView.as_view(), name='index'),
+        path('<int:pk>/', async_views.vote_for_poll, name='detail'),
+        path('<int:pk>/results/', async_views.results, name='results'),
+        path('<int:question_id>/vote/', limit_votes(async_views.vote), name='vote'),
+        path('<int:pk>/results/stream/', async_views.results_stream, name='results_stream'),
+    ], 'polls'))),
+    path('accounts/login/', async_views.login, name='login'),
+    path('accounts/', include('django.contrib.auth.urls')),
+]
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+@override_settings(ROOT_URLCONF='polls.tests.test_async_views')
+class AsyncViewTests(TestCase):
+    """Testing class for the async views."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.user1 = User.objects.create_user(username="User1", password='isp123456')
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.choice1 = self.question1.choice_set.create(choice_text='Choice1')
+        self.choice2 = self.question1.choice_set.create(choice_text='Choice2')
+        self.vote_url = reverse('polls:vote', args=(self.question1.id,))
+
+    async def test_vote_requires_login(self):
+        """Unauthenticated user is sent to the login page"""
+        response = await self.async_client.post(self.vote_url, {'choice': self.choice1.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login'), response['Location'])
+
+    async def test_vote_and_replace_vote(self):
+        """An async vote is saved and a second vote replaces it"""
+        await self.async_client.aforce_login(self.user1)
+        response = await self.async_client.post(self.vote_url, {'choice': self.choice1.id})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question1.id,)),
+                             fetch_redirect_response=False)
+        await self.async_client.post(self.vote_url, {'choice': self.choice2.id})
+        vote = await Vote.objects.aget(user=self.user1)
+        self.assertEqual(vote.user_choice_id, self.choice2.id)
+
+    async def test_vote_on_closed_poll(self):
+        """An async vote for a closed poll is refused"""
+        await Question.objects.filter(pk=self.question1.pk).aupdate(end_date=timezone.now())
+        await self.async_client.aforce_login(self.user1)
+        response = await self.async_client.post(self.vote_url, {'choice': self.choice1.id})
+        self.assertRedirects(response, reverse('polls:index'), fetch_redirect_response=False)
+        self.assertFalse(await Vote.objects.aexists())
+
+    async def test_vote_without_choice(self):
+        """Posting without a choice shows the form again"""
+        await self.async_client.aforce_login(self.user1)
+        response = await self.async_client.post(self.vote_url, {})
+        self.assertContains(response, "You didn&#x27;t select a choice.")
+        self.assertContains(response, 'Choice2')
+
+    async def test_detail_shows_previous_vote(self):
+        """The detail page shows the choices and the user's previous vote"""
+        await Vote.objects.acreate(question=self.question1, user=self.user1, user_choice=self.choice2)
+        await self.async_client.aforce_login(self.user1)
+        response = await self.async_client.get(reverse('polls:detail', args=(self.question1.id,)))
+        self.assertContains(response, 'Choice1')
+        self.assertContains(response, 'You previous vote is : Choice2')
+
+    async def test_detail_of_closed_question(self):
+        """A closed question redirects to the index"""
+        closed = await Question.objects.acreate(question_text='Closed',
+                                                pub_date=timezone.now() - datetime.timedelta(days=2),
+                                                end_date=timezone.now() - datetime.timedelta(days=1))
+        await self.async_client.aforce_login(self.user1)
+        response = await self.async_client.get(reverse('polls:detail', args=(closed.id,)))
+        self.assertRedirects(response, reverse('polls:index'), fetch_redirect_response=False)
+
+    async def test_results_and_not_modified(self):
+        """The async results page renders the tallies and answers 304 for a current ETag"""
+        url = reverse('polls:results', args=(self.question1.id,))
+        response = await self.async_client.get(url)
+        self.assertContains(response, 'Choice1')
+        self.assertContains(response, reverse('polls:results_stream', args=(self.question1.id,)))
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_results_unknown_question(self):
+        """The async results page of a question that does not exist returns 404"""
+        response = await self.async_client.get(reverse('polls:results', args=(999,)))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(ROOT_URLCONF='polls.tests.test_async_views', LOGIN_REDIRECT_URL='polls:index')
+class AsyncLoginTests(TransactionTestCase):
+    """Testing class for the async login view.
+
+    It runs the login in another thread, which only sees committed rows, so
+    these tests run without the transaction TestCase wraps around each test.
+    """
+
+    async def test_login(self):
+        """A user logs in through the async login view"""
+        user = await User.objects.acreate_user(username="User1", password='isp123456')
+        response = await self.async_client.post(reverse('login'), {'username': 'User1', 'password': 'isp123456'})
+        self.assertRedirects(response, reverse('polls:index'), fetch_redirect_response=False)
+        session = await self.async_client.asession()
+        self.assertEqual(await session.aget('_auth_user_id'), str(user.pk))
@@ -1,9 +1,15 @@
 """Unittest for testing the authentication"""
+import datetime
+from unittest import mock
 
-from django.test import TestCase
+from django.core.cache import caches
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
 
+from polls import hashers
 from polls.models import Question
 
 
@@ -39,5 +45,78 @@ class LogOutTest(TestCase):
         """If logout is work it should redirect to somewhere"""
         create_user("User1", "User1@gmail.com", "isp123456")
         self.client.login(username='User1', password='isp123456')
-        response = self.client.get(reverse('logout'))
+        response = self.client.post(reverse('logout'))
         self.assertEqual(response.status_code, 302)
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+    MESSAGE_STORAGE='django.contrib.messages.storage.cookie.CookieStorage',
+)
+class CachedUserTests(TransactionTestCase):
+    """Class for test the cached users of logged-in sessions.
+
+    Users are only cached outside transactions, so these tests run without the
+    transaction TestCase wraps around each test.
+    """
+
+    def setUp(self):
+        """For setup the test"""
+        caches['users'].clear()
+        self.user = User.objects.create_user(username='User1', password='isp123456')
+        self.client.login(username='User1', password='isp123456')
+        time = timezone.now() - datetime.timedelta(days=1)
+        self.question = Question.objects.create(question_text='Question1', pub_date=time,
+                                                end_date=time + datetime.timedelta(days=7))
+        self.choice = self.question.choice_set.create(choice_text='Choice1')
+
+    def tearDown(self):
+        """Leave no cached user to the next test"""
+        caches['users'].clear()
+
+    def test_vote_only_queries_the_vote(self):
+        """With cookie sessions and a cached user, voting reads neither the session nor the user table"""
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(8) as queries:
+            response = self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.choice.id})
+        self.assertEqual(response.status_code, 302)
+        tables = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('auth_user', tables)
+        self.assertNotIn('django_session', tables)
+
+    def test_saved_user_is_reloaded(self):
+        """Deactivating a user logs their sessions out at once"""
+        self.client.get(reverse('polls:index'))
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse('polls:index'))
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_users_are_cached_apart_from_the_pages(self):
+        """Logged-in users are kept in the locmem 'users' cache, not in the polls cache"""
+        self.client.get(reverse('polls:index'))
+        key = f'polls:user:{self.user.pk}'
+        self.assertEqual(caches['users'].get(key), self.user)
+        self.assertIsNone(caches['polls'].get(key))
+
+
+class PasswordHasherTests(TestCase):
+    """Class for test the password hashers"""
+
+    @override_settings(PASSWORD_HASHERS=['polls.hashers.ScryptPasswordHasher', 'polls.hashers.PBKDF2PasswordHasher'])
+    def test_rehash_on_login(self):
+        """A password stored with another hasher is rehashed with the first one at login"""
+        user = User(username='User1', password=make_password('isp123456', hasher='pbkdf2_sha256'))
+        user.save()
+        self.assertTrue(self.client.login(username='User1', password='isp123456'))
+        self.assertTrue(User.objects.get(username='User1').password.startswith('scrypt$'))
+
+    def test_hash_in_process_pool(self):
+        """With hash workers, passwords are hashed and checked in another process"""
+        with mock.patch.object(hashers, 'HASH_WORKERS', 1), mock.patch.object(hashers, '_pool', None):
+            hasher = hashers.PBKDF2PasswordHasher()
+            encoded = hasher.encode('isp123456', hasher.salt())
+            self.assertIsNotNone(hashers._pool)
+            self.assertTrue(hasher.verify('isp123456', encoded))
+            self.assertFalse(hasher.verify('isp555555', encoded))
+            self.addCleanup(hashers._pool.shutdown)
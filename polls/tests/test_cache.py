@@ -0,0 +1,98 @@
+"""Unittest for testing the cached polls pages"""
+import datetime
+import time
+from unittest import mock
+
+from django.test import TransactionTestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from polls import settings as polls_settings
+from polls.cache import polls_cache
+from polls.metrics import registry
+from polls.models import Question, Vote
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+class PageCacheTests(TransactionTestCase):
+    """Testing class for the cached results and index pages.
+
+    Pages are only cached outside transactions, so these tests run without the
+    transaction TestCase wraps around each test.
+    """
+
+    def setUp(self):
+        """For setup the test"""
+        polls_cache().clear()
+        self.user1 = User.objects.create_user(username="User1", password='isp123456')
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.choice1 = self.question1.choice_set.create(choice_text='Choice1')
+        self.results_url = reverse('polls:results', args=(self.question1.id,))
+
+    def tearDown(self):
+        """Leave no cached page to the next test"""
+        polls_cache().clear()
+
+    def test_results_are_served_from_the_cache(self):
+        """A second visit to the results page runs no query"""
+        self.client.get(self.results_url)
+        hits = registry.snapshot()['counters'].get('polls_cache_results_hits_total', 0)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.results_url)
+        self.assertEqual(response.context['total_votes'], 0)
+        self.assertEqual(registry.snapshot()['counters']['polls_cache_results_hits_total'], hits + 1)
+
+    def test_vote_makes_cached_results_stale(self):
+        """A new vote shows up on the results page at once"""
+        self.client.get(self.results_url)
+        Vote.cast(self.user1, self.choice1)
+        response = self.client.get(self.results_url)
+        self.assertEqual(response.context['total_votes'], 1)
+
+    def test_other_workers_votes_show_up_once_the_local_entry_expires(self):
+        """A locmem entry another worker's vote did not make stale lives LOCAL_CACHE_TIMEOUT seconds at most"""
+        self.client.get(self.results_url)
+        # The vote bumps the versions of another worker's locmem cache, not this one's.
+        with mock.patch('polls.cache._bump'):
+            Vote.cast(self.user1, self.choice1)
+        self.assertEqual(self.client.get(self.results_url).context['total_votes'], 0)
+        later = time.time() + polls_settings.LOCAL_CACHE_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            response = self.client.get(self.results_url)
+        self.assertEqual(response.context['total_votes'], 1)
+
+    def test_new_choice_makes_cached_results_stale(self):
+        """A choice added to the question shows up on the results page at once"""
+        self.client.get(self.results_url)
+        self.question1.choice_set.create(choice_text='Choice2')
+        response = self.client.get(self.results_url)
+        self.assertContains(response, 'Choice2')
+
+    def test_index_is_served_from_the_cache(self):
+        """A second visit to the index page runs no query"""
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, 'Question1')
+
+    def test_saved_question_makes_cached_index_stale(self):
+        """Editing a question shows up on the index page at once"""
+        self.client.get(reverse('polls:index'))
+        self.question1.question_text = 'Edited question'
+        self.question1.save()
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, 'Edited question')
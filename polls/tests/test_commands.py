@@ -0,0 +1,248 @@
+"""Unittest for testing the management commands"""
+import csv
+import datetime
+import json
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from polls.models import Choice, Question, Vote
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+class RebuildVoteCountsTests(TestCase):
+    """Testing class for the rebuild_vote_counts command."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.user1 = User.objects.create_user(username="User1", email='User1@gmail.com', password='isp123456')
+        self.user2 = User.objects.create_user(username="User2", email='User2@gmail.com', password='isp123456')
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.choice1 = self.question1.choice_set.create(choice_text='Choice1')
+        self.choice2 = self.question1.choice_set.create(choice_text='Choice2')
+        Vote.cast(self.user1, self.choice1)
+        Vote.cast(self.user2, self.choice2)
+
+    def test_check_passes_when_counters_match(self):
+        """--check reports nothing when the counters agree with the votes"""
+        out = StringIO()
+        call_command('rebuild_vote_counts', check=True, stdout=out)
+        self.assertIn("All vote counters match", out.getvalue())
+
+    def test_check_fails_when_counters_drift(self):
+        """--check raises an error when a counter does not match the votes"""
+        Choice.objects.filter(pk=self.choice1.pk).update(votes=5)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_vote_counts', check=True, stdout=StringIO())
+
+    def test_rebuild_fixes_counters(self):
+        """Rebuilding recounts every choice and question from the votes"""
+        Choice.objects.update(votes=0)
+        Question.objects.update(total_votes=9)
+        call_command('rebuild_vote_counts', stdout=StringIO())
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.question1.refresh_from_db()
+        self.assertEqual((self.choice1.votes, self.choice2.votes, self.question1.total_votes), (1, 1, 2))
+
+    def test_rebuild_makes_cached_results_stale(self):
+        """A question whose split drifted gets a new version, so its results page and ETag change"""
+        Choice.objects.filter(pk=self.choice1.pk).update(votes=0)
+        Choice.objects.filter(pk=self.choice2.pk).update(votes=2)
+        url = reverse('polls:results', args=(self.question1.id,))
+        etag = self.client.get(url)['ETag']
+        version = Question.objects.get(pk=self.question1.pk).version
+        call_command('rebuild_vote_counts', stdout=StringIO())
+        self.assertGreater(Question.objects.get(pk=self.question1.pk).version, version)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([choice.votes for choice in response.context['choices']], [1, 1])
+
+
+class ExportVotesTests(TestCase):
+    """Testing class for the export_votes command and admin actions."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.user1 = User.objects.create_user(username="User1", email='User1@gmail.com', password='isp123456')
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.question2 = create_question(question_text='Question2, closed', days=-10)
+        self.choice1 = self.question1.choice_set.create(choice_text='Choice1')
+        self.choice2 = self.question2.choice_set.create(choice_text='Choice2')
+        Vote.cast(self.user1, self.choice1)
+        Vote.cast(self.user1, self.choice2)
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export_votes', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_export_csv(self):
+        """Every vote is exported as a CSV row under a header"""
+        rows = list(csv.reader(StringIO(self.export())))
+        self.assertEqual(rows[0], ['vote_id', 'question_id', 'question_text', 'choice_id', 'choice_text',
+                                   'user_id', 'username'])
+        self.assertEqual([row[2] for row in rows[1:]], ['Question1', 'Question2, closed'])
+
+    def test_export_ndjson(self):
+        """NDJSON has one object per vote"""
+        lines = self.export('--format', 'ndjson', '--chunk-size', '1').splitlines()
+        self.assertEqual([json.loads(line)['choice_text'] for line in lines], ['Choice1', 'Choice2'])
+
+    def test_filters(self):
+        """The question, status and date filters narrow the export"""
+        def questions(*args):
+            return [json.loads(line)['question_id'] for line in self.export('--format', 'ndjson', *args).splitlines()]
+        self.assertEqual(questions('--question', str(self.question2.id)), [self.question2.id])
+        self.assertEqual(questions('--status', 'open'), [self.question1.id])
+        self.assertEqual(questions('--status', 'closed'), [self.question2.id])
+        since = (timezone.now() - datetime.timedelta(days=2)).date().isoformat()
+        self.assertEqual(questions('--since', since), [self.question1.id])
+        self.assertEqual(questions('--until', since), [self.question2.id])
+
+    def test_export_to_file(self):
+        """--output writes the export to a file"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'votes.csv')
+            self.export('--output', path)
+            with open(path) as exported:
+                self.assertEqual(len(exported.readlines()), 3)
+
+    def test_admin_action(self):
+        """The admin action streams the votes of the selected questions"""
+        User.objects.create_superuser(username='admin', email='admin@gmail.com', password='isp123456')
+        self.client.login(username='admin', password='isp123456')
+        response = self.client.post(reverse('admin:polls_question_changelist'), {
+            'action': 'export_votes_csv', '_selected_action': [self.question1.id],
+        })
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row[2] for row in rows[1:]], ['Question1'])
+
+
+class ImportPollsTests(TestCase):
+    """Testing class for the import_polls command."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.user1 = User.objects.create_user(username="User1", email='User1@gmail.com', password='isp123456')
+
+    def write(self, name, rows):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', newline='') as file:
+            if name.endswith('.csv'):
+                writer = csv.DictWriter(file, ['question_text', 'pub_date', 'end_date', 'choice_text', 'username'])
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                file.writelines(json.dumps(row) + '\n' for row in rows)
+        return path
+
+    def rows(self):
+        question = {'question_text': 'Imported', 'pub_date': '2021-01-01T00:00:00+00:00',
+                    'end_date': '2021-02-01T00:00:00+00:00'}
+        return [
+            dict(question, choice_text='Yes'),
+            dict(question, choice_text='No'),
+            dict(question, choice_text='Yes', username='User1'),
+            dict(question, choice_text='No', username='Imported1'),
+            dict(question, choice_text='No', username='Imported2'),
+        ]
+
+    def test_import_csv(self):
+        """Questions, choices, users and votes are created with their counters"""
+        call_command('import_polls', self.write('polls.csv', self.rows()), '--chunk-size', '2', stdout=StringIO())
+        question = Question.objects.get(question_text='Imported')
+        self.assertEqual(question.total_votes, 3)
+        self.assertEqual(dict(question.choice_set.values_list('choice_text', 'votes')), {'Yes': 1, 'No': 2})
+        self.assertFalse(User.objects.get(username='Imported1').has_usable_password())
+
+    def test_import_is_idempotent(self):
+        """Importing the same rows again changes nothing"""
+        path = self.write('polls.jsonl', self.rows())
+        call_command('import_polls', path, stdout=StringIO())
+        call_command('import_polls', path, stdout=StringIO())
+        self.assertEqual(Question.objects.count(), 1)
+        self.assertEqual(Choice.objects.count(), 2)
+        self.assertEqual(Vote.objects.count(), 3)
+
+    def test_vote_conflicts(self):
+        """A vote on an already voted question replaces it, or is skipped with --on-conflict skip"""
+        rows = self.rows()
+        call_command('import_polls', self.write('polls.jsonl', rows), stdout=StringIO())
+        changed = [dict(rows[0], username='User1')]
+        call_command('import_polls', self.write('skip.jsonl', changed), '--on-conflict', 'skip', stdout=StringIO())
+        self.assertEqual(Vote.objects.get(user=self.user1).user_choice.choice_text, 'Yes')
+        call_command('import_polls', self.write('update.jsonl', [dict(rows[1], username='User1')]), stdout=StringIO())
+        self.assertEqual(Vote.objects.get(user=self.user1).user_choice.choice_text, 'No')
+        self.assertEqual(dict(Choice.objects.values_list('choice_text', 'votes')), {'Yes': 0, 'No': 3})
+
+    def test_resume_after_failure(self):
+        """A failed import keeps its committed chunks and resumes after them"""
+        rows = self.rows()
+        bad = dict(rows[4], pub_date='yesterday')
+        path = self.write('polls.jsonl', rows[:4] + [bad])
+        with self.assertRaises(CommandError):
+            call_command('import_polls', path, '--chunk-size', '2', stdout=StringIO())
+        self.assertEqual(Vote.objects.count(), 2)
+        with open(path + '.checkpoint') as checkpoint:
+            self.assertEqual(checkpoint.read(), '4')
+        path = self.write('polls.jsonl', rows)
+        out = StringIO()
+        call_command('import_polls', path, '--chunk-size', '2', stdout=out)
+        self.assertIn('Resuming after row 4.', out.getvalue())
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+    def test_new_question_needs_end_date(self):
+        """A question that does not exist yet cannot be created without an end date"""
+        path = self.write('polls.jsonl', [dict(self.rows()[0], end_date='')])
+        with self.assertRaises(CommandError):
+            call_command('import_polls', path, stdout=StringIO())
+
+
+class SyncReplicaTests(TransactionTestCase):
+    """Testing class for the sync_replica command, which cannot copy from inside a transaction."""
+
+    def test_copy_to_file(self):
+        """The named file becomes a copy of the database, questions and all"""
+        create_question(question_text='Question1', days=-1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'replica.sqlite3')
+            out = StringIO()
+            call_command('sync_replica', path, stdout=out)
+            self.assertIn(f'Copied to {path}', out.getvalue())
+            copy = sqlite3.connect(path)
+            try:
+                rows = copy.execute('SELECT question_text FROM polls_question').fetchall()
+            finally:
+                copy.close()
+        self.assertEqual(rows, [('Question1',)])
+
+    def test_no_replicas(self):
+        """Without replicas configured or named there is nothing to copy to"""
+        with self.assertRaises(CommandError):
+            call_command('sync_replica', stdout=StringIO())
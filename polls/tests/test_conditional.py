@@ -0,0 +1,123 @@
+"""Unittest for testing conditional GET on the polls pages"""
+import datetime
+from unittest import mock
+
+from django.test import Client, TestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from polls import settings as polls_settings
+from polls.models import Question, Vote
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+class ResultsConditionalGetTests(TestCase):
+    """Testing class for ETag and Last-Modified on the results page."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.user1 = User.objects.create_user(username="User1", password='isp123456')
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.choice1 = self.question1.choice_set.create(choice_text='Choice1')
+        self.url = reverse('polls:results', args=(self.question1.id,))
+
+    def test_results_send_validators(self):
+        """The results page carries a strong ETag, Last-Modified and Cache-Control"""
+        response = self.client.get(self.url)
+        self.assertTrue(response['ETag'].startswith('"results-'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('must-revalidate', response['Cache-Control'])
+
+    def test_unchanged_results_are_not_modified(self):
+        """A matching If-None-Match answers 304 without rendering the template"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertTemplateNotUsed(response, 'polls/results.html')
+
+    def test_vote_changes_the_etag(self):
+        """A new vote gives the results page a new ETag"""
+        etag = self.client.get(self.url)['ETag']
+        Vote.cast(self.user1, self.choice1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        """A matching If-Modified-Since answers 304"""
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_cache_control_is_configurable(self):
+        """The Cache-Control directives come from polls.settings.CACHE_CONTROL"""
+        with mock.patch.dict(polls_settings.CACHE_CONTROL, results={'public': True, 'max_age': 60}):
+            response = self.client.get(self.url)
+        self.assertIn('max-age=60', response['Cache-Control'])
+
+
+class IndexConditionalGetTests(TestCase):
+    """Testing class for ETag on the index page."""
+
+    def setUp(self):
+        """For setup the test"""
+        User.objects.create_user(username="User1", password='isp123456')
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.url = reverse('polls:index')
+
+    def test_unchanged_index_is_not_modified(self):
+        """A matching If-None-Match answers 304 without rendering the template"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertTemplateNotUsed(response, 'polls/index.html')
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_edited_question_changes_the_etag(self):
+        """Editing a question on the page gives the index a new ETag"""
+        etag = self.client.get(self.url)['ETag']
+        self.question1.question_text = 'Edited question'
+        self.question1.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_the_user(self):
+        """Logging in changes the ETag, since the page greets the user"""
+        etag = self.client.get(self.url)['ETag']
+        self.client.login(username='User1', password='isp123456')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_logged_in_index_is_not_validated(self):
+        """A logged-in user's index carries a CSRF token, so it gets no ETag or Last-Modified"""
+        self.client.login(username='User1', password='isp123456')
+        response = self.client.get(self.url)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_logout_works_after_logging_in_again(self):
+        """The logout form of an index seen before a new login still has a valid CSRF token"""
+        client = Client(enforce_csrf_checks=True)
+        client.login(username='User1', password='isp123456')
+        first = client.get(self.url)
+        client.logout()
+        client.login(username='User1', password='isp123456')
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=first.get('ETag', '*'),
+                              HTTP_IF_MODIFIED_SINCE=first.get('Last-Modified', ''))
+        self.assertEqual(response.status_code, 200)
+        token = response.context['csrf_token']
+        self.assertEqual(client.post(reverse('logout'), {'csrfmiddlewaretoken': token}).status_code, 302)
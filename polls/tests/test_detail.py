@@ -6,7 +6,13 @@ from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.models import User
 
-from polls.models import Question
+from polls.models import Question, Vote
+
+# The detail page runs the session and user lookups, one query for the
+# question with the user's vote, and one for its choices, however many there are.
+DETAIL_QUERY_BUDGET = 4
+# A closed poll redirects after the question query, before loading the choices.
+CLOSED_DETAIL_QUERY_BUDGET = 3
 
 def create_question(question_text, days, end_date=7):
     """
@@ -38,4 +44,41 @@ class QuestionDetailViewTests(TestCase):
         past_question = create_question(question_text='Past Question.', days=-5)
         url = reverse('polls:detail', args=(past_question.id,))
         response = self.client.get(url)
-        self.assertContains(response, past_question.question_text)
\ No newline at end of file
+        self.assertContains(response, past_question.question_text)
+
+class QuestionDetailQueryBudgetTests(TestCase):
+    """Testing class for the queries of the detail page."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.user1 = User.objects.create_user(username="User1", email='User1@gmail.com', password='isp123456')
+        self.client.force_login(self.user1)
+        self.question = create_question(question_text='Question1', days=-1)
+        self.choices = [self.question.choice_set.create(choice_text=f'Choice{i}') for i in range(30)]
+
+    def test_detail_query_budget(self):
+        """The detail page with a previous vote stays within the query budget"""
+        Vote.cast(self.user1, self.choices[7])
+        with self.assertNumQueries(DETAIL_QUERY_BUDGET):
+            response = self.client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertTrue(response.context['has_previous_vote'])
+        self.assertEqual(response.context['previous_selected_vote_text'], 'Choice7')
+        self.assertEqual(len(response.context['choices']), 30)
+
+    def test_detail_without_previous_vote(self):
+        """A user who has not voted yet sees no previous vote"""
+        response = self.client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertFalse(response.context['has_previous_vote'])
+        self.assertEqual(response.context['previous_selected_vote_text'], '')
+
+    def test_closed_detail_query_budget(self):
+        """A closed poll redirects without loading its choices"""
+        closed = create_question(question_text='Closed', days=-10)
+        with self.assertNumQueries(CLOSED_DETAIL_QUERY_BUDGET):
+            response = self.client.get(reverse('polls:detail', args=(closed.id,)))
+        self.assertRedirects(response, reverse('polls:index'), fetch_redirect_response=False)
+
+    def test_unknown_question(self):
+        """The detail page of a question that does not exist returns 404"""
+        response = self.client.get(reverse('polls:detail', args=(999,)))
+        self.assertEqual(response.status_code, 404)
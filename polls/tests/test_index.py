@@ -6,6 +6,7 @@ from django.utils import timezone
 from django.urls import reverse
 
 from polls.models import Question
+from polls.settings import INDEX_PAGE_SIZE
 
 
 def create_question(question_text, days, end_date=7):
@@ -30,15 +31,16 @@ class QuestionIndexViewTests(TestCase):
         response = self.client.get(reverse('polls:index'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "No polls are available.")
-        self.assertQuerysetEqual(response.context['latest_question_list'], [])
+        self.assertQuerySetEqual(response.context['latest_question_list'], [])
 
     def test_past_question(self):
         """Questions with a pub_date in the past are displayed on the index page."""
         create_question(question_text="Past question.", days=-30)
         response = self.client.get(reverse('polls:index'))
-        self.assertQuerysetEqual(
+        self.assertQuerySetEqual(
             response.context['latest_question_list'],
-            ['<Question: Past question.>']
+            ['<Question: Past question.>'],
+            transform=repr,
         )
 
     def test_future_question(self):
@@ -46,16 +48,17 @@ class QuestionIndexViewTests(TestCase):
         create_question(question_text="Future question.", days=30)
         response = self.client.get(reverse('polls:index'))
         self.assertContains(response, "No polls are available.")
-        self.assertQuerysetEqual(response.context['latest_question_list'], [])
+        self.assertQuerySetEqual(response.context['latest_question_list'], [])
 
     def test_future_question_and_past_question(self):
         """Even if both past and future questions exist, only past questions are displayed."""
         create_question(question_text="Past question.", days=-30)
         create_question(question_text="Future question.", days=30)
         response = self.client.get(reverse('polls:index'))
-        self.assertQuerysetEqual(
+        self.assertQuerySetEqual(
             response.context['latest_question_list'],
-            ['<Question: Past question.>']
+            ['<Question: Past question.>'],
+            transform=repr,
         )
 
     def test_two_past_questions(self):
@@ -63,7 +66,64 @@ class QuestionIndexViewTests(TestCase):
         create_question(question_text="Past question 1.", days=-30)
         create_question(question_text="Past question 2.", days=-5)
         response = self.client.get(reverse('polls:index'))
-        self.assertQuerysetEqual(
+        self.assertQuerySetEqual(
             response.context['latest_question_list'],
-            ['<Question: Past question 2.>', '<Question: Past question 1.>']
+            ['<Question: Past question 2.>', '<Question: Past question 1.>'],
+            transform=repr,
         )
+
+
+class QuestionIndexPaginationTests(TestCase):
+    """Testing class for the pages and filters of the index page."""
+
+    def setUp(self):
+        """For setup the test"""
+        for i in range(12):
+            create_question(question_text=f"Past question {i}.", days=-30 + i, end_date=60)
+        create_question(question_text="Closed question.", days=-40, end_date=1)
+
+    def test_first_page_holds_the_latest_questions(self):
+        """The first page shows the newest questions and a cursor to the next page"""
+        response = self.client.get(reverse('polls:index'))
+        self.assertEqual(len(response.context['latest_question_list']), INDEX_PAGE_SIZE)
+        self.assertEqual(response.context['latest_question_list'][0].question_text, "Past question 11.")
+        self.assertIsNotNone(response.context['next_cursor'])
+
+    def test_cursor_walks_every_question_once(self):
+        """Following the cursors visits each published question exactly once"""
+        seen = []
+        cursor = None
+        while True:
+            response = self.client.get(reverse('polls:index'), {'before': cursor} if cursor else {})
+            seen += [question.question_text for question in response.context['latest_question_list']]
+            cursor = response.context['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 13)
+        self.assertEqual(len(set(seen)), 13)
+        self.assertEqual(seen[-1], "Closed question.")
+
+    def test_invalid_cursor(self):
+        """A malformed cursor returns 404"""
+        for cursor in ('nonsense', '9' * 30 + '_1', '1_' + '9' * 30):
+            response = self.client.get(reverse('polls:index'), {'before': cursor})
+            self.assertEqual(response.status_code, 404)
+
+    def test_open_and_closed_filters(self):
+        """The status filter shows only open or only closed polls"""
+        response = self.client.get(reverse('polls:index'), {'status': 'closed'})
+        self.assertQuerySetEqual(
+            response.context['latest_question_list'], ['<Question: Closed question.>'], transform=repr
+        )
+        self.assertFalse(response.context['latest_question_list'][0].is_open)
+        response = self.client.get(reverse('polls:index'), {'status': 'open'})
+        self.assertTrue(all(question.is_open for question in response.context['latest_question_list']))
+
+    def test_index_query_count_does_not_grow(self):
+        """The index page runs one query however many questions exist"""
+        with self.assertNumQueries(1):
+            self.client.get(reverse('polls:index'))
+        for i in range(20):
+            create_question(question_text=f"More question {i}.", days=-50)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('polls:index'), {'status': 'open'})
@@ -0,0 +1,195 @@
+"""Unittest for testing the write-behind vote buffer"""
+import datetime
+import fcntl
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, TransactionTestCase
+from django.db import OperationalError
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from polls import ingest
+from polls import settings as polls_settings
+from polls.ingest import VoteBuffer, VoteJournal
+from polls.metrics import registry
+from polls.models import Question, Vote
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+class VoteBufferTests(TestCase):
+    """Testing class for queueing and flushing votes."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.user1 = User.objects.create_user(username="User1", password='isp123456')
+        self.user2 = User.objects.create_user(username="User2", password='isp123456')
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.choice1 = self.question1.choice_set.create(choice_text='Choice1')
+        self.choice2 = self.question1.choice_set.create(choice_text='Choice2')
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self.directory.name, 'votes.journal')
+
+    def tearDown(self):
+        """Remove the journal directory"""
+        self.directory.cleanup()
+
+    def test_flush_writes_last_vote_of_each_user(self):
+        """Within a batch the last vote of a user on a question wins"""
+        buffer = VoteBuffer(batch_size=10, flush_interval=1)
+        buffer.submit(self.user1.id, self.question1.id, self.choice1.id)
+        buffer.submit(self.user2.id, self.question1.id, self.choice1.id)
+        buffer.submit(self.user1.id, self.question1.id, self.choice2.id)
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(Vote.objects.get(user=self.user1).user_choice, self.choice2)
+        self.assertEqual(Vote.objects.get(user=self.user2).user_choice, self.choice1)
+        self.question1.refresh_from_db()
+        self.assertEqual(self.question1.total_votes, 2)
+
+    def test_flush_takes_at_most_one_batch(self):
+        """A flush writes no more than batch_size votes"""
+        buffer = VoteBuffer(batch_size=1, flush_interval=1)
+        buffer.submit(self.user1.id, self.question1.id, self.choice1.id)
+        buffer.submit(self.user2.id, self.question1.id, self.choice1.id)
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(len(buffer.pending), 1)
+
+    def test_journal_replays_unflushed_votes(self):
+        """Votes accepted but never flushed are queued again from the journal"""
+        buffer = VoteBuffer(batch_size=1, flush_interval=1, journal=VoteJournal(self.journal_path, fsync=False))
+        buffer.submit(self.user1.id, self.question1.id, self.choice1.id)
+        buffer.submit(self.user2.id, self.question1.id, self.choice2.id)
+        buffer.flush()
+        buffer.journal.close()
+        restarted = VoteBuffer(batch_size=10, flush_interval=1, journal=VoteJournal(self.journal_path, fsync=False))
+        self.assertEqual(restarted.replay(), 1)
+        restarted.flush()
+        self.assertEqual(Vote.objects.get(user=self.user2).user_choice, self.choice2)
+        restarted.journal.close()
+        self.assertEqual(VoteJournal(self.journal_path).replay(), [])
+
+    def test_journal_belongs_to_one_process(self):
+        """A journal another buffer has open cannot be opened again"""
+        journal = VoteJournal(self.journal_path, fsync=False)
+        journal.open()
+        self.addCleanup(journal.close)
+        with self.assertRaises(RuntimeError):
+            VoteJournal(self.journal_path, fsync=False).replay()
+
+    def test_journal_per_process(self):
+        """A {pid} in the journal path gives each process its own file"""
+        journal = VoteJournal(os.path.join(self.directory.name, 'votes-{pid}.journal'), fsync=False)
+        self.assertEqual(journal.path, os.path.join(self.directory.name, f'votes-{os.getpid()}.journal'))
+
+    def test_journal_adopts_votes_of_gone_processes(self):
+        """The unwritten votes of a journal nobody holds are replayed, those of a locked one are left alone"""
+        template = os.path.join(self.directory.name, 'votes-{pid}.journal')
+        gone = template.replace('{pid}', '1000001')
+        with open(gone, 'w') as file:
+            file.write(json.dumps({'seq': 1, 'vote': [self.user1.id, self.question1.id, self.choice1.id]}) + '\n')
+        running = open(template.replace('{pid}', '1000002'), 'w')
+        self.addCleanup(running.close)
+        running.write(json.dumps({'seq': 1, 'vote': [self.user2.id, self.question1.id, self.choice2.id]}) + '\n')
+        running.flush()
+        fcntl.flock(running, fcntl.LOCK_EX)
+        buffer = VoteBuffer(batch_size=10, flush_interval=1, journal=VoteJournal(template, fsync=False))
+        self.addCleanup(buffer.journal.close)
+        self.assertEqual(buffer.replay(), 1)
+        self.assertFalse(os.path.exists(gone))
+        buffer.flush()
+        self.assertEqual(list(Vote.objects.values_list('user', flat=True)), [self.user1.id])
+
+    def test_shared_journal_is_refused_at_startup(self):
+        """A journal path without {pid} is a configuration error"""
+        with mock.patch.object(polls_settings, 'VOTE_JOURNAL', self.journal_path):
+            with self.assertRaises(ImproperlyConfigured):
+                ingest.check_journal()
+        with mock.patch.object(polls_settings, 'VOTE_JOURNAL', self.journal_path + '.{pid}'):
+            ingest.check_journal()
+
+    def test_metrics_report_queue_depth_and_flush_latency(self):
+        """The queue depth and the flush latency show up in the metrics"""
+        buffer = VoteBuffer(batch_size=10, flush_interval=1)
+        buffer.submit(self.user1.id, self.question1.id, self.choice1.id)
+        self.assertEqual(registry.snapshot()['gauges']['polls_vote_queue_depth'], 1)
+        buffer.flush()
+        self.assertEqual(registry.snapshot()['gauges']['polls_vote_queue_depth'], 0)
+        self.assertGreaterEqual(registry.snapshot()['histograms']['polls_vote_flush_seconds']['count'], 1)
+
+    def test_buffered_vote_view_queues_the_vote(self):
+        """In buffered mode the vote view queues the vote instead of saving it"""
+        buffer = VoteBuffer(batch_size=10, flush_interval=1)
+        self.client.login(username='User1', password='isp123456')
+        with mock.patch.object(ingest.polls_settings, 'VOTE_INGESTION_MODE', 'buffered'), \
+                mock.patch.object(ingest, 'vote_buffer', buffer):
+            response = self.client.post(reverse('polls:vote', args=(self.question1.id,)), {'choice': self.choice1.id})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question1.id,)))
+        self.assertFalse(Vote.objects.exists())
+        buffer.flush()
+        self.assertEqual(Vote.objects.get(user=self.user1).user_choice, self.choice1)
+
+    def test_metrics_page_is_for_staff(self):
+        """Only staff can read the metrics page"""
+        self.client.login(username='User1', password='isp123456')
+        self.assertEqual(self.client.get(reverse('polls:metrics')).status_code, 302)
+        User.objects.filter(pk=self.user1.pk).update(is_staff=True)
+        self.assertEqual(self.client.get(reverse('polls:metrics')).status_code, 200)
+
+
+class VoteBufferFailureTests(TransactionTestCase):
+    """Testing class for batches the database rejects.
+
+    The foreign keys are only checked when a transaction commits, so these
+    tests run without the transaction TestCase wraps around each test.
+    """
+
+    def test_rejected_vote_does_not_block_the_queue(self):
+        """A vote for a deleted choice is dropped and the rest of its batch is written"""
+        user1 = User.objects.create_user(username="User1", password='isp123456')
+        user2 = User.objects.create_user(username="User2", password='isp123456')
+        question = create_question(question_text='Question1', days=-1)
+        deleted = question.choice_set.create(choice_text='Choice1')
+        choice = question.choice_set.create(choice_text='Choice2')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        journal = VoteJournal(os.path.join(directory.name, 'votes.journal'), fsync=False)
+        self.addCleanup(journal.close)
+        buffer = VoteBuffer(batch_size=10, flush_interval=1, journal=journal)
+        buffer.submit(user1.id, question.id, deleted.id)
+        deleted.delete()
+        buffer.submit(user2.id, question.id, choice.id)
+        dead = registry.snapshot()['counters'].get('polls_votes_dead_lettered_total', 0)
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(len(buffer.pending), 0)
+        self.assertEqual(list(Vote.objects.values_list('user_id', 'user_choice_id')), [(user2.id, choice.id)])
+        self.assertEqual(registry.snapshot()['counters']['polls_votes_dead_lettered_total'], dead + 1)
+        self.assertEqual(journal.replay(), [])
+
+    def test_unavailable_database_keeps_votes_queued(self):
+        """Votes that fail for another reason than the data stay queued"""
+        user = User.objects.create_user(username="User1", password='isp123456')
+        question = create_question(question_text='Question1', days=-1)
+        choice = question.choice_set.create(choice_text='Choice1')
+        buffer = VoteBuffer(batch_size=10, flush_interval=1)
+        buffer.submit(user.id, question.id, choice.id)
+        with mock.patch.object(Vote, 'cast_many', side_effect=OperationalError('database is locked')):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(len(buffer.pending), 1)
+        self.assertEqual(buffer.flush(), 1)
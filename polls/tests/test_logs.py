@@ -0,0 +1,143 @@
+"""Unittest for testing the structured event logging"""
+import datetime
+import importlib
+import json
+import logging
+import os
+import queue
+import tempfile
+import time
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from polls import logs
+from polls import settings as polls_settings
+from polls.models import Question
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+def record(event='vote', **fields):
+    """Return the LogRecord log_event() would create."""
+    return logging.makeLogRecord({'name': 'polls', 'levelname': 'INFO', 'levelno': logging.INFO, 'msg': event,
+                                  'event': event, 'fields': fields})
+
+
+class EventTests(TestCase):
+    """Testing class for the events the views log."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.user1 = User.objects.create_user(username="User1", password='isp123456')
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.choice1 = self.question1.choice_set.create(choice_text='Choice1')
+
+    def test_vote_event(self):
+        """A vote logs the user, client IP, question and choice ids, not the question text"""
+        self.client.force_login(self.user1)
+        with self.assertLogs('polls', 'INFO') as captured:
+            self.client.post(reverse('polls:vote', args=(self.question1.id,)), {'choice': self.choice1.id},
+                             REMOTE_ADDR='10.0.0.1')
+        vote, = [entry for entry in captured.records if getattr(entry, 'event', None) == 'vote']
+        self.assertEqual(vote.fields, {'user_id': self.user1.id, 'ip': '10.0.0.1', 'question_id': self.question1.id,
+                                       'choice_id': self.choice1.id, 'buffered': False})
+
+    def test_failed_login_event(self):
+        """A failed login logs the username that was tried"""
+        with self.assertLogs('polls', 'WARNING') as captured:
+            self.client.post(reverse('login'), {'username': 'User1', 'password': 'wrong'})
+        self.assertEqual(captured.records[0].event, 'login_failed')
+        self.assertEqual(captured.records[0].fields['username'], 'User1')
+
+
+class FormatterTests(TestCase):
+    """Testing class for the console and JSON formatters."""
+
+    def test_console_format(self):
+        """The console shows the event followed by its fields"""
+        formatter = logs.ConsoleFormatter('%(levelname)s: %(message)s')
+        self.assertEqual(formatter.format(record(user_id=1, question_id=2)), 'INFO: vote user_id=1 question_id=2')
+
+    def test_json_format(self):
+        """The JSON formatter writes the event and its fields as one object"""
+        entry = json.loads(logs.JsonFormatter().format(record(user_id=1, ip='10.0.0.1')))
+        self.assertEqual((entry['event'], entry['user_id'], entry['ip'], entry['level']),
+                         ('vote', 1, '10.0.0.1', 'INFO'))
+
+
+class BatchingHandlerTests(TestCase):
+    """Testing class for the batching JSON Lines file and the queue listener."""
+
+    def setUp(self):
+        """For setup the test"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'polls.jsonl')
+
+    def lines(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as file:
+            return file.readlines()
+
+    def test_writes_in_batches(self):
+        """Lines are written a batch at a time, and the rest on close"""
+        handler = logs.BatchingRotatingFileHandler(self.path, batch_size=3, flush_interval=60)
+        handler.setFormatter(logs.JsonFormatter())
+        for n in range(4):
+            handler.handle(record(n=n))
+            self.assertEqual(len(self.lines()), 3 if n >= 2 else 0)
+        handler.close()
+        self.assertEqual([json.loads(line)['n'] for line in self.lines()], [0, 1, 2, 3])
+
+    def test_rotates(self):
+        """A batch that would overflow the file rotates it first"""
+        handler = logs.BatchingRotatingFileHandler(self.path, batch_size=1, maxBytes=200, backupCount=1)
+        handler.setFormatter(logs.JsonFormatter())
+        for n in range(5):
+            handler.handle(record(n=n))
+        handler.close()
+        self.assertTrue(os.path.exists(self.path + '.1'))
+
+    def test_queue_listener_flushes_when_idle(self):
+        """The listener writes a batch out once no more records arrive"""
+        handler = logs.BatchingRotatingFileHandler(self.path, batch_size=100, flush_interval=60)
+        handler.setFormatter(logs.JsonFormatter())
+        records = queue.SimpleQueue()
+        listener = logs.BatchingQueueListener(records, handler, flush_interval=0.01)
+        listener.start()
+        try:
+            records.put(record(n=1))
+            for _ in range(100):
+                if self.lines():
+                    break
+                time.sleep(0.01)
+            self.assertEqual(len(self.lines()), 1)
+        finally:
+            listener.stop()
+            handler.close()
+
+    def test_batches_only_behind_the_queue(self):
+        """Without the queue listener to flush them, the log file is written a line at a time"""
+        self.addCleanup(importlib.reload, polls_settings)
+        for queued, batch_size in (('false', 1), ('true', 100)):
+            with mock.patch.dict(os.environ, {'POLLS_LOG_FILE': self.path, 'POLLS_LOG_QUEUE': queued,
+                                              'POLLS_LOG_BATCH_SIZE': '100'}):
+                importlib.reload(polls_settings)
+            self.assertEqual(polls_settings.LOGGING['handlers']['file']['batch_size'], batch_size)
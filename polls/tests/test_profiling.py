@@ -0,0 +1,96 @@
+"""Unittest for testing the profiling middleware and the metrics export"""
+import datetime
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from polls import settings as polls_settings
+from polls.metrics import Registry, registry
+from polls.models import Question
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Testing class for the profiling middleware."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.user1 = User.objects.create_user(username="User1", password='isp123456')
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.question1.choice_set.create(choice_text='Choice1')
+
+    def test_disabled_by_default(self):
+        """Without POLLS_PROFILING no Server-Timing header is sent"""
+        response = self.client.get(reverse('polls:index'))
+        self.assertNotIn('Server-Timing', response)
+
+    @mock.patch.object(polls_settings, 'PROFILING', True)
+    def test_server_timing_and_metrics(self):
+        """A profiled request reports its queries and render time in Server-Timing and the metrics"""
+        self.client.force_login(self.user1)
+        before = registry.snapshot()['histograms'].get('polls_view_seconds{view="polls:detail"}', {'count': 0})
+        response = self.client.get(reverse('polls:detail', args=(self.question1.id,)))
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertRegex(timing, r'render;dur=(?!0\.00)')
+        histograms = registry.snapshot()['histograms']
+        self.assertEqual(histograms['polls_view_seconds{view="polls:detail"}']['count'], before['count'] + 1)
+        self.assertIn('polls_view_render_seconds{view="polls:detail"}', histograms)
+
+    @mock.patch.object(polls_settings, 'PROFILING', True)
+    @mock.patch.object(polls_settings, 'PROFILING_SAMPLE_RATE', 1)
+    def test_sampled_profiles_are_dumped(self):
+        """A sampled request leaves a cProfile dump named after its view"""
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(polls_settings, 'PROFILING_DIR', directory):
+            self.client.get(reverse('polls:index'))
+            self.assertTrue(os.listdir(directory)[0].startswith('polls-index-'))
+
+
+class PrometheusTests(TestCase):
+    """Testing class for the Prometheus text export of the metrics."""
+
+    def test_exposition_format(self):
+        """Counters, gauges and labelled histograms are written in the Prometheus text format"""
+        metrics = Registry()
+        metrics.inc('polls_votes_total', 2)
+        metrics.gauge('polls_queue_depth', lambda: 3)
+        metrics.observe('polls_view_seconds{view="polls:index"}', 0.2, buckets=(0.1, 1))
+        self.assertEqual(metrics.prometheus().splitlines(), [
+            '# TYPE polls_votes_total counter',
+            'polls_votes_total 2',
+            '# TYPE polls_queue_depth gauge',
+            'polls_queue_depth 3',
+            '# TYPE polls_view_seconds histogram',
+            'polls_view_seconds_bucket{view="polls:index",le="0.1"} 0',
+            'polls_view_seconds_bucket{view="polls:index",le="1"} 1',
+            'polls_view_seconds_bucket{view="polls:index",le="+Inf"} 1',
+            'polls_view_seconds_sum{view="polls:index"} 0.2',
+            'polls_view_seconds_count{view="polls:index"} 1',
+        ])
+
+    def test_metrics_page_in_prometheus_format(self):
+        """The metrics page answers in the Prometheus format when asked"""
+        User.objects.create_user(username="Staff", password='isp123456', is_staff=True)
+        self.client.login(username='Staff', password='isp123456')
+        response = self.client.get(reverse('polls:metrics'), {'format': 'prometheus'})
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
@@ -0,0 +1,119 @@
+"""Unittest for testing the vote rate limits and the duplicate vote suppression"""
+import datetime
+from unittest import mock
+
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from polls import settings as polls_settings, views
+from polls.metrics import registry
+from polls.models import Question, Vote
+from polls.ratelimit import ratelimit_cache, take_token
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+class RateLimitTests(TestCase):
+    """Testing class for the vote rate limits and the duplicate vote suppression."""
+
+    def setUp(self):
+        """For setup the test"""
+        ratelimit_cache().clear()
+        self.addCleanup(ratelimit_cache().clear)
+        self.user1 = User.objects.create_user(username="User1", password='isp123456')
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.choice1 = self.question1.choice_set.create(choice_text='Choice1')
+        self.choice2 = self.question1.choice_set.create(choice_text='Choice2')
+        self.vote_url = reverse('polls:vote', args=(self.question1.id,))
+        self.results_url = reverse('polls:results', args=(self.question1.id,))
+
+    def test_token_bucket(self):
+        """A bucket allows its burst, then one token per 1/rate seconds"""
+        self.assertEqual([take_token('bucket', 1, 2, now=100) for _ in range(3)], [0, 0, 1])
+        self.assertEqual(take_token('bucket', 1, 2, now=100.5), 0.5)
+        self.assertEqual(take_token('bucket', 1, 2, now=101), 0)
+
+    @mock.patch.object(polls_settings, 'VOTE_BURST', 2)
+    def test_user_limit(self):
+        """A user voting faster than the limit gets 429 and the vote is not saved"""
+        self.client.force_login(self.user1)
+        self.client.post(self.vote_url, {'choice': self.choice1.id})
+        self.client.post(self.vote_url, {'choice': self.choice2.id})
+        response = self.client.post(self.vote_url, {'choice': self.choice1.id})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(Vote.objects.get(user=self.user1).user_choice, self.choice2)
+
+    @mock.patch.object(polls_settings, 'VOTE_IP_BURST', 1)
+    @mock.patch.object(polls_settings, 'VOTE_IP_RATE', 0.01)
+    def test_ip_limit(self):
+        """Users sharing an IP share its limit"""
+        self.client.force_login(self.user1)
+        self.client.post(self.vote_url, {'choice': self.choice1.id}, REMOTE_ADDR='10.0.0.1')
+        self.client.force_login(User.objects.create_user(username="User2", password='isp123456'))
+        response = self.client.post(self.vote_url, {'choice': self.choice1.id}, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        response = self.client.post(self.vote_url, {'choice': self.choice1.id}, REMOTE_ADDR='10.0.0.2')
+        self.assertRedirects(response, self.results_url)
+
+    @mock.patch.object(polls_settings, 'VOTE_IP_BURST', 1)
+    @mock.patch.object(polls_settings, 'VOTE_IP_RATE', 0.01)
+    def test_anonymous_votes_take_no_tokens(self):
+        """Votes of anonymous users, sent to log in, leave the address's bucket alone"""
+        for _ in range(3):
+            response = self.client.post(self.vote_url, {'choice': self.choice1.id}, REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.user1)
+        response = self.client.post(self.vote_url, {'choice': self.choice1.id}, REMOTE_ADDR='10.0.0.1')
+        self.assertRedirects(response, self.results_url)
+
+    @mock.patch.object(polls_settings, 'VOTE_IP_BURST', 1)
+    @mock.patch.object(polls_settings, 'VOTE_IP_RATE', 0.01)
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        """A client cannot spend another address's tokens by sending X-Forwarded-For"""
+        self.client.force_login(self.user1)
+        self.client.post(self.vote_url, {'choice': self.choice1.id}, REMOTE_ADDR='10.0.0.1',
+                         HTTP_X_FORWARDED_FOR='10.0.0.9')
+        self.client.force_login(User.objects.create_user(username="User2", password='isp123456'))
+        response = self.client.post(self.vote_url, {'choice': self.choice1.id}, REMOTE_ADDR='10.0.0.2',
+                                    HTTP_X_FORWARDED_FOR='10.0.0.9')
+        self.assertRedirects(response, self.results_url)
+
+    def test_client_ip_behind_trusted_proxy(self):
+        """Behind a trusted proxy the address it appended to X-Forwarded-For is the client's"""
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.254', HTTP_X_FORWARDED_FOR='1.2.3.4, 10.0.0.9')
+        self.assertEqual(views.get_client_ip(request), '10.0.0.254')
+        with mock.patch.object(views, 'TRUSTED_PROXIES', 1):
+            self.assertEqual(views.get_client_ip(request), '10.0.0.9')
+
+    def test_repeated_vote(self):
+        """The same vote submitted again is answered with the redirect without saving it"""
+        self.client.force_login(self.user1)
+        self.client.post(self.vote_url, {'choice': self.choice1.id})
+        repeated = registry.snapshot()['counters'].get('polls_votes_repeated_total', 0)
+        with self.assertNumQueries(2) as queries:
+            response = self.client.post(self.vote_url, {'choice': self.choice1.id})
+        self.assertRedirects(response, self.results_url)
+        self.assertNotIn('polls_', ' '.join(query['sql'] for query in queries.captured_queries))
+        self.assertEqual(registry.snapshot()['counters']['polls_votes_repeated_total'], repeated + 1)
+
+    def test_changed_vote_is_saved(self):
+        """A vote for another choice within the window replaces the previous one"""
+        self.client.force_login(self.user1)
+        self.client.post(self.vote_url, {'choice': self.choice1.id})
+        self.client.post(self.vote_url, {'choice': self.choice2.id})
+        self.assertEqual(Vote.objects.get(user=self.user1).user_choice, self.choice2)
@@ -0,0 +1,65 @@
+"""Unittest for testing the polls results"""
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from polls.models import Question, Vote
+
+# The results page must stay at this many queries however many choices or votes a poll has.
+RESULTS_QUERY_BUDGET = 1
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+class QuestionResultsViewTests(TestCase):
+    """Testing class for results page (views)."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.question = create_question(question_text='Question1', days=-1)
+        self.choices = [self.question.choice_set.create(choice_text=f'Choice{i}') for i in range(50)]
+        for i in range(4):
+            user = User.objects.create_user(username=f"User{i}", password='isp123456')
+            Vote.cast(user, self.choices[0] if i < 3 else self.choices[1])
+        self.url = reverse('polls:results', args=(self.question.id,))
+
+    def test_results_query_budget(self):
+        """The results page of a poll with many choices stays within the query budget"""
+        with self.assertNumQueries(RESULTS_QUERY_BUDGET):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_results_total_and_percentage(self):
+        """The results page shows the total and the percentage of each choice"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['total_votes'], 4)
+        self.assertEqual(response.context['choices'][0].percentage, 75.0)
+        self.assertEqual(response.context['choices'][1].percentage, 25.0)
+        self.assertEqual(response.context['choices'][2].percentage, 0)
+
+    def test_results_without_choices(self):
+        """A question without choices still shows its results page"""
+        question = create_question(question_text='Empty question.', days=-1)
+        response = self.client.get(reverse('polls:results', args=(question.id,)))
+        self.assertContains(response, 'Empty question.')
+        self.assertEqual(response.context['total_votes'], 0)
+
+    def test_results_unknown_question(self):
+        """The results page of a question that does not exist returns 404"""
+        response = self.client.get(reverse('polls:results', args=(999,)))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,144 @@
+"""Unittest for testing the read database router"""
+import datetime
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import pages
+from polls.cache import polls_cache
+from polls.models import Choice, Question
+from polls.routers import PRIMARY_COOKIE, ReadRouter, read_from_replicas, reading, reads_may_lag
+from polls.settings import REPLICA_LAG
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+@override_settings(POLLS_READ_DATABASES=['readonly'])
+class ReadRouterTests(TestCase):
+    """Testing class for ReadRouter and read_from_replicas."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.request = RequestFactory().get('/')
+
+    def test_reads_default_outside_read_views(self):
+        """Without read_from_replicas every read goes to default"""
+        self.assertEqual(ReadRouter().db_for_read(Question), 'default')
+
+    def test_reads_replica_in_read_views(self):
+        """A decorated view reads the polls models from a read database"""
+        view = read_from_replicas(lambda request: ReadRouter().db_for_read(Choice))
+        self.assertEqual(view(self.request), 'readonly')
+        self.assertFalse(reading.get())
+
+    def test_async_read_views(self):
+        """The decorator works on async views too"""
+        async def view(request):
+            return ReadRouter().db_for_read(Question)
+        self.assertEqual(async_to_sync(read_from_replicas(view))(self.request), 'readonly')
+
+    def test_other_apps_and_writes_stay_on_default(self):
+        """Users and sessions, and every write, use default even in a read view"""
+        router = ReadRouter()
+        view = read_from_replicas(lambda request: (router.db_for_read(User), router.db_for_write(Question)))
+        self.assertEqual(view(self.request), ('default', 'default'))
+
+    @override_settings(POLLS_READ_DATABASES=[])
+    def test_no_read_databases(self):
+        """With no read database configured, read views use default"""
+        view = read_from_replicas(lambda request: ReadRouter().db_for_read(Question))
+        self.assertEqual(view(self.request), 'default')
+
+    def test_sticky_primary(self):
+        """A client that has just written keeps reading the primary"""
+        self.request.COOKIES[PRIMARY_COOKIE] = '1'
+        view = read_from_replicas(lambda request: ReadRouter().db_for_read(Question))
+        self.assertEqual(view(self.request), 'default')
+
+    def test_reads_may_lag(self):
+        """Only reads from a copy of the database may lag; the read-only connection to the same file does not"""
+        lags = read_from_replicas(lambda request: reads_may_lag())
+        with mock.patch.dict(settings.DATABASES, {'replica1': {'NAME': 'replica.sqlite3'}}):
+            with self.settings(POLLS_READ_DATABASES=['default', 'replica1']):
+                self.assertTrue(lags(self.request))
+                self.assertFalse(reads_may_lag())
+            with self.settings(POLLS_READ_DATABASES=['default']):
+                self.assertFalse(lags(self.request))
+
+    def test_migrations_only_on_default(self):
+        """Only default gets the schema; the read databases share its file"""
+        self.assertTrue(ReadRouter().allow_migrate('default', 'polls'))
+        self.assertFalse(ReadRouter().allow_migrate('readonly', 'polls'))
+
+
+class ReadViewTests(TestCase):
+    """Testing class for the read views when reads are routed."""
+
+    @override_settings(POLLS_READ_DATABASES=['default'])
+    def test_results_page(self):
+        """The results page renders when it reads through the router"""
+        question = create_question(question_text='Question1', days=-1)
+        question.choice_set.create(choice_text='Choice1')
+        response = self.client.get(reverse('polls:results', args=(question.id,)))
+        self.assertContains(response, 'Choice1')
+
+    def test_vote_sticks_to_primary(self):
+        """A vote sets the cookie that sends the voter's next reads to the primary"""
+        user = User.objects.create_user(username='User1', password='isp123456')
+        question = create_question(question_text='Question1', days=-1)
+        choice = question.choice_set.create(choice_text='Choice1')
+        self.client.force_login(user)
+        response = self.client.post(reverse('polls:vote', args=(question.id,)), {'choice': choice.id})
+        self.assertEqual(response.cookies[PRIMARY_COOKIE]['max-age'], 2 * REPLICA_LAG)
+
+
+@override_settings(POLLS_READ_DATABASES=['default'])
+class ReadYourWritesTests(TransactionTestCase):
+    """Testing class for a voter reading their vote while the replicas lag.
+
+    Pages are only cached outside transactions, so these tests run without the
+    transaction TestCase wraps around each test.
+    """
+
+    def setUp(self):
+        """For setup the test"""
+        polls_cache().clear()
+        self.addCleanup(polls_cache().clear)
+        # The read database is the primary itself; load_results() below plays a replica behind it.
+        lagging = mock.patch('polls.routers.replicas_may_lag', return_value=True)
+        lagging.start()
+        self.addCleanup(lagging.stop)
+        self.user = User.objects.create_user(username='User1', password='isp123456')
+        self.question = create_question(question_text='Question1', days=-1)
+        self.choice = self.question.choice_set.create(choice_text='Choice1')
+        self.results_url = reverse('polls:results', args=(self.question.id,))
+
+    def test_voter_sees_own_vote_after_a_replica_read(self):
+        """A replica read cached under the new version does not hide the vote from the voter"""
+        before_vote = pages.load_results(self.question.pk)
+        self.client.force_login(self.user)
+        etag = self.client.get(self.results_url)['ETag']
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.choice.id})
+        with mock.patch('polls.pages.load_results', return_value=before_vote):
+            replica_read = Client().get(self.results_url)
+        self.assertEqual(replica_read.context['total_votes'], 0)
+        response = self.client.get(self.results_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_votes'], 1)
@@ -0,0 +1,168 @@
+"""Unittest for testing the results snapshots of closed polls"""
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from polls import ingest
+from polls.ingest import VoteBuffer
+from polls.models import Choice, Question, ResultSnapshot, Vote
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+def close(question, days_ago=1):
+    """Move the question's end date into the past without firing the save signals."""
+    Question.objects.filter(pk=question.pk).update(end_date=timezone.now() - datetime.timedelta(days=days_ago))
+    question.refresh_from_db()
+
+
+class ResultSnapshotTests(TestCase):
+    """Testing class for ResultSnapshot and the results page of closed polls."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.question = create_question(question_text='Question1', days=-1)
+        self.choice1 = self.question.choice_set.create(choice_text='Choice1')
+        self.choice2 = self.question.choice_set.create(choice_text='Choice2')
+        for i in range(3):
+            user = User.objects.create_user(username=f"User{i}", password='isp123456')
+            Vote.cast(user, self.choice1 if i < 2 else self.choice2)
+        self.url = reverse('polls:results', args=(self.question.id,))
+
+    def test_take_counts_votes(self):
+        """A snapshot counts the votes of each choice from the Vote table"""
+        close(self.question)
+        snapshot = ResultSnapshot.take([self.question])[self.question.pk]
+        self.assertEqual(snapshot.total_votes, 3)
+        self.assertEqual(snapshot.closed_at, self.question.end_date)
+        self.assertEqual([(choice['choice_text'], choice['votes']) for choice in snapshot.choices],
+                         [('Choice1', 2), ('Choice2', 1)])
+
+    def test_take_keeps_existing_snapshot(self):
+        """Taking a snapshot again leaves the first one as it was"""
+        close(self.question)
+        ResultSnapshot.take([self.question])
+        Choice.objects.filter(pk=self.choice2.pk).delete()
+        snapshot = ResultSnapshot.take([self.question])[self.question.pk]
+        self.assertEqual(len(snapshot.choices), 2)
+
+    def test_closed_results_from_snapshot(self):
+        """The results page of a closed poll is finalized on first access and served from the snapshot"""
+        close(self.question)
+        response = self.client.get(self.url)
+        self.assertTrue(ResultSnapshot.objects.filter(question=self.question).exists())
+        self.assertEqual(response.context['total_votes'], 3)
+        self.assertEqual(response.context['choices'][0].percentage, 66.7)
+
+    def test_open_results_without_snapshot(self):
+        """An open poll is shown from its live counters and gets no snapshot"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['total_votes'], 3)
+        self.assertFalse(ResultSnapshot.objects.exists())
+
+    def test_closed_poll_takes_no_votes(self):
+        """A vote for a closed poll, saved or buffered, is refused and leaves its counters as they were"""
+        close(self.question)
+        voter = User.objects.create_user(username='Voter', password='isp123456')
+        self.client.force_login(voter)
+        vote_url = reverse('polls:vote', args=(self.question.id,))
+        buffer = VoteBuffer(batch_size=10, flush_interval=1)
+        for mode in ('sync', 'buffered'):
+            with mock.patch.object(ingest.polls_settings, 'VOTE_INGESTION_MODE', mode), \
+                    mock.patch.object(ingest, 'vote_buffer', buffer):
+                response = self.client.post(vote_url, {'choice': self.choice2.id})
+            self.assertRedirects(response, reverse('polls:index'))
+        self.assertFalse(buffer.pending)
+        self.assertFalse(Vote.objects.filter(user=voter).exists())
+        self.assertEqual(Choice.objects.get(pk=self.choice2.pk).votes, 1)
+
+    def test_reopened_question_drops_snapshot(self):
+        """Moving the end date of a finalized question into the future discards its snapshot"""
+        close(self.question)
+        ResultSnapshot.take([self.question])
+        self.question.end_date = timezone.now() + datetime.timedelta(days=1)
+        self.question.save()
+        self.assertFalse(ResultSnapshot.objects.exists())
+
+
+class FinalizePollsTests(TestCase):
+    """Testing class for the finalize_polls command."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.closed = create_question(question_text='Closed', days=-60)
+        self.open = create_question(question_text='Open', days=-1)
+        for question in (self.closed, self.open):
+            choice = question.choice_set.create(choice_text='Choice1')
+            Vote.cast(User.objects.create_user(username=f'Voter{question.pk}', password='isp123456'), choice)
+        close(self.closed, days_ago=45)
+
+    def test_finalize(self):
+        """Closed questions get a snapshot, open ones do not, and the votes stay"""
+        out = StringIO()
+        call_command('finalize_polls', stdout=out)
+        self.assertIn('Finalized 1 questions.', out.getvalue())
+        self.assertEqual(list(ResultSnapshot.objects.values_list('question_id', flat=True)), [self.closed.pk])
+        self.assertEqual(Vote.objects.count(), 2)
+
+    def test_archive(self):
+        """Archiving writes the votes of long-closed questions to a file and removes them, keeping the counters"""
+        path = os.path.join(self.directory.name, 'votes.ndjson')
+        call_command('finalize_polls', '--archive', path, stdout=StringIO())
+        with open(path) as archive:
+            rows = [json.loads(line) for line in archive]
+        self.assertEqual([row['question_id'] for row in rows], [self.closed.pk])
+        self.assertEqual(list(Vote.objects.values_list('question_id', flat=True)), [self.open.pk])
+        self.assertEqual(Question.objects.get(pk=self.closed.pk).total_votes, 1)
+        self.assertTrue(ResultSnapshot.objects.get(question=self.closed).votes_archived)
+        response = self.client.get(reverse('polls:results', args=(self.closed.id,)))
+        self.assertEqual(response.context['total_votes'], 1)
+
+    def test_compact_respects_older_than(self):
+        """Only the votes of questions closed longer than --older-than days are removed"""
+        call_command('finalize_polls', '--compact', '--older-than', '60', stdout=StringIO())
+        self.assertEqual(Vote.objects.count(), 2)
+        call_command('finalize_polls', '--compact', stdout=StringIO())
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_archived_question_cannot_be_reopened(self):
+        """An archived question refuses a future end date and keeps its snapshot if saved with one"""
+        call_command('finalize_polls', '--compact', stdout=StringIO())
+        closed = Question.objects.get(pk=self.closed.pk)
+        closed.end_date = timezone.now() + datetime.timedelta(days=1)
+        with self.assertRaises(ValidationError):
+            closed.full_clean()
+        closed.save()
+        self.assertTrue(ResultSnapshot.objects.filter(question=closed, votes_archived=True).exists())
+        call_command('rebuild_vote_counts', stdout=StringIO())
+        self.assertEqual(Choice.objects.get(question=closed).votes, 1)
+
+    def test_rebuild_skips_archived(self):
+        """Rebuilding the counters does not zero those of questions whose votes were archived"""
+        call_command('finalize_polls', '--compact', stdout=StringIO())
+        call_command('rebuild_vote_counts', stdout=StringIO())
+        self.assertEqual(Question.objects.get(pk=self.closed.pk).total_votes, 1)
@@ -0,0 +1,104 @@
+"""Unittest for testing the live results stream"""
+import datetime
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from polls import stream
+from polls.metrics import registry
+from polls.models import Question, Vote
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+def refreshes():
+    """Return how many times a broadcaster has loaded the tallies."""
+    return registry.snapshot()['counters'].get('polls_stream_refreshes_total', 0)
+
+
+class SubscriberTests(TestCase):
+    """Testing class for coalescing the changes of one stream."""
+
+    async def test_changes_are_merged(self):
+        """Changes pushed before the stream reads them arrive as one update with the newest counts"""
+        subscriber = stream.Subscriber()
+        subscriber.push(1, 1, {1: 1})
+        subscriber.push(2, 3, {1: 2, 2: 1})
+        self.assertEqual(await subscriber.next(1), (2, 3, {1: 2, 2: 1}))
+        self.assertIsNone(await subscriber.next(0.01))
+
+
+@mock.patch.object(stream.polls_settings, 'STREAM_TICK', 0.01)
+@override_settings(ROOT_URLCONF='polls.tests.test_async_views')
+class BroadcasterTests(TestCase):
+    """Testing class for the broadcaster and the stream view."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.user1 = User.objects.create_user(username="User1", password='isp123456')
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.choice1 = self.question1.choice_set.create(choice_text='Choice1')
+        self.choice2 = self.question1.choice_set.create(choice_text='Choice2')
+
+    async def test_one_refresh_for_all_subscribers(self):
+        """Many subscribers share one load of the tallies, and a vote reaches each as a delta"""
+        before = refreshes()
+        broadcaster = stream.broadcaster_for(self.question1.id)
+        subscribers = [broadcaster.subscribe() for _ in range(50)]
+        for subscriber in subscribers:
+            version, total, changes = await subscriber.next(1)
+            self.assertEqual(changes, {self.choice1.id: 0, self.choice2.id: 0})
+        self.assertEqual(refreshes(), before + 1)
+        await sync_to_async(Vote.cast)(self.user1, self.choice2)
+        for subscriber in subscribers:
+            version, total, changes = await subscriber.next(1)
+            self.assertEqual((total, changes), (1, {self.choice2.id: 1}))
+        self.assertEqual(refreshes(), before + 2)
+        for subscriber in subscribers:
+            broadcaster.unsubscribe(subscriber)
+        self.assertNotIn(self.question1.id, stream.broadcasters)
+
+    async def test_deleted_question_closes_the_stream(self):
+        """Deleting the question ends its stream"""
+        broadcaster = stream.broadcaster_for(self.question1.id)
+        subscriber = broadcaster.subscribe()
+        await subscriber.next(1)
+        await self.question1.adelete()
+        await subscriber.next(1)
+        self.assertTrue(subscriber.closed)
+        broadcaster.unsubscribe(subscriber)
+
+    async def test_stream_view(self):
+        """The stream view sends the current tallies as a Server-Sent Event"""
+        response = await self.async_client.get(reverse('polls:results_stream', args=(self.question1.id,)))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        content = aiter(response.streaming_content)
+        self.assertTrue((await anext(content)).startswith(b'retry:'))
+        lines = (await anext(content)).decode().splitlines()
+        self.assertEqual(lines[0], 'event: tally')
+        data = json.loads(lines[2][len('data: '):])
+        self.assertEqual(data, {'total': 0, 'choices': {str(self.choice1.id): 0, str(self.choice2.id): 0}})
+        await content.aclose()
+
+    async def test_stream_of_unknown_question(self):
+        """The stream of a question that does not exist returns 404"""
+        response = await self.async_client.get(reverse('polls:results_stream', args=(999,)))
+        self.assertEqual(response.status_code, 404)
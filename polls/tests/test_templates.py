@@ -0,0 +1,57 @@
+"""Unittest for testing the template loading and the cached template fragments"""
+import datetime
+
+from django.core.cache import caches
+from django.template import engines
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+
+from polls.models import Question
+from polls.templating import precompile
+
+
+def create_question(question_text, days, end_date=7):
+    """
+    Create a question.
+
+    Keyword arguments:
+    question_text -- a question text
+    days -- published the given number of days offset to now
+    end_date -- end date for the question (default 7)
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end_date_time = time + datetime.timedelta(days=end_date)
+    return Question.objects.create(question_text=question_text, pub_date=time, end_date=end_date_time)
+
+
+class TemplateTests(TestCase):
+    """Testing class for the precompiled templates and the question fragments."""
+
+    def setUp(self):
+        """For setup the test"""
+        caches['template_fragments'].clear()
+        self.addCleanup(caches['template_fragments'].clear)
+        self.question = create_question(question_text='Question1', days=-1)
+        self.question.choice_set.create(choice_text='Choice1')
+
+    def test_precompile(self):
+        """Precompiling puts the polls templates in the cached loader"""
+        loader = engines['django'].engine.template_loaders[0]
+        loader.reset()
+        precompile()
+        self.assertIn('polls/results.html', loader.get_template_cache)
+
+    def test_fragments_follow_question_version(self):
+        """A question's fragments are reused until its version changes"""
+        self.client.get(reverse('polls:index'))
+        self.client.get(reverse('polls:results', args=(self.question.id,)))
+        # An update that bypasses touch_questions leaves the version, and so the fragments, as they were.
+        Question.objects.filter(pk=self.question.pk).update(question_text='Renamed')
+        self.question.choice_set.update(choice_text='Renamed choice')
+        self.assertContains(self.client.get(reverse('polls:index')), 'Question1')
+        self.assertContains(self.client.get(reverse('polls:results', args=(self.question.id,))), 'Choice1')
+        self.question.refresh_from_db()
+        self.question.save()
+        self.assertContains(self.client.get(reverse('polls:index')), 'Renamed')
+        self.assertContains(self.client.get(reverse('polls:results', args=(self.question.id,))), 'Renamed choice')
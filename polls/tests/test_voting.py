@@ -1,12 +1,16 @@
 """Unittest for testing the polls voting"""
 import datetime
+import threading
+from unittest import mock
 
-from django.test import TestCase
+from django.db import IntegrityError, OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.models import User
 
-from polls.models import Question, Vote
+from polls.models import Question, Vote, VoteRollup, supports_native_upsert
 
 def create_question(question_text, days, end_date=7):
     """
@@ -61,14 +65,14 @@ class VotingTests(TestCase):
         #vote choice1
         self.client.post(self.question1_url, {'choice': selected_choice.id})
         #logged out
-        response = self.client.get(reverse('logout'))
+        response = self.client.post(reverse('logout'))
         #login with User2
         self.client.post(reverse('login'), {'username':'User2', 'password':'isp123456'}, follow=True)
         selected_choice2 = self.question1.choice_set.get(pk=self.choice2.id)
         #vote choice2
         self.client.post(self.question1_url, {'choice': selected_choice2.id})
         #logged out
-        response = self.client.get(reverse('logout'))
+        response = self.client.post(reverse('logout'))
         choice1_vote = Vote.objects.filter(question=self.question1).filter(user_choice=selected_choice).count()
         choice2_vote = Vote.objects.filter(question=self.question1).filter(user_choice=selected_choice2).count()
         self.assertEqual(choice1_vote, 1)
@@ -82,14 +86,14 @@ class VotingTests(TestCase):
         #vote choice1
         self.client.post(self.question1_url, {'choice': selected_choice.id})
         #logged out
-        response = self.client.get(reverse('logout'))
+        response = self.client.post(reverse('logout'))
         #login with User2
         self.client.post(reverse('login'), {'username':'User2', 'password':'isp123456'}, follow=True)
         selected_choice2 = self.question1.choice_set.get(pk=self.choice1.id)
         #vote choice1
         self.client.post(self.question1_url, {'choice': selected_choice2.id})
         #logged out
-        response = self.client.get(reverse('logout'))
+        response = self.client.post(reverse('logout'))
         choice1_vote = Vote.objects.filter(question=self.question1).filter(user_choice=selected_choice).count()
         self.assertEqual(choice1_vote, 2)
 
@@ -106,4 +110,184 @@ class VotingTests(TestCase):
         choice1_vote = Vote.objects.filter(question=self.question1).filter(user_choice=selected_choice).count()
         choice2_vote = Vote.objects.filter(question=self.question1).filter(user_choice=selected_choice2).count()
         self.assertEqual(choice1_vote, 0)
-        self.assertEqual(choice2_vote, 1)
\ No newline at end of file
+        self.assertEqual(choice2_vote, 1)
+
+class VoteCounterTests(TestCase):
+    """Testing class for the vote counters kept on Choice and Question."""
+
+    def setUp(self):
+        """For setup the test"""
+        self.user1 = User.objects.create_user(username="User1", email='User1@gmail.com', password='isp123456')
+        self.user2 = User.objects.create_user(username="User2", email='User2@gmail.com', password='isp123456')
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.choice1 = self.question1.choice_set.create(choice_text='Choice1')
+        self.choice2 = self.question1.choice_set.create(choice_text='Choice2')
+        self.question1_url = reverse('polls:vote', args=(self.question1.id,))
+
+    def assertCounters(self, choice1, choice2, total):
+        """Check the counters stored in the database."""
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.question1.refresh_from_db()
+        self.assertEqual((self.choice1.votes, self.choice2.votes, self.question1.total_votes), (choice1, choice2, total))
+
+    def test_vote_increases_counters(self):
+        """A new vote adds one to the choice and to the question"""
+        self.client.login(username='User1', password='isp123456')
+        self.client.post(self.question1_url, {'choice': self.choice1.id})
+        self.assertCounters(1, 0, 1)
+
+    def test_changed_vote_moves_counter(self):
+        """Replacing a vote moves the count to the new choice and keeps the total"""
+        self.client.login(username='User1', password='isp123456')
+        self.client.post(self.question1_url, {'choice': self.choice1.id})
+        self.client.post(self.question1_url, {'choice': self.choice2.id})
+        self.assertCounters(0, 1, 1)
+
+    def test_same_vote_twice_counts_once(self):
+        """Submitting the same choice again does not change the counters"""
+        Vote.cast(self.user1, self.choice1)
+        Vote.cast(self.user1, self.choice1)
+        self.assertCounters(1, 0, 1)
+
+    def test_saving_a_stale_question_keeps_counters(self):
+        """Saving a question or choice loaded before a vote does not write old counts back"""
+        stale_question = Question.objects.get(pk=self.question1.pk)
+        stale_choice = self.question1.choice_set.get(pk=self.choice1.pk)
+        Vote.cast(self.user1, self.choice1)
+        stale_question.question_text = 'Edited question'
+        stale_question.save()
+        stale_choice.save()
+        self.assertCounters(1, 0, 1)
+
+    def test_deleted_vote_leaves_counters(self):
+        """Deleting a vote takes it out of the counters"""
+        vote, created = Vote.cast(self.user1, self.choice1)
+        Vote.cast(self.user2, self.choice1)
+        vote.delete()
+        self.assertCounters(1, 0, 1)
+
+    def test_deleted_votes_leave_counters(self):
+        """Deleting a queryset of votes takes them out of the counters"""
+        Vote.cast(self.user1, self.choice1)
+        Vote.cast(self.user2, self.choice2)
+        Vote.objects.filter(user=self.user1).delete()
+        self.assertCounters(0, 1, 1)
+
+    def test_deleted_user_leaves_counters(self):
+        """Deleting a user takes their votes out of the counters"""
+        Vote.cast(self.user1, self.choice1)
+        Vote.cast(self.user2, self.choice2)
+        self.user1.delete()
+        self.assertCounters(0, 1, 1)
+
+    def test_deleted_choice_leaves_question_total(self):
+        """Deleting a choice takes its votes out of the question total"""
+        Vote.cast(self.user1, self.choice1)
+        Vote.cast(self.user2, self.choice2)
+        self.choice1.delete()
+        self.question1.refresh_from_db()
+        self.assertEqual(self.question1.total_votes, 1)
+
+    def test_deleted_question_queries_do_not_grow_with_votes(self):
+        """Deleting a question removes its votes in one statement, however many there are"""
+        queries = []
+        for voters in (1, 30):
+            question = create_question(question_text=f'Question with {voters} votes', days=-1)
+            choice = question.choice_set.create(choice_text='Choice')
+            users = User.objects.bulk_create(User(username=f'Voter{voters}-{n}') for n in range(voters))
+            Vote.cast_many([(user.pk, question.pk, choice.pk) for user in users])
+            with CaptureQueriesContext(connection) as context:
+                question.delete()
+            queries.append(len(context.captured_queries))
+            self.assertFalse(Vote.objects.filter(question_id=question.pk).exists())
+        self.assertEqual(queries[0], queries[1])
+
+    def test_vote_timestamps(self):
+        """A vote records when it was first cast and when it was last changed"""
+        start = timezone.now()
+        with mock.patch('django.utils.timezone.now', return_value=start):
+            Vote.cast(self.user1, self.choice1)
+        with mock.patch('django.utils.timezone.now', return_value=start + datetime.timedelta(minutes=5)):
+            Vote.cast(self.user1, self.choice2)
+        vote = Vote.objects.get(user=self.user1)
+        self.assertEqual((vote.created_at, vote.modified_at), (start, start + datetime.timedelta(minutes=5)))
+
+    def test_rollups_follow_votes(self):
+        """Each vote adds to the rollups of its minute and hour; a changed vote moves one count"""
+        Vote.cast(self.user1, self.choice1)
+        Vote.cast(self.user2, self.choice1)
+        Vote.cast(self.user1, self.choice2)
+        for resolution in VoteRollup.RESOLUTIONS:
+            rollups = VoteRollup.objects.filter(resolution=resolution)
+            self.assertEqual(sum(rollups.filter(choice=self.choice1).values_list('votes', flat=True)), 1)
+            self.assertEqual(sum(rollups.filter(choice=self.choice2).values_list('votes', flat=True)), 1)
+
+
+class ConcurrentVoteTests(TransactionTestCase):
+    """Testing class for many votes of the same users arriving at the same time."""
+
+    threads = 8
+    rounds = 10
+
+    def setUp(self):
+        """For setup the test"""
+        self.users = [User.objects.create_user(username=f"User{i}", password='isp123456') for i in range(2)]
+        self.question1 = create_question(question_text='Question1', days=-1)
+        self.choices = [self.question1.choice_set.create(choice_text=f'Choice{i}') for i in range(3)]
+
+    def cast_until_written(self, user, choice):
+        """Cast a vote, trying again while another thread holds the lock.
+
+        The shared in-memory test database reports a locked table at once
+        instead of waiting for it, and the failed transaction is rolled back whole.
+        """
+        while True:
+            try:
+                return Vote.cast(user, choice)
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+
+    def hammer(self, errors):
+        """Cast votes of every user for every choice, like a burst of double-submits."""
+        try:
+            for i in range(self.rounds):
+                for user in self.users:
+                    self.cast_until_written(user, self.choices[i % len(self.choices)])
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    def test_concurrent_votes_leave_one_vote_per_user(self):
+        """Concurrent submits never create a second vote for a user on a question"""
+        errors = []
+        workers = [threading.Thread(target=self.hammer, args=(errors,)) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(Vote.objects.filter(question=self.question1).count(), len(self.users))
+        self.question1.refresh_from_db()
+        self.assertEqual(self.question1.total_votes, len(self.users))
+        self.assertEqual(sum(choice.votes for choice in self.question1.choice_set.all()), len(self.users))
+
+    def test_duplicate_vote_is_rejected_by_the_database(self):
+        """The unique constraint refuses a second vote row for the same user and question"""
+        Vote.objects.create(question=self.question1, user=self.users[0], user_choice=self.choices[0])
+        with self.assertRaises(IntegrityError):
+            Vote.objects.create(question=self.question1, user=self.users[0], user_choice=self.choices[1])
+
+    def test_native_upsert_is_one_statement(self):
+        """Changing a vote runs the upsert and one update each of the choice counters, rollups and question version"""
+        Vote.cast(self.users[0], self.choices[0])
+        if not supports_native_upsert():
+            self.skipTest("The database has no INSERT ... ON CONFLICT ... RETURNING.")
+        with CaptureQueriesContext(connection) as queries:
+            vote, created = Vote.cast(self.users[0], self.choices[1])
+        statements = [query['sql'] for query in queries if query['sql'] not in ('BEGIN', 'COMMIT')]
+        self.assertEqual(len(statements), 4, statements)
+        self.assertFalse(created)
+        self.assertEqual(vote.previous_choice_id, self.choices[0].id)
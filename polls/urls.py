@@ -1,13 +1,30 @@
 """The URL declarations for polls."""
 from django.urls import path
 
-from . import views
+from . import api, async_views, views
+from .ratelimit import limit_votes
+from .settings import ASYNC_VIEWS
+
+if ASYNC_VIEWS:
+    detail_view, results_view, vote_view = async_views.vote_for_poll, async_views.results, async_views.vote
+else:
+    detail_view, results_view, vote_view = views.vote_for_poll, views.ResultsView.as_view(), views.vote
+vote_view = limit_votes(vote_view)
 
 app_name = 'polls'
 urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
     # path('<int:pk>/', views.DetailView.as_view(), name='detail'),
-    path('<int:pk>/', views.vote_for_poll, name='detail'),
-    path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
-    path('<int:question_id>/vote/', views.vote, name='vote'),
+    path('<int:pk>/', detail_view, name='detail'),
+    path('<int:pk>/results/', results_view, name='results'),
+    path('<int:question_id>/vote/', vote_view, name='vote'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('api/questions/', api.questions, name='api_questions'),
+    path('api/questions/<int:pk>/', api.question, name='api_question'),
+    path('api/questions/<int:pk>/tallies/', api.tallies, name='api_tallies'),
+    path('api/questions/<int:pk>/timeseries/', api.timeseries, name='api_timeseries'),
 ]
+
+if ASYNC_VIEWS:
+    # An open stream holds no thread under ASGI; under WSGI it would hold a worker for as long as it is open.
+    urlpatterns.append(path('<int:pk>/results/stream/', async_views.results_stream, name='results_stream'))
@@ -1,43 +1,55 @@
 """Takes a Web request and returns a Web response."""
 import logging
-import logging.config
 
-from django.http import HttpResponseRedirect
-from django.shortcuts import get_object_or_404, render, redirect
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views import generic
-from django.utils import timezone
+from django.views.decorators.http import condition
 from django.contrib import messages
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed 
 from django.dispatch import receiver
+from . import ingest, pages
+from .conditional import cache_policy, index_etag, index_last_modified, results_etag, results_last_modified
+from .logs import log_event
+from .metrics import registry
 from .models import Choice, Question, Vote
-from .settings import LOGGING
+from .routers import read_from_replicas, stick_to_primary
+from .settings import TRUSTED_PROXIES
 
-logging.config.dictConfig(LOGGING)
-logger = logging.getLogger("polls")
 
 def get_client_ip(request):
+    """Return the client's address: REMOTE_ADDR, or the one TRUSTED_PROXIES put in X-Forwarded-For.
+
+    The client controls what it sends in X-Forwarded-For, so only the entries
+    appended by the proxies in front of the app are believed.
+    """
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+    if TRUSTED_PROXIES and x_forwarded_for:
+        addresses = [address.strip() for address in x_forwarded_for.split(',')]
+        return addresses[-min(TRUSTED_PROXIES, len(addresses))]
+    return request.META.get('REMOTE_ADDR')
 
 @receiver(user_logged_in)
 def logged_in_logging(sender, request, user, **kwargs):
-    logger.info(f"{user.username} {get_client_ip(request)} has logged in")
+    log_event('login', user_id=user.pk, ip=get_client_ip(request))
 
 @receiver(user_logged_out)
 def logged_out_logging(sender, request, user, **kwargs):
-    logger.info(f"{user.username} {get_client_ip(request)} has logged out")
+    log_event('logout', user_id=user.pk if user else None, ip=get_client_ip(request))
 
 @receiver(user_login_failed)
 def logged_in_failed_logging(sender, request, credentials, **kwargs):
-    logger.warning(f"{request.POST['username']} {get_client_ip(request)} login failed")
+    log_event('login_failed', logging.WARNING, username=credentials.get('username'),
+              ip=get_client_ip(request) if request else None)
 
 
+@method_decorator(read_from_replicas, name='dispatch')
+@method_decorator(cache_policy('index'), name='dispatch')
+@method_decorator(condition(etag_func=index_etag, last_modified_func=index_last_modified), name='dispatch')
 class IndexView(generic.ListView):
     """Generic views for show question list on index page."""
 
@@ -45,10 +57,16 @@ class IndexView(generic.ListView):
     context_object_name = 'latest_question_list'
 
     def get_queryset(self):
-        """Return the last five published questions (not including those set to be published in the future)."""
-        return Question.objects.filter(
-            pub_date__lte=timezone.now()
-        ).order_by('-pub_date')
+        """Return a page of the latest published questions (not including those set to be published in the future)."""
+        page, self.next_cursor = pages.index(self.request)
+        return page
+
+    def get_context_data(self, **kwargs):
+        """Add the cursor of the next page and the status filter."""
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        context['status'] = self.request.GET.get('status', '')
+        return context
 
 
 # class DetailView(generic.DetailView):
@@ -61,54 +79,79 @@ class IndexView(generic.ListView):
 #         return Question.objects.filter(pub_date__lte=timezone.now())
 
 
+@method_decorator(read_from_replicas, name='dispatch')
+@method_decorator(cache_policy('results'), name='dispatch')
+@method_decorator(condition(etag_func=results_etag, last_modified_func=results_last_modified), name='dispatch')
 class ResultsView(generic.DetailView):
     """Generic views for show the result page."""
 
     model = Question
     template_name = 'polls/results.html'
 
+    def get_object(self, queryset=None):
+        """Return the question and keep its choices, from the cache while the question's version is current."""
+        question, self.choices = pages.results(self.request, self.kwargs['pk'])
+        return question
+
+    def get_context_data(self, **kwargs):
+        """Add the choices with their percentage and the total votes, so the template runs no queries."""
+        context = super().get_context_data(**kwargs)
+        context.update(pages.results_context(self.object, self.choices))
+        return context
+
 @login_required
 def vote(request, question_id):
     """Vote a choice in the question."""
     question = get_object_or_404(Question, pk=question_id)
+    if not question.can_vote():
+        # A closed poll's results may already be frozen in its snapshot.
+        messages.error(request, "This Question can not vote")
+        return redirect('polls:index')
     try:
         selected_choice = question.choice_set.get(pk=request.POST['choice'])
     except (KeyError, Choice.DoesNotExist):
         # Redisplay the question voting form.
-        return render(request, 'polls/detail.html', {
+        return TemplateResponse(request, 'polls/detail.html', {
             'question': question,
+            'choices': question.choice_set.all(),
             'error_message': "You didn't select a choice.",
         })
     else:
-        vote, created = Vote.objects.update_or_create(question=question, user=request.user, defaults={"user_choice": selected_choice})
-        if created:
-            messages.success(request, "Successfully voted!!")
+        if ingest.is_buffered():
+            ingest.vote_buffer.submit(request.user.pk, question.pk, selected_choice.pk)
+            messages.success(request, "Your vote has been received!!")
         else:
-            messages.success(request, "Replaces your previous vote successful!!")
-        logger.info(f"{request.user.username} {get_client_ip(request)} voting on {question.question_text} in {selected_choice} success!!")
+            vote, created = Vote.cast(request.user, selected_choice)
+            if created:
+                messages.success(request, "Successfully voted!!")
+            else:
+                messages.success(request, "Replaces your previous vote successful!!")
+        log_event('vote', user_id=request.user.pk, ip=get_client_ip(request), question_id=question.pk,
+                  choice_id=selected_choice.pk, buffered=ingest.is_buffered())
 
         # Always return an HttpResponseRedirect after successfully dealing
         # with POST data. This prevents data from being posted twice if a
         # user hits the Back button.
-        return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
+        return stick_to_primary(HttpResponseRedirect(reverse('polls:results', args=(question.id,))))
 
 @login_required
 def vote_for_poll(request, pk):
-    """Show the detail only valid question."""
-    previous_selected_vote_text = ""
-    has_previous_vote = False
-    question = get_object_or_404(Question, pk=pk)
-    previous_selected_vote = Vote.objects.filter(question=question).filter(user=request.user).first()
-    if previous_selected_vote is None:
-        previous_selected_vote_text = ""
-    else:
-        previous_selected_vote_text = previous_selected_vote.user_choice.choice_text
-        has_previous_vote = True
-    # if a is None:
-    #     a = "None"
+    """Show the detail only valid question.
+
+    One query loads the question with the choice the user voted for, and
+    decides whether the question takes votes; only then are its choices loaded.
+    """
+    question = get_object_or_404(pages.detail_questions(request.user), pk=pk)
     if not question.can_vote():
         messages.error(request, "This Question can not vote")
         return redirect('polls:index')
-    return render(request, 'polls/detail.html', 
-            {'question': question, 'previous_selected_vote_text': previous_selected_vote_text, 
-            'has_previous_vote': has_previous_vote})
+    choices = list(question.choice_set.all())
+    return TemplateResponse(request, 'polls/detail.html', pages.detail_context(question, choices))
+
+
+@user_passes_test(lambda user: user.is_staff)
+def metrics(request):
+    """Show the in-process metrics to staff as JSON, or in the Prometheus text format with ?format=prometheus."""
+    if request.GET.get('format') == 'prometheus':
+        return HttpResponse(registry.prometheus(), content_type='text/plain; version=0.0.4')
+    return JsonResponse(registry.snapshot())